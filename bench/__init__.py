@@ -0,0 +1,2 @@
+# 基准测试
+# generate 生成可缩放的合成PL/0程序，run 按规模测量各编译阶段的时间并与基准结果比较
@@ -0,0 +1,150 @@
+# 合成PL/0程序生成器
+# 按给定的随机种子生成语法正确、运行必然终止的PL/0程序，规模可以从几KB到几百MB。
+# 生成的程序保证可以在虚拟机上运行：
+#   除数只使用非零常数；
+#   WHILE 循环都是计数循环，循环变量只在循环头和循环体末尾被赋值。
+
+import io
+import sys
+import random
+import argparse
+import cgg_cache as cache  # 使用其中的大小解析函数
+
+class ProgramGenerator:
+    """
+    PL/0程序生成器。
+    size 为程序的目标字节数；consts、variables 为声明的常量和变量个数；
+    depth 为 IF/WHILE/BEGIN 的最大嵌套深度；exprLength 为表达式中项的最大个数；
+    exprDepth 为表达式中括号的最大嵌套深度；loopBound 为计数循环的最大次数。
+    """
+
+    def __init__(self, size=64 * 1024, seed=0, consts=8, variables=32, depth=3,
+                 exprLength=4, exprDepth=2, loopBound=4):
+        self.size = size
+        self.random = random.Random(seed)
+        self.consts = ["c%d" % i for i in range(max(consts, 1))]
+        self.variables = ["v%d" % i for i in range(max(variables, 1))]
+        self.counters = ["k%d" % i for i in range(depth)]  # 每一层循环使用自己的循环变量
+        self.depth = depth
+        self.exprLength = max(exprLength, 1)
+        self.exprDepth = exprDepth
+        self.loopBound = max(loopBound, 1)
+
+    def write(self, file):
+        """
+        把程序写入文本文件，返回写入的字符数。
+        主程序体的语句逐条生成并写入，不在内存中保存整个程序。
+        """
+        rand = self.random
+        header = ["PROGRAM bench\n",
+                  "CONST " + ", ".join("%s:=%d" % (name, rand.randint(1, 9)) for name in self.consts) + ";\n",
+                  "VAR " + ", ".join(self.variables + self.counters) + ";\n",
+                  "BEGIN\n"]
+        written = 0
+        for text in header:
+            written += file.write(text)
+        # 先给所有变量赋初值
+        for name in self.variables:
+            written += file.write("    %s:=%d;\n" % (name, rand.randint(0, 9)))
+        while True:
+            text = "    " + self.statement(0, 0)
+            if written + len(text) >= self.size:
+                break
+            written += file.write(text + ";\n")
+        written += file.write(text + "\nEND\n")
+        return written
+
+    def statement(self, depth, loops):
+        """
+        生成一条语句。depth 为当前的嵌套深度，loops 为外层循环的个数。
+        """
+        rand = self.random
+        choice = rand.random() if depth < self.depth else 0.0
+        indent = "    " * (depth + 1)
+        if choice < 0.6:
+            return "%s:=%s" % (rand.choice(self.variables), self.expression(0))
+        if choice < 0.75:
+            return "IF %s THEN %s" % (self.condition(), self.statement(depth + 1, loops))
+        if choice < 0.9:
+            counter = self.counters[loops]
+            body = [self.statement(depth + 1, loops + 1) for i in range(rand.randint(1, 3))]
+            body.append("%s:=%s+1" % (counter, counter))
+            return ("BEGIN\n%s    %s:=0;\n%s    WHILE %s<%d DO\n%s    BEGIN\n" % (indent, counter, indent, counter,
+                                                                            rand.randint(1, self.loopBound), indent)
+                    + ";\n".join(indent + "        " + text for text in body)
+                    + "\n%s    END\n%sEND" % (indent, indent))
+        body = [self.statement(depth + 1, loops) for i in range(rand.randint(1, 3))]
+        return "BEGIN\n" + ";\n".join(indent + "    " + text for text in body) + "\n" + indent + "END"
+
+    def condition(self):
+        op = self.random.choice(["=", "<", "<=", ">", ">="])
+        return "%s%s%s" % (self.expression(self.exprDepth), op, self.expression(self.exprDepth))
+
+    def expression(self, depth):
+        """
+        生成表达式。depth 为当前的括号嵌套深度。
+        """
+        rand = self.random
+        terms = [self.term(depth) for i in range(rand.randint(1, self.exprLength))]
+        text = terms[0]
+        for term in terms[1:]:
+            text += rand.choice("+-") + term
+        if rand.random() < 0.1:
+            text = rand.choice("+-") + text  # 一元 '+' 或 '-'
+        return text
+
+    def term(self, depth):
+        rand = self.random
+        text = self.factor(depth)
+        for i in range(rand.choice((0, 0, 0, 1, 2))):
+            if rand.random() < 0.5:
+                text += "*" + self.factor(depth)
+            else:
+                # 除数只使用非零常数
+                text += "/" + (rand.choice(self.consts) if rand.random() < 0.5 else str(rand.randint(1, 9)))
+        return text
+
+    def factor(self, depth):
+        rand = self.random
+        choice = rand.random()
+        if choice < 0.15 and depth < self.exprDepth:
+            return "(" + self.expression(depth + 1) + ")"
+        if choice < 0.6:
+            return rand.choice(self.variables)
+        if choice < 0.75:
+            return rand.choice(self.consts)
+        return str(rand.randint(0, 99))
+
+# 生成程序并写入文件，返回写入的字符数
+def generate(path, **options):
+    with open(path, "w") as file:
+        return ProgramGenerator(**options).write(file)
+
+# 生成程序，返回源代码文本
+def generateText(**options):
+    text = io.StringIO()
+    ProgramGenerator(**options).write(text)
+    return text.getvalue()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成的PL/0基准测试程序")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，默认输出到标准输出")
+    parser.add_argument("--size", default="64K", help="程序的目标大小，如 64K、10M、200M")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--consts", type=int, default=8, help="常量个数")
+    parser.add_argument("--vars", type=int, default=32, help="变量个数")
+    parser.add_argument("--depth", type=int, default=3, help="IF/WHILE/BEGIN 的最大嵌套深度")
+    parser.add_argument("--expr-length", type=int, default=4, help="表达式中项的最大个数")
+    parser.add_argument("--expr-depth", type=int, default=2, help="表达式中括号的最大嵌套深度")
+    parser.add_argument("--loop-bound", type=int, default=4, help="计数循环的最大次数")
+    args = parser.parse_args(argv)
+    generator = ProgramGenerator(cache.parseSize(args.size), args.seed, args.consts, args.vars, args.depth,
+                                 args.expr_length, args.expr_depth, args.loop_bound)
+    if args.output == "-":
+        generator.write(sys.stdout)
+    else:
+        with open(args.output, "w") as file:
+            generator.write(file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# 基准测试运行器
+# 对不同规模的合成程序分别编译若干次，取各阶段的最短时间，
+# 报告单词吞吐率和四元式吞吐率，并与保存的基准结果比较以发现性能回归。
+#
+# 时间与机器有关，基准结果只在本机保存和比较（例如保存到不提交的 bench/local-baseline.json）。
+# 仓库中的 bench/baseline.json 只记录默认的生成参数和各规模程序的字节数、单词数、四元式数，
+# 与它比较时只检查生成的程序是否相同（字节数和单词数），四元式个数不同时给出提示。
+#
+# 用法（在仓库根目录下）：
+#   python -m bench.run --baseline bench/baseline.json --save-baseline bench/local-baseline.json
+#   python -m bench.run --baseline bench/local-baseline.json
+#   python -m bench.run --save-baseline bench/baseline.json --no-times
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import cgg_cache as cache    # 使用其中的大小解析函数
+import cgg_session as s      # 导入编译会话模块
+import cgg_stats as st       # 导入性能统计模块
+from bench import generate as g
+
+PHASES = ("lex", "parse", "emit")  # 报告的编译阶段
+DEFAULT_SIZES = "64K,1M,10M"
+DEFAULT_TOLERANCE = 0.15           # 超过基准时间的比例达到该值时视为回归
+PROGRAM = ("bytes", "tokens")      # 与机器无关，相同时生成的程序相同
+COUNTS = PROGRAM + ("quads",)      # 与机器无关的程序规模
+
+# 生成指定规模的程序；目录中已有相同参数生成的程序时直接使用
+def programPath(workDir, size, seed, options):
+    name = "bench-%d-%d-%s.pl" % (size, seed, "-".join("%s%s" % item for item in sorted(options.items())))
+    path = os.path.join(workDir, name)
+    if not os.path.exists(path):
+        g.generate(path + ".tmp", size=size, seed=seed, **options)
+        os.replace(path + ".tmp", path)
+    return path
+
+# 编译一个程序若干次，返回各阶段的最短时间和规模数据
+def measure(path, workDir, repeat=3, lexer="fast", engine="recursive"):
+    best = dict.fromkeys(PHASES, float("inf"))
+    for i in range(repeat):
+        stats = st.PhaseStats(memory=False)
+        session = s.CompilerSession(path, os.path.join(workDir, "bench.out"),
+                                    os.path.join(workDir, "bench.lex.txt"),
+                                    os.path.join(workDir, "bench.table.txt"),
+                                    lexer=lexer, engine=engine, quiet=True, stats=stats)
+        if not session.compile() or session.messages:
+            raise RuntimeError("%s 编译失败：%s" % (path, session.error or "; ".join(session.messages)))
+        for phase in PHASES:
+            best[phase] = min(best[phase], stats.phases[phase]["wall_s"])
+    result = {phase + "_s": best[phase] for phase in PHASES}
+    result["total_s"] = sum(best.values())
+    result["bytes"] = os.path.getsize(path)
+    result["tokens"] = len(session.tokens)
+    result["quads"] = len(session.quate_list)
+    result["tokens_per_s"] = result["tokens"] / best["lex"] if best["lex"] else None
+    result["quads_per_s"] = result["quads"] / best["parse"] if best["parse"] else None
+    return result
+
+# 与基准结果比较，返回回归的列表。基准结果中没有时间或生成的程序不同时不比较时间
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for size, result in results.items():
+        old = baseline.get(size)
+        if old is None or differences(result, old):
+            continue
+        for key in [phase + "_s" for phase in PHASES] + ["total_s"]:
+            if key in old and old[key] > 0 and result[key] > old[key] * (1 + tolerance):
+                regressions.append((size, key, old[key], result[key]))
+    return regressions
+
+# 与基准结果的规模不同之处，返回 (项目, 基准值, 本次的值) 的列表。默认只比较决定生成的程序的项目
+def differences(result, old, keys=PROGRAM):
+    return [(key, old[key], result[key]) for key in keys if key in old and old[key] != result[key]]
+
+# 去掉与机器有关的时间，只保留程序规模
+def withoutTimes(results):
+    return {size: {key: result[key] for key in COUNTS} for size, result in results.items()}
+
+def report(results, log=print):
+    log("%10s %10s %10s %10s %10s %10s %14s %14s"
+        % ("size", "tokens", "lex(s)", "parse(s)", "emit(s)", "total(s)", "tokens/s", "quads/s"))
+    for size, result in results.items():
+        log("%10s %10d %10.4f %10.4f %10.4f %10.4f %14.0f %14.0f"
+            % (size, result["tokens"], result["lex_s"], result["parse_s"], result["emit_s"], result["total_s"],
+               result["tokens_per_s"] or 0, result["quads_per_s"] or 0))
+
+def save(document, path, noTimes=False):
+    if noTimes:
+        document = dict(document, results=withoutTimes(document["results"]))
+    with open(path, "w") as file:
+        json.dump(document, file, indent=1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PL/0 编译器基准测试")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="以逗号分隔的程序规模，如 64K,1M,100M")
+    parser.add_argument("--seed", type=int, default=0, help="生成程序的随机种子")
+    parser.add_argument("--depth", type=int, default=3, help="IF/WHILE/BEGIN 的最大嵌套深度")
+    parser.add_argument("--expr-length", type=int, default=4, help="表达式中项的最大个数")
+    parser.add_argument("--expr-depth", type=int, default=2, help="表达式中括号的最大嵌套深度")
+    parser.add_argument("--repeat", type=int, default=3, help="每个规模的编译次数，取最短时间")
+    parser.add_argument("--lexer", choices=["fast", "ref", "parallel"], default="fast", help="使用的词法分析器")
+    parser.add_argument("--engine", choices=["recursive", "stack"], default="recursive", help="使用的语法分析引擎")
+    parser.add_argument("--work-dir", default=None, help="存放生成的程序和输出文件的目录，默认使用临时目录")
+    parser.add_argument("--json", metavar="FILE", default=None, help="把结果以JSON格式写入文件")
+    parser.add_argument("--baseline", metavar="FILE", default=None, help="与指定的基准结果比较")
+    parser.add_argument("--save-baseline", metavar="FILE", default=None, help="把结果保存为基准结果")
+    parser.add_argument("--no-times", action="store_true",
+                        help="保存基准结果时只保存生成参数和程序规模，不保存与机器有关的时间")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="允许的变慢比例，默认 %.2f" % DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    options = {"depth": args.depth, "exprLength": args.expr_length, "exprDepth": args.expr_depth}
+    workDir = args.work_dir or tempfile.mkdtemp(prefix="cgg-bench-")
+    os.makedirs(workDir, exist_ok=True)
+    results = {}
+    for size in args.sizes.split(","):
+        size = size.strip()
+        path = programPath(workDir, cache.parseSize(size), args.seed, options)
+        results[size] = measure(path, workDir, args.repeat, args.lexer, args.engine)
+    report(results)
+
+    document = {"params": dict(options, seed=args.seed, lexer=args.lexer, engine=args.engine), "results": results}
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(document, file, indent=1)
+    if args.save_baseline is not None:
+        save(document, args.save_baseline, args.no_times)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("params") != document["params"]:
+            print("警告：基准结果的生成参数与本次不同：%s" % baseline.get("params"))
+        for size, result in results.items():
+            for key, old, new in differences(result, baseline["results"].get(size, {})):
+                print("警告：%s 的程序与基准结果不同，%s 从 %d 变为 %d，不比较时间" % (size, key, old, new))
+            for key, old, new in differences(result, baseline["results"].get(size, {}), ("quads",)):
+                print("提示：%s 生成的四元式个数从 %d 变为 %d" % (size, old, new))
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for size, key, old, new in regressions:
+            print("性能回归：%s %s 从 %.4f 秒变为 %.4f 秒（%+.1f%%）" % (size, key, old, new, (new / old - 1) * 100))
+        if regressions:
+            sys.exit(1)
+        if not any("total_s" in old for old in baseline["results"].values()):
+            print("基准结果中没有时间，只检查了生成的程序")
+        else:
+            print("没有发现性能回归")
+
+if __name__ == "__main__":
+    main()
@@ -2,50 +2,175 @@
 
 import sys
 import os
-import cgg_parser as p  # 导入语法分析器模块
-import cgg_lex as l     # 导入词法分析器模块
+import time
+import json
+import argparse
+import cgg_session as s  # 导入编译会话模块
+import cgg_server as server  # 导入编译服务器模块
+import cgg_cache as cache    # 导入编译缓存模块
+import cgg_watch as watch    # 导入监视模式模块
+import cgg_vm as vm          # 导入虚拟机模块
+
+# 解析命令行参数
+def parseArgs():
+    parser = argparse.ArgumentParser(description="PL/0 编译器")
+    parser.add_argument("src", nargs="*", help="源文件名；批量编译时可以是多个源文件或目录")
+    parser.add_argument("--lexer", choices=["fast", "ref", "check", "parallel"], default="fast",
+                        help="词法分析器：fast 为主正则扫描器，ref 为逐字符参考扫描器，"
+                             "check 同时运行两者并检查结果是否一致，parallel 在多个进程中分块分析大文件")
+    parser.add_argument("--engine", choices=["recursive", "stack"], default="recursive",
+                        help="语法分析引擎：recursive 为递归下降分析器，stack 为不使用递归的栈式分析器，"
+                             "可以分析任意深度的嵌套")
+    parser.add_argument("--recover", action="store_true",
+                        help="容错分析：遇到错误后继续分析，一次报告所有错误的行号、列号和信息")
+    parser.add_argument("-O", "--optimize", type=int, nargs="?", const=1, default=0, metavar="LEVEL",
+                        help="优化中间代码：删除不可达代码和无用的临时变量赋值、合并连续的跳转，"
+                             "只写 -O 时优化级别为1")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="并行词法分析或批量编译使用的进程数，默认为CPU核数")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式编译：通过mmap按需读取源文件，不保存完整的单词列表；"
+                             "不优化、不使用缓存时四元式也在语法分析的过程中输出，不保存完整的四元式列表")
+    parser.add_argument("--no-lex-output", action="store_true",
+                        help="不输出 lexical_analysis_result.txt")
+    parser.add_argument("--bytecode", metavar="FILE", default=None,
+                        help="同时把符号表和四元式列表输出为二进制字节码文件，可以用 mmap 直接加载")
+    parser.add_argument("--run", action="store_true",
+                        help="编译成功后用虚拟机执行生成的四元式，输出各变量的最终值")
+    parser.add_argument("--step-limit", type=int, default=vm.DEFAULT_STEP_LIMIT, metavar="N",
+                        help="--run 时最多执行的四元式条数，超过时报告运行错误，默认为 %(default)d")
+    parser.add_argument("--no-jit", action="store_true",
+                        help="--run 时只解释执行，不把执行次数多的循环编译为 Python 函数")
+    parser.add_argument("--batch", action="store_true",
+                        help="批量编译：在进程池中并行编译多个源文件或目录中的所有 .pl 文件")
+    parser.add_argument("--out-dir", default=None,
+                        help="批量编译的输出目录，默认与源文件放在一起")
+    parser.add_argument("--cache", metavar="DIR", default=None,
+                        help="使用指定目录作为编译缓存，源代码和选项不变时跳过词法分析和语法分析")
+    parser.add_argument("--cache-size", default=str(cache.DEFAULT_CACHE_SIZE),
+                        help="编译缓存的大小上限，如 256M、1G，超出时淘汰最久未使用的条目")
+    parser.add_argument("--serve", metavar="SOCKET", default=None,
+                        help="作为编译服务器在指定的Unix域套接字上常驻运行，-j 指定工作进程数")
+    parser.add_argument("--connect", metavar="SOCKET", default=None,
+                        help="把编译请求发送给指定套接字上的编译服务器，输出JSON格式的结果")
+    parser.add_argument("--watch", action="store_true",
+                        help="监视源文件，每次保存后只重新分析发生变化的语句并更新结果文件，按 Ctrl-C 退出")
+    parser.add_argument("--trace", choices=["print", "profile"], default=None,
+                        help="跟踪语法分析：print 输出逐个单词的调试信息，profile 统计每个非终结符的调用次数和时间")
+    parser.add_argument("--trace-out", metavar="FILE", default=None,
+                        help="--trace profile 时把跟踪事件写入指定文件，默认只输出统计表")
+    parser.add_argument("--trace-format", choices=["json", "chrome"], default="json",
+                        help="跟踪事件文件的格式：json 或 Chrome 跟踪格式（chrome://tracing、Perfetto）")
+    parser.add_argument("--stats", metavar="FILE", nargs="?", const="-", default=None,
+                        help="输出各阶段的性能统计（JSON格式），不指定文件时输出到标准输出")
+    return parser.parse_args()
+
+# 批量编译并输出结果汇总
+def runBatch(args):
+    start = time.perf_counter()
+    results = s.compileBatch(args.src, args.out_dir, args.jobs, lexer=args.lexer, stream=args.stream,
+                             engine=args.engine, recover=args.recover, optimize=args.optimize,
+                             cache=openCache(args))
+    failed = [result for result in results if not result["ok"]]
+    for result in failed:
+        if result["diagnostics"]:
+            for diagnostic in result["diagnostics"]:
+                print(result["src"] + ":" + s.formatDiagnostic(diagnostic))
+            continue
+        print(result["src"] + ": " + "; ".join(result["messages"] + [result["error"] or ""]).strip("; "))
+    print("批量编译完成：共 %d 个文件，成功 %d 个，失败 %d 个，用时 %.2f 秒"
+          % (len(results), len(results) - len(failed), len(failed), time.perf_counter() - start))
+    return not failed
+
+# 输出性能分析的结果
+def writeProfile(args, tracer):
+    if args.trace_out is None:
+        tracer.report()
+        return
+    with open(args.trace_out, "w") as file:
+        if args.trace_format == "chrome":
+            tracer.toChromeTrace(file)
+        else:
+            tracer.toJSON(file)
+
+# 输出性能统计报告
+def writeStats(args, session):
+    report = json.dumps(session.statsReport(), ensure_ascii=False)
+    if args.stats == "-":
+        print(report)
+    else:
+        with open(args.stats, "w") as file:
+            file.write(report + "\n")
+
+# 输出执行结束（或出错）时各变量的值
+def printVariables(session):
+    if session.machine is None:
+        return
+    print("执行了 %d 条四元式" % session.machine.steps)
+    for name, value in session.machine.variables(session.parser.const_symbol_table).items():
+        print(f"{name} = {value}")
+
+# 按命令行参数打开编译缓存，未指定时返回None
+def openCache(args):
+    if args.cache is None:
+        return None
+    return cache.CompileCache(args.cache, cache.parseSize(args.cache_size))
 
 # 当脚本作为主程序运行时
 if __name__ == "__main__":
+    args = parseArgs()
+
+    if args.serve is not None:
+        try:
+            server.serve(args.serve, args.jobs)
+        except FileExistsError as e:
+            print(e)
+            sys.exit(1)
+        sys.exit()
 
     # 检查命令行参数是否提供了源文件名
-    if len(sys.argv) < 2:
+    if not args.src:
         print("请提供源文件名！")
         sys.exit()  # 如果没有提供，则退出程序
 
+    if args.batch:
+        sys.exit(0 if runBatch(args) else 1)
+
+    if len(args.src) > 1:
+        print("一次只能编译一个源文件，批量编译请使用 --batch")
+        sys.exit()
+
     # 获取当前工作目录并构建源文件的完整路径
-    srcPath = os.getcwd()
-    srcPath += os.sep
-    srcPath += sys.argv[1]
-
-    # 从源文件获取内容
-    l.getSrc(srcPath)
-
-    # 启动词法分析器
-    l.getRes()
-
-    # 将词法分析的结果输出到文件，每个元素单独一行
-    with open("lexical_analysis_result.txt", "w") as file:
-        file.write("lexical_analysis_result:\n")
-        for item in l.resList:
-            file.write(str(item) + "\n")
-
-    # 将词法分析的结果传递给语法分析器
-    p.getSen()
-
-    # 启动语法分析器
-    p.openOut()  # 打开输出文件
-    p.program()  # 开始语法分析并生成中间代码
-
-    # 将符号表和四元式列表输出到文件
-    with open("symbol_table_and_quater_list.txt", "w") as file:
-        file.write("symbol_table:\n")
-        for key, value in p.symbol_table.items():
-            file.write(f"{key}: {value}\n")
-        file.write("\nquater_list:\n")
-        for item in p.quate_list:
-            file.write(str(item) + "\n")
-
-    # 输出四元式到文件
-    p.outPutQuate()
-    p.closeOut()  # 关闭输出文件
+    srcPath = os.path.join(os.getcwd(), args.src[0])
+
+    if args.connect is not None:
+        client = server.CompileClient(args.connect)
+        response = client.compile(path=srcPath, lexer=args.lexer, stream=args.stream, engine=args.engine,
+                                  recover=args.recover, optimize=args.optimize)
+        client.close()
+        print(json.dumps(response, ensure_ascii=False))
+        sys.exit(0 if response["ok"] else 1)
+
+    if args.watch:
+        watch.watch(srcPath, lexPath=None if args.no_lex_output else "lexical_analysis_result.txt")
+        sys.exit()
+
+    # 词法分析、语法分析并生成中间代码，输出结果文件
+    session = s.CompilerSession(srcPath, lexer=args.lexer, stream=args.stream, jobs=args.jobs, engine=args.engine,
+                                lexPath=None if args.no_lex_output else "lexical_analysis_result.txt",
+                                cache=openCache(args), trace=args.trace, recover=args.recover,
+                                stats=args.stats is not None, optimize=args.optimize, bytecodePath=args.bytecode,
+                                run=args.run, stepLimit=args.step_limit, jit=not args.no_jit)
+    ok = session.compile()
+    if args.trace == "profile":
+        writeProfile(args, session.tracer)
+    if args.stats is not None:
+        writeStats(args, session)
+    if args.recover and session.diagnostics:
+        sys.exit(1)
+    if not ok:
+        sys.exit()
+    if args.run:
+        printVariables(session)
+        if session.runError is not None:
+            sys.exit(1)
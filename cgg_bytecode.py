@@ -0,0 +1,240 @@
+# 四元式字节码文件
+# 把符号表和四元式列表保存为带版本号的二进制文件，读取时用 mmap 映射文件，
+# 四元式直接从映射的内存中读取，不复制、不解析文本，编译结果可以在不同的机器之间传递。
+#
+# 文件格式（小端序，各节按 8 字节对齐）：
+#   文件头    HEADER：魔数、版本、标志、四元式数、名字数、常数数、符号数、临时变量数、名字节的字节数
+#   常数节    常数数 个 int64
+#   符号节    符号数 条 (名字下标 int32, 值的编码 int32)，值的编码与运算对象相同（None 为 '_' 的编码）
+#   四元式节  四元式数 条 (运算编码, 运算对象1, 运算对象2, 结果) 4 个 int32，编码见 cgg_quad
+#   名字节    (名字数 + 1) 个 int32 的偏移量，之后是 UTF-8 编码的名字
+
+import os
+import sys
+import mmap
+import struct
+import shutil
+import tempfile
+from array import array
+import cgg_quad as q  # 导入四元式存储模块
+
+MAGIC = b"CGGQ"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIIII")
+RECORD = 4  # 每条四元式的 int32 个数
+BUFFER = 1 << 20  # 复制四元式节时的缓冲区大小
+
+class FormatError(ValueError):
+    """
+    不是字节码文件，或者文件的版本不受支持、内容不完整。
+    """
+
+# 对齐到 8 字节所需的填充
+def padding(size):
+    return -size % 8
+
+# 以小端序输出数组
+def littleEndian(data):
+    if sys.byteorder == "big":
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data
+
+class BytecodeWriter:
+    """
+    分段写入字节码文件：write() 把四元式记录追加到临时文件中，
+    finish() 再把它与常数、符号和名字组装成完整的文件，先写临时文件再改名，读取方不会看到写了一半的文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = tempfile.TemporaryFile()
+        self.count = 0
+
+    def write(self, quads, count):
+        """
+        追加 QuadStore 中的前 count 条四元式。
+        """
+        records = array('i', bytes(4 * RECORD * count))
+        records[0::RECORD] = array('i', quads.ops[:count])
+        records[1::RECORD] = quads.args1[:count]
+        records[2::RECORD] = quads.args2[:count]
+        records[3::RECORD] = quads.results[:count]
+        littleEndian(records).tofile(self.records)
+        self.count += count
+
+    def finish(self, symbol_table, quads, temps=0):
+        """
+        写出完整的文件。quads 为写入四元式时使用的 QuadStore，提供常数池和名字表。
+        """
+        names = list(quads.names)
+        nameIndex = dict(quads.names.index)
+        constants = list(quads.constants)
+        constIndex = {value: i for i, value in enumerate(constants)}
+        symbols = array('i')
+        for name, value in symbol_table.items():
+            i = nameIndex.get(name)
+            if i is None:
+                i = nameIndex[name] = len(names)
+                names.append(name)
+            if value is None:
+                code = q.NONE
+            else:
+                j = constIndex.get(value)
+                if j is None:
+                    j = constIndex[value] = len(constants)
+                    constants.append(value)
+                code = j << 2 | q.CONST
+            symbols.append(i)
+            symbols.append(code)
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = array('i', [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        blob = b"".join(encoded)
+
+        header = HEADER.pack(MAGIC, VERSION, 0, self.count, len(names), len(constants), len(symbol_table),
+                             temps, len(blob))
+        tmpPath = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmpPath, "wb") as file:
+                file.write(header + bytes(padding(HEADER.size)))
+                for section in (array('q', constants), symbols):
+                    littleEndian(section).tofile(file)
+                    file.write(bytes(padding(len(section) * section.itemsize)))
+                self.records.seek(0)
+                shutil.copyfileobj(self.records, file, BUFFER)
+                littleEndian(offsets).tofile(file)
+                file.write(bytes(padding(len(offsets) * offsets.itemsize)))
+                file.write(blob)
+            os.replace(tmpPath, self.path)
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.unlink(tmpPath)
+            raise
+        finally:
+            self.records.close()
+
+    def discard(self):
+        """
+        放弃写入，不生成文件。
+        """
+        self.records.close()
+
+def write(path, symbol_table, quads, temps=0):
+    """
+    把符号表和四元式列表写入字节码文件。quads 不是 QuadStore 时先转换。
+    """
+    if not isinstance(quads, q.QuadStore) or quads.codes is None:
+        quads = q.QuadStore(quads)
+    writer = BytecodeWriter(path)
+    writer.write(quads, len(quads))
+    writer.finish(symbol_table, quads, temps)
+
+class NameSection:
+    """
+    名字节中的名字，按下标读取时才解码。
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        name = self.cache.get(i)
+        if name is None:
+            if not 0 <= i < len(self):
+                raise IndexError("名字下标超出范围")
+            name = self.cache[i] = str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+        return name
+
+class BytecodeFile:
+    """
+    映射到内存的字节码文件。quads 是直接读取映射内存的 QuadStore（只读），
+    symbol_table 为符号表，temps 为临时变量的个数。
+    使用完毕后调用 close()，也可以用作上下文管理器。
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            try:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise FormatError(f"{path}: 不是字节码文件") from None  # 空文件无法映射
+        try:
+            self.views = []
+            self.load(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def view(self, offset, count, typecode):
+        """
+        文件中从 offset 开始的 count 个 typecode 类型的元素。大端序的机器上复制并转换字节序。
+        """
+        size = count * struct.calcsize(typecode)
+        if offset + size > len(self.map):
+            raise FormatError("字节码文件不完整")
+        raw = memoryview(self.map)[offset:offset + size]
+        self.views.append(raw)
+        if sys.byteorder == "big":
+            data = array(typecode, raw)
+            data.byteswap()
+            return memoryview(data)
+        data = raw.cast(typecode)
+        self.views.append(data)
+        return data
+
+    def load(self, path):
+        if len(self.map) < HEADER.size or self.map[:4] != MAGIC:
+            raise FormatError(f"{path}: 不是字节码文件")
+        magic, version, flags, n, nameCount, constCount, symbolCount, temps, blobSize = \
+            HEADER.unpack_from(self.map)
+        if version != VERSION:
+            raise FormatError(f"{path}: 不支持的字节码版本 {version}")
+        offset = HEADER.size + padding(HEADER.size)
+        constants = self.view(offset, constCount, 'q')
+        offset += constCount * 8
+        symbols = self.view(offset, 2 * symbolCount, 'i')
+        offset += 8 * symbolCount
+        records = self.view(offset, RECORD * n, 'i')
+        offset += 4 * RECORD * n
+        offsets = self.view(offset, nameCount + 1, 'i')
+        offset += 4 * (nameCount + 1)
+        offset += padding(offset)
+        if offset + blobSize > len(self.map):
+            raise FormatError("字节码文件不完整")
+        blob = memoryview(self.map)[offset:offset + blobSize]
+        self.views.append(blob)
+        names = NameSection(offsets, blob)
+
+        columns = [records[i::RECORD] for i in range(RECORD)]
+        self.views.extend(columns)
+        self.quads = q.QuadStore.fromColumns(*columns, constants, names)
+        self.symbol_table = {names[symbols[i]]: self.quads.decode(symbols[i + 1]) if symbols[i + 1] else None
+                             for i in range(0, len(symbols), 2)}
+        self.temps = temps
+
+    def close(self):
+        """
+        释放映射内存的视图并关闭映射。仍在使用 quads 的切片时无法关闭，抛出 BufferError。
+        """
+        for data in reversed(self.views):
+            data.release()
+        self.views = []
+        self.quads = None
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# 打开字节码文件
+def load(path):
+    return BytecodeFile(path)
@@ -0,0 +1,138 @@
+# 编译缓存
+# 以源代码字节、编译选项和编译器版本的哈希值为键，把单词、符号表和四元式列表
+# 以 JSON 形式保存在缓存目录中（数组为小端序字节的 base64 编码）。命中时跳过词法分析和语法分析，直接输出结果。
+# 缓存条目只含数据，不使用 pickle：缓存目录可能被多个用户共用，读取条目不能执行其中的代码。
+# 缓存总大小超过预算时按最近使用时间淘汰最旧的条目。
+# 写入先写临时文件再原子地改名，淘汰时持有目录锁，多个编译进程可以同时使用同一个缓存目录。
+
+import os
+import sys
+import json
+import fcntl
+import base64
+import hashlib
+import tempfile
+from array import array
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024  # 默认的缓存预算（字节）
+ENTRY_SUFFIX = ".cgc"  # 缓存条目文件的扩展名
+
+_compilerVersion = None
+
+# 编译器版本：编译器各模块源代码的哈希值，修改编译器后旧的缓存条目自动失效
+def compilerVersion():
+    global _compilerVersion
+    if _compilerVersion is None:
+        digest = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(here)):
+            if name.startswith("cgg") and name.endswith(".py"):
+                with open(os.path.join(here, name), "rb") as file:
+                    digest.update(name.encode("utf-8") + b"\0" + file.read())
+        _compilerVersion = digest.hexdigest()
+    return _compilerVersion
+
+# 把 "256M"、"1G"、"4096" 这样的大小转换为字节数
+def parseSize(text):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+# 把数组转换为缓存条目中的文本：小端序字节的 base64 编码
+def packArray(data):
+    if sys.byteorder == "big":
+        data = array(data.typecode, data)
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode("ascii")
+
+# 由 packArray() 的结果还原数组，内容不完整时抛出 ValueError
+def unpackArray(typecode, text):
+    data = array(typecode, base64.b64decode(text, validate=True))
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+class CompileCache:
+    """
+    内容寻址的磁盘编译缓存。
+    每个条目是缓存目录中的一个文件，文件的修改时间记录最近一次使用的时间。
+    """
+
+    def __init__(self, directory, maxBytes=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, options):
+        """
+        计算缓存键。source 为源代码字节，options 为影响编译结果的选项。
+        """
+        digest = hashlib.sha256()
+        digest.update(compilerVersion().encode("ascii"))
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """
+        读取缓存条目（JSON 数据），未命中时返回None。
+        """
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+            os.utime(path)  # 记录最近使用的时间
+        except (OSError, ValueError):
+            return None  # 不存在、正在被淘汰或已损坏的条目都视为未命中
+        return entry
+
+    def put(self, key, entry):
+        """
+        写入缓存条目，并在超出预算时淘汰旧条目。entry 必须能够表示为 JSON。
+        """
+        fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(entry, file, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmpPath, self.path(key))
+        except BaseException:
+            try:
+                os.unlink(tmpPath)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        按最近使用时间从旧到新删除条目，直到缓存总大小不超过预算。
+        """
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            if total <= self.maxBytes:
+                return
+            entries.sort()
+            for mtime, size, path in entries:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.maxBytes:
+                    break
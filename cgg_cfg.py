@@ -0,0 +1,294 @@
+# 控制流图
+# 把四元式列表划分为基本块并建立基本块之间的控制流，在控制流图上删除不可达的基本块、
+# 把跳到跳转语句的跳转直接指向最终目标、删除结果不再被使用的临时变量赋值，
+# 最后重新编号，输出与 Parser.quate_list 格式相同的四元式列表
+
+import itertools
+import cgg_parser as p  # 导入语法分析器模块
+import cgg_quad as q    # 导入四元式存储模块
+
+# 临时变量的名字
+def isTemp(place):
+    return type(place) is str and place.startswith('#TEMP')
+
+# 四元式 [运算, 运算对象1, 运算对象2, 结果] 是否不会在运行时出错、结果不被使用时可以删除：
+# 加减乘的结果可能超出64位整数范围，除数不是常数或为 0、-1 的除法可能除以0或超出范围（INT_MIN / -1），
+# 删除它们会让出错的程序正常结束，必须保留
+def removable(quad):
+    op = quad[0]
+    if op == '/':
+        return type(quad[2]) is int and quad[2] not in (0, -1)
+    return op not in ('+', '-', '*')
+
+class BasicBlock:
+    """
+    基本块：只能从第一条四元式进入、从最后一条四元式离开的四元式序列。
+    quads 中的四元式为 [运算, 运算对象1, 运算对象2, 结果]，跳转的结果是目标基本块。
+    """
+
+    def __init__(self, quads):
+        self.quads = quads
+        self.succ = []   # 后继基本块
+        self.pred = []   # 前驱基本块
+        self.line = 0    # 重新编号后第一条四元式的行号
+
+    def jump(self):
+        """
+        基本块末尾的跳转四元式，没有跳转时返回None。
+        """
+        if self.quads and self.quads[-1][0] in p.JUMP_OPS:
+            return self.quads[-1]
+        return None
+
+    def fallsThrough(self):
+        """
+        执行完基本块后能否顺序执行下一个基本块。
+        """
+        jump = self.jump()
+        return jump is None or jump[0] != 'jmp'
+
+class ControlFlowGraph:
+    """
+    四元式列表的控制流图。blocks 按四元式的原有顺序排列，第一个基本块是入口，
+    最后一个是空的出口基本块，跳到程序末尾（最后一行的下一行）的跳转以它为目标。
+    """
+
+    def __init__(self, quads):
+        rows = [list(quad[1:]) for quad in quads]
+        n = len(rows)
+        # 基本块的首行：第一行、跳转的目标和跳转的下一行
+        leaders = {1, n + 1}
+        for line, (op, arg1, arg2, result) in enumerate(rows, 1):
+            if op in p.JUMP_OPS:
+                leaders.add(result)
+                leaders.add(line + 1)
+        starts = sorted(line for line in leaders if 1 <= line <= n + 1)
+        blockAt = {}
+        self.blocks = []
+        for start, end in zip(starts, starts[1:]):
+            block = BasicBlock(rows[start - 1:end - 1])
+            blockAt[start] = block
+            self.blocks.append(block)
+        self.exit = BasicBlock([])
+        blockAt[n + 1] = self.exit
+        self.blocks.append(self.exit)
+        for block in self.blocks:
+            jump = block.jump()
+            if jump is not None:
+                jump[3] = blockAt[jump[3]]
+        self.link()
+
+    def link(self):
+        """
+        根据基本块末尾的跳转和排列顺序重新建立前驱和后继。
+        """
+        for block in self.blocks:
+            block.succ = []
+            block.pred = []
+        for block, following in zip(self.blocks, self.blocks[1:]):
+            jump = block.jump()
+            if jump is not None:
+                block.succ.append(jump[3])
+            if block.fallsThrough() and following not in block.succ:
+                block.succ.append(following)
+            for succ in block.succ:
+                succ.pred.append(block)
+
+    def removeUnreachable(self):
+        """
+        删除从入口不可达的基本块，返回是否删除了基本块。
+        可达基本块顺序执行的下一个基本块也是可达的，删除后其余基本块的顺序执行关系不变。
+        """
+        reached = {id(self.blocks[0])}
+        work = [self.blocks[0]]
+        while work:
+            for succ in work.pop().succ:
+                if id(succ) not in reached:
+                    reached.add(id(succ))
+                    work.append(succ)
+        blocks = [block for block in self.blocks if id(block) in reached or block is self.exit]
+        if len(blocks) == len(self.blocks):
+            return False
+        self.blocks = blocks
+        self.link()
+        return True
+
+    def removeEmpty(self):
+        """
+        删除不是跳转目标的空基本块（合并跳转之后的空基本块都不再是跳转目标），返回是否删除了基本块。
+        """
+        targets = {id(block.jump()[3]) for block in self.blocks if block.jump() is not None}
+        blocks = [block for block in self.blocks if block.quads or block is self.exit or id(block) in targets]
+        if len(blocks) == len(self.blocks):
+            return False
+        self.blocks = blocks
+        self.link()
+        return True
+
+    def threadJumps(self):
+        """
+        跳转的目标是空的基本块或只有一条无条件跳转的基本块时，直接跳到最终的目标。
+        返回是否修改了跳转。
+        """
+        following = dict(zip(map(id, self.blocks), self.blocks[1:]))
+        changed = False
+        for block in self.blocks:
+            jump = block.jump()
+            if jump is None:
+                continue
+            target = jump[3]
+            seen = set()
+            while target is not self.exit and id(target) not in seen:  # 跳转构成的死循环保持不变
+                seen.add(id(target))
+                if not target.quads:
+                    target = following[id(target)]
+                elif len(target.quads) == 1 and target.quads[0][0] == 'jmp':
+                    target = target.quads[0][3]
+                else:
+                    break
+            if target is not jump[3]:
+                jump[3] = target
+                changed = True
+        if changed:
+            self.link()
+        return changed
+
+    def liveOut(self):
+        """
+        活跃变量分析：返回每个基本块出口处活跃的临时变量集合（以基本块的 id 为键）。
+        只分析临时变量，程序中的变量在程序结束时都视为活跃。
+        """
+        use = {}
+        define = {}
+        for block in self.blocks:
+            used = set()
+            defined = set()
+            for op, arg1, arg2, result in reversed(block.quads):
+                if op not in p.JUMP_OPS and isTemp(result):
+                    defined.add(result)
+                    used.discard(result)
+                if isTemp(arg1):
+                    used.add(arg1)
+                if isTemp(arg2):
+                    used.add(arg2)
+            use[id(block)] = used
+            define[id(block)] = defined
+        liveIn = {id(block): set() for block in self.blocks}
+        liveOut = {id(block): set() for block in self.blocks}
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(self.blocks):
+                out = set()
+                for succ in block.succ:
+                    out |= liveIn[id(succ)]
+                live = use[id(block)] | (out - define[id(block)])
+                if live != liveIn[id(block)] or out != liveOut[id(block)]:
+                    liveIn[id(block)] = live
+                    liveOut[id(block)] = out
+                    changed = True
+        return liveOut
+
+    def eliminateDeadStores(self):
+        """
+        删除给临时变量赋值、而该值之后不会再被读取的四元式，返回是否删除了四元式。
+        可能在运行时出错的运算（见 removable）即使结果不再被读取也保留。
+        """
+        removed = False
+        while True:
+            liveOut = self.liveOut()
+            changed = False
+            for block in self.blocks:
+                live = set(liveOut[id(block)])
+                quads = []
+                for quad in reversed(block.quads):
+                    op, arg1, arg2, result = quad
+                    if op not in p.JUMP_OPS and isTemp(result):
+                        if result not in live and removable(quad):
+                            changed = True
+                            continue
+                        live.discard(result)
+                    if isTemp(arg1):
+                        live.add(arg1)
+                    if isTemp(arg2):
+                        live.add(arg2)
+                    quads.append(quad)
+                quads.reverse()
+                block.quads = quads
+            if not changed:
+                return removed
+            removed = True
+
+    def freshTemps(self):
+        """
+        产生未被使用过的临时变量名的迭代器，供优化过程引入新的临时变量。
+        """
+        start = max((int(place[5:]) for block in self.blocks for quad in block.quads for place in quad[1:]
+                     if isTemp(place)), default=0)
+        return ('#TEMP' + str(index) for index in itertools.count(start + 1))
+
+    def allocateTemps(self):
+        """
+        按活跃范围重新分配临时变量：同时活跃的临时变量使用不同的编号，编号尽量小。
+        优化过程为了方便会引入新的临时变量，最后用这一步把临时变量压缩到最少。
+        返回使用的临时变量个数。
+        """
+        liveOut = self.liveOut()
+        conflicts = {}  # 临时变量 -> 与它同时活跃的临时变量
+        order = []      # 临时变量第一次出现的顺序
+        for block in self.blocks:
+            for quad in block.quads:
+                for place in quad[1:]:
+                    if isTemp(place) and place not in conflicts:
+                        conflicts[place] = set()
+                        order.append(place)
+        for block in self.blocks:
+            live = set(liveOut[id(block)])
+            for op, arg1, arg2, result in reversed(block.quads):
+                if op not in p.JUMP_OPS and isTemp(result):
+                    for other in live:
+                        if other != result:
+                            conflicts[result].add(other)
+                            conflicts[other].add(result)
+                    live.discard(result)
+                if isTemp(arg1):
+                    live.add(arg1)
+                if isTemp(arg2):
+                    live.add(arg2)
+        color = {}
+        for name in order:
+            used = {color[other] for other in conflicts[name] if other in color}
+            color[name] = next(index for index in range(1, len(used) + 2) if index not in used)
+        rename = {name: '#TEMP' + str(index) for name, index in color.items()}
+        for block in self.blocks:
+            for quad in block.quads:
+                for i in (1, 2, 3):
+                    if isTemp(quad[i]):
+                        quad[i] = rename[quad[i]]
+        return max(color.values(), default=0)
+
+    def toQuads(self):
+        """
+        重新编号，返回四元式列表（QuadStore），跳转的目标改写为目标基本块的行号。
+        """
+        line = 1
+        for block in self.blocks:
+            block.line = line
+            line += len(block.quads)
+        quads = q.QuadStore()
+        for block in self.blocks:
+            for op, arg1, arg2, result in block.quads:
+                if op in p.JUMP_OPS:
+                    result = result.line
+                quads.emit(op, arg1, arg2, result)
+        return quads
+
+# 在控制流图上反复删除死代码和合并跳转，直到不再变化
+def simplify(cfg):
+    while True:
+        changed = cfg.threadJumps()
+        changed = cfg.removeEmpty() or changed
+        changed = cfg.removeUnreachable() or changed
+        changed = cfg.eliminateDeadStores() or changed
+        if not changed:
+            return
@@ -0,0 +1,137 @@
+# 中间代码的输出
+# 四元式输出到输出端（文本文件 test.out 和 symbol_table_and_quater_list.txt，或字节码文件）。
+# 流式输出时，不会再被回填的四元式在语法分析的过程中就写入输出端并从内存中删除，
+# 内存中只保留从最早的待回填跳转开始的一段四元式，程序再长内存占用也不会增长。
+# 输出端先写临时文件，编译成功后才替换结果文件，出错时原来的结果文件保持不变。
+
+import os
+import shutil
+import tempfile
+import cgg_quad as q  # 导入四元式存储模块
+
+BUFFER = 1 << 16   # 输出文件的缓冲区大小
+WINDOW = 4096      # 流式输出时内存中积累的四元式达到这个数目才尝试输出
+
+# test.out 中一条四元式的文本形式，如 3: (j<, x, y, 6)
+def formatQuad(quad):
+    return "%s: (%s, %s, %s, %s)\n" % quad
+
+class TextSink:
+    """
+    文本输出端：四元式以 formatQuad() 的形式写入 outPath，以元组的形式写入 tablePath 的 quater_list 节，
+    每条四元式只解码一次。路径为None时不输出该文件。
+    tablePath 中符号表在四元式之前，而符号表在语法分析结束时才完整，四元式先写入临时文件，finish() 时再复制过去。
+    """
+
+    def __init__(self, outPath=None, tablePath=None):
+        self.outPath = outPath
+        self.tablePath = tablePath
+        self.out = open(tmpName(outPath), "w", buffering=BUFFER) if outPath is not None else None
+        self.table = tempfile.TemporaryFile("w+", buffering=BUFFER) if tablePath is not None else None
+
+    def write(self, quads, count):
+        """
+        输出 QuadStore 中的前 count 条四元式。
+        """
+        out, table = self.out, self.table
+        for quad in quads.rows(count):
+            if out is not None:
+                out.write(formatQuad(quad))
+            if table is not None:
+                table.write(str(quad) + "\n")
+
+    def finish(self, symbol_table, quads, temps=0):
+        if self.table is not None:
+            with open(tmpName(self.tablePath), "w", buffering=BUFFER) as file:
+                file.write("symbol_table:\n")
+                for key, value in symbol_table.items():
+                    file.write(f"{key}: {value}\n")
+                file.write("\nquater_list:\n")
+                self.table.seek(0)
+                shutil.copyfileobj(self.table, file, BUFFER)
+            self.table.close()
+            os.replace(tmpName(self.tablePath), self.tablePath)
+        if self.out is not None:
+            self.out.close()
+            os.replace(tmpName(self.outPath), self.outPath)
+
+    def discard(self):
+        if self.table is not None:
+            self.table.close()
+        if self.out is not None:
+            self.out.close()
+            os.unlink(tmpName(self.outPath))
+
+# 输出文件写入过程中使用的临时文件名
+def tmpName(path):
+    return f"{path}.{os.getpid()}.tmp"
+
+class StreamingQuadStore(q.QuadStore):
+    """
+    流式输出的四元式列表。目标为0（尚未回填）的跳转是待回填的跳转，
+    在它之前的四元式不会再被修改，积累到一定数目时写入输出端 sinks 并从内存中删除。
+    base 为已经输出的四元式个数，len() 为生成的四元式总数，迭代和下标只能访问内存中的四元式。
+    """
+
+    def __init__(self, sinks, window=WINDOW):
+        q.QuadStore.__init__(self)
+        self.sinks = sinks
+        self.window = window
+        self.limit = window   # 内存中的四元式达到这个数目时尝试输出
+        self.pending = set()  # 待回填的跳转的下标
+
+    def __len__(self):
+        return self.base + len(self.ops)
+
+    def emit(self, op, arg1, arg2, result):
+        q.QuadStore.emit(self, op, arg1, arg2, result)
+        if result == 0 and op in q.opCode and q.opCode[op] in q.JUMP_CODES:
+            self.pending.add(len(self) - 1)
+        # 结果存入临时变量时表达式还没有分析完，其中的四元式可能被撤销（见 Parser.retract），暂不输出
+        if len(self.ops) >= self.limit and not (type(result) is str and result.startswith('#TEMP')):
+            self.flush()
+
+    def patch(self, i, target):
+        self.results[i - self.base] = target << 2 | q.LINE
+        self.pending.discard(i)
+
+    def flush(self, final=False):
+        """
+        输出最早的待回填跳转之前的四元式，final 为True时输出全部四元式。
+        """
+        if final or not self.pending:
+            count = len(self.ops)
+        else:
+            count = min(self.pending) - self.base
+        if count:
+            for sink in self.sinks:
+                sink.write(self, count)
+            del self.ops[:count]
+            del self.args1[:count]
+            del self.args2[:count]
+            del self.results[:count]
+            self.base += count
+        self.limit = len(self.ops) + self.window
+
+    def finish(self, symbol_table, temps=0):
+        """
+        语法分析成功结束：输出剩余的四元式，完成各个输出端。
+        """
+        self.flush(final=True)
+        for sink in self.sinks:
+            sink.finish(symbol_table, self, temps)
+
+    def discard(self):
+        """
+        语法分析出错：放弃输出，原来的结果文件保持不变。
+        """
+        for sink in self.sinks:
+            sink.discard()
+
+# 把完整的四元式列表一次输出到各个输出端
+def emitAll(quads, sinks, symbol_table, temps=0):
+    if not isinstance(quads, q.QuadStore) or quads.codes is None:
+        quads = q.QuadStore(quads)
+    for sink in sinks:
+        sink.write(quads, len(quads))
+        sink.finish(symbol_table, quads, temps)
@@ -0,0 +1,189 @@
+# 编译执行
+# 把虚拟机指令中的一段循环（回边的目标到回边所在的指令）编译为 Python 函数：
+# 帧中的槽换成函数的局部变量，常数直接写成字面量，基本块之间用一个状态变量切换。
+# 编译得到的函数按生成的源代码缓存，同一个程序再次执行时不需要重新编译。
+#
+# 生成的函数 region(f, steps, limit) 从循环的第一条指令开始执行，
+# 离开循环时把修改过的变量写回帧 f，返回 (下一条指令的下标, 已执行的四元式条数)。
+# 执行的四元式条数与解释执行时完全相同：发生跳转后可能超过步数上限 limit 时返回跳转目标的下标，
+# 由解释器逐条执行并计数；除数为0或运算结果超出64位整数范围时在这条指令之前返回，
+# 由解释器重新执行这条指令并报告错误。
+
+import functools
+import cgg_lex as l  # 导入词法分析模块
+import cgg_quad as q  # 导入四元式存储模块
+
+MAX_REGION = 2000  # 编译的一段指令的最大条数，更长的循环只解释执行
+
+# 指令的运算编码与 cgg_quad 中的运算编码相同
+ASSIGN, DIV, JMP = q.opCode[':='], q.opCode['/'], q.opCode['jmp']
+BINARY = {q.opCode[op]: op for op in ('+', '-', '*')}
+TESTS = {q.opCode['j' + op]: op for op in ('<', '<=', '>', '>=')}
+TESTS[q.opCode['j=']] = '=='
+JUMPS = frozenset(TESTS) | {JMP}
+
+class RegionWriter:
+    """
+    生成一段指令 [first, last] 对应的 Python 函数的源代码。
+    instructions 为 (运算编码, 槽号, 槽号, 结果槽号或跳转目标) 的列表，constants 为常数的槽号 -> 值，
+    reach 为从每条指令开始最多顺序执行的指令条数（见 cgg_vm.VM）。
+    """
+
+    def __init__(self, instructions, first, last, constants, reach):
+        self.instructions = instructions
+        self.first = first
+        self.last = last
+        self.constants = constants
+        self.reach = reach
+        self.bounds = set()   # 跳转目标的 reach，函数开头计算 limit 减去它们的值
+        self.written = set()  # 循环中赋值的槽
+        self.read = set()     # 循环中读取的槽（不含常数）
+        self.lines = []
+
+    def operand(self, slot):
+        value = self.constants.get(slot)
+        if value is not None:
+            return repr(value) if value >= 0 else f"({value!r})"
+        self.read.add(slot)
+        return f"v{slot}"
+
+    def target(self, slot):
+        self.written.add(slot)
+        return f"v{slot}"
+
+    def emit(self, indent, text):
+        self.lines.append("    " * indent + text)
+
+    def writeBack(self, indent):
+        self.emit(indent, "WRITE_BACK")  # 生成完毕后才知道所有赋值过的槽
+
+    def leave(self, indent, pc, steps="steps"):
+        """
+        离开循环，下一条指令为 pc。
+        """
+        self.writeBack(indent)
+        self.emit(indent, f"return {pc}, {steps}")
+
+    def jump(self, indent, target, label, current):
+        """
+        发生跳转：转到目标基本块或离开循环。从目标开始顺序执行可能超过步数上限时也离开循环，由解释器逐条执行。
+        """
+        if target not in label:
+            self.leave(indent, target)
+            return
+        self.bounds.add(self.reach[target])
+        self.emit(indent, f"if steps > limit{self.reach[target]}:")
+        self.leave(indent + 1, target)
+        self.emit(indent, f"b = {label[target]}")
+        if label[target] <= current:
+            self.emit(indent, "continue")
+
+    def write(self):
+        instructions = self.instructions
+        first, last = self.first, self.last
+        leaders = {first}
+        for pc in range(first, last + 1):
+            op, a, b, c = instructions[pc]
+            if op in JUMPS:
+                if first <= c <= last:
+                    leaders.add(c)
+                if pc < last:
+                    leaders.add(pc + 1)
+        starts = sorted(leaders)
+        label = {start: i for i, start in enumerate(starts)}
+        ends = starts[1:] + [last + 1]
+        self.emit(1, "b = 0")
+        self.emit(1, "while True:")
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            self.emit(2, f"if b == {i}:")
+            for pc in range(start, end):
+                op, a, b, c = instructions[pc]
+                offset = pc - start
+                if op == ASSIGN:
+                    source = self.operand(a)
+                    self.emit(3, f"{self.target(c)} = {source}")
+                elif op in BINARY:
+                    self.emit(3, f"r = {self.operand(a)} {BINARY[op]} {self.operand(b)}")
+                    self.checkRange(pc, offset)
+                    self.emit(3, f"{self.target(c)} = r")
+                elif op == DIV:
+                    self.divide(pc, offset, a, b, c)
+            count = end - start
+            self.emit(3, f"steps += {count}")
+            op, a, b, c = instructions[end - 1]
+            if op == JMP:
+                self.jump(3, c, label, i)
+                continue
+            if op in TESTS:
+                self.emit(3, f"if {self.operand(a)} {TESTS[op]} {self.operand(b)}:")
+                self.jump(4, c, label, i)
+                self.emit(3, "else:")
+                indent = 4
+            else:
+                indent = 3
+            if end <= last:
+                self.emit(indent, f"b = {i + 1}")
+            else:
+                self.leave(indent, end)
+        return self.finish()
+
+    def checkRange(self, pc, offset):
+        """
+        运算结果 r 超出64位整数范围时在第 pc 条指令之前离开循环。
+        """
+        self.emit(3, f"if r > {l.INT_MAX} or r < {l.INT_MIN}:")
+        self.leave(4, pc, f"steps + {offset}")
+
+    def divide(self, pc, offset, a, b, c):
+        x = self.operand(a)
+        divisor = self.constants.get(b)
+        if divisor is None:
+            y = self.operand(b)
+            self.emit(3, f"if {y} == 0:")
+            self.leave(4, pc, f"steps + {offset}")
+            quotient = f"abs({x}) // abs({y})"
+            self.emit(3, f"r = {quotient} if ({x} < 0) == ({y} < 0) else -({quotient})")
+            self.checkRange(pc, offset)  # INT_MIN / -1
+            self.emit(3, f"{self.target(c)} = r")
+        elif divisor > 0:
+            self.emit(3, f"{self.target(c)} = {x} // {divisor} if {x} >= 0 else -(-{x} // {divisor})")
+        elif divisor == -1:
+            self.emit(3, f"r = -{x}")
+            self.checkRange(pc, offset)
+            self.emit(3, f"{self.target(c)} = r")
+        elif divisor < 0:
+            self.emit(3, f"{self.target(c)} = -({x} // {-divisor}) if {x} >= 0 else -{x} // {-divisor}")
+        else:
+            self.leave(3, pc, f"steps + {offset}")  # 除数为常数0
+
+    def finish(self):
+        """
+        加上读入局部变量和计算步数界限的语句，展开写回的语句，返回完整的源代码。
+        """
+        slots = sorted(self.read | self.written)
+        writeBack = "; ".join(f"f[{slot}] = v{slot}" for slot in sorted(self.written)) or "pass"
+        lines = ["def region(f, steps, limit):"]
+        lines.extend(f"    v{slot} = f[{slot}]" for slot in slots)
+        lines.extend(f"    limit{bound} = limit - {bound}" for bound in sorted(self.bounds))
+        for line in self.lines:
+            if line.endswith("WRITE_BACK"):
+                line = line[:-len("WRITE_BACK")] + writeBack
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+@functools.lru_cache(maxsize=256)
+def build(source):
+    """
+    编译生成的源代码，返回其中的函数。相同的源代码只编译一次。
+    """
+    namespace = {}
+    exec(compile(source, "<cgg-jit>", "exec"), namespace)
+    return namespace["region"]
+
+def compileRegion(instructions, first, last, constants, reach):
+    """
+    把指令 [first, last] 编译为 Python 函数，指令过多时返回None。
+    """
+    if last - first + 1 > MAX_REGION:
+        return None
+    return build(RegionWriter(instructions, first, last, constants, reach).write())
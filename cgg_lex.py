@@ -2,9 +2,15 @@
 # 此模块提供一个函数，用于每次在解析器模块中被调用时从源代码中获取一个符号
 
 import os
+import io
 import string
 import sys
 import re
+import mmap
+from array import array
+from operator import itemgetter
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 # 以下定义了保留字：
 # 字典将保留的关键字/符号（在源代码中出现的）映射到程序的内部字符串类型
@@ -39,6 +45,100 @@ symDict = {
     ".": "."
 }
 
+# 单词种别的整数编码，语法分析器按编码进行分派
+kindList = [
+    "PROGRAM", "CALL", "BEGIN", "END", "CONST", "VAR", "WHILE", "DO", "IF", "THEN",
+    "+", "-", "*", "/", ":=", "=", ">", ">=", "<", "<=", "(", ")", ";", ",", ".",
+    "ident", "const", "EOF"
+]
+(PROGRAM, CALL, BEGIN, END, CONST, VAR, WHILE, DO, IF, THEN,
+ PLUS, MINUS, TIMES, SLASH, BECOMES, EQL, GTR, GEQ, LSS, LEQ,
+ LPAREN, RPAREN, SEMICOLON, COMMA, PERIOD,
+ IDENT, NUMBER, EOF) = range(len(kindList))
+kindCode = {kind: code for code, kind in enumerate(kindList)}  # 种别字符串 -> 编码
+
+# 整数的取值范围（64位有符号整数），超出范围的常数是词法错误
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+class NameTable(list):
+    """
+    标识符名字表：名字按首次出现的顺序编号，单词中只保存名字的下标。
+    """
+    def __init__(self):
+        list.__init__(self)
+        self.index = {}  # 名字 -> 下标
+
+    def intern(self, name):
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self)
+            self.append(name)
+        return i
+
+# 编译诊断信息：行号、列号（从1开始）和错误信息
+Diagnostic = namedtuple("Diagnostic", "line column message")
+
+class TokenBuffer:
+    """
+    紧凑的单词缓冲区。
+    每个单词编码为 (种别编码, 值编码)：种别编码存放在 array('B') 中，
+    值编码存放在 array('q') 中——常数为其数值，标识符为名字表中的下标，其他单词为0。
+    容错的词法分析（lexRecover()）还在 lines、columns 中记录每个单词的行号和列号，其他情况下为None。
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.values = array('q')
+        self.names = NameTable()
+        self.lines = None
+        self.columns = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        return (self.kinds[i], self.values[i])
+
+    def __iter__(self):
+        """按顺序产生已编码的单词 (种别编码, 值编码)，供语法分析器使用"""
+        return zip(self.kinds, self.values)
+
+    def append(self, token):
+        """添加一个 (种别字符串, 值) 形式的单词"""
+        kind, value = token
+        code = kindCode[kind]
+        self.kinds.append(code)
+        if code == IDENT:
+            self.values.append(self.names.intern(value))
+        else:
+            self.values.append(value or 0)
+
+    def extendCodes(self, tokens):
+        """添加一组已编码的单词，tokens 为列表"""
+        self.kinds.frombytes(bytes(map(itemgetter(0), tokens)))
+        self.values.fromlist(list(map(itemgetter(1), tokens)))
+
+    def position(self, i):
+        """第i个单词的 (行号, 列号)；i 超出范围时返回最后一个单词的位置，没有位置信息时返回 (0, 0)"""
+        if not self.lines:
+            return (0, 0)
+        i = min(i, len(self.lines) - 1)
+        return (self.lines[i], self.columns[i])
+
+    def tuples(self):
+        """按顺序产生 (种别字符串, 值) 形式的单词，即原来resList中的元组"""
+        names = self.names
+        for token in self:
+            yield decodeToken(token, names)
+
+# 将已编码的单词还原为 (种别字符串, 值) 形式
+def decodeToken(token, names):
+    code, value = token
+    if code == IDENT:
+        return ("ident", names[value])
+    if code == NUMBER:
+        return ("const", value)
+    return (kindList[code], None)
+
 srcList = []  # 源代码的内部表示形式，每个元素是源代码的一行
 """示例:
 
@@ -51,8 +151,8 @@ srcList = []  # 源代码的内部表示形式，每个元素是源代码的一
 
 """
 
-resList = []  # 词法分析的结果列表
-"""示例:
+resList = TokenBuffer()  # 词法分析的结果
+"""示例（resList.tuples() 的结果）:
 
 [ ("VAR", None),
   ("ident", "x"),
@@ -65,12 +165,23 @@ resList = []  # 词法分析的结果列表
 # 从磁盘读取源代码并将其转换为列表
 def getSrc(srcPath):
     global srcList
+    srcList = readSrc(srcPath)
+
+# 读取源代码，返回源代码行的列表
+def readSrc(srcPath):
     srcFile = open(srcPath, "r")
-    srcList = srcFile.readlines()
+    lines = srcFile.readlines()
     srcFile.close()
 
     # 在源代码列表的末尾添加'.'字符
-    srcList.append('.')  # 添加'.'字符作为程序结束标志
+    lines.append('.')  # 添加'.'字符作为程序结束标志
+    return lines
+
+# 把源代码文本切分为源代码行的列表，结果与readSrc()读取同样内容的文件相同
+def splitSrc(text):
+    lines = io.StringIO(text, newline=None).readlines()
+    lines.append('.')  # 添加'.'字符作为程序结束标志
+    return lines
 
 # 执行词法分析
 def getRes():
@@ -129,15 +240,17 @@ def getRes():
                 strToken += buf[now]
                 now += 1
                 # 防止超出缓冲区
-                if now == bufLen:
-                    resList.append(("const", int(strToken)))
-                else:
+                if now < bufLen:
                     while IsDigit(buf[now]):
                         strToken += buf[now]
                         now += 1
                         if now >= bufLen:
                             break # 光标超出缓冲区
-                    resList.append(("const", int(strToken)))
+                if int(strToken) > INT_MAX:
+                    print(f"词法错误（行号：{lineNo}）：常数{strToken}超出64位整数范围")
+                    errorFlag = True
+                    break
+                resList.append(("const", int(strToken)))
                 strToken = ""
             # 识别符号
             elif buf[now] == ":":  # since
@@ -209,6 +322,236 @@ def getRes():
         now = 0  # 重置缓冲区光标
         buf = ""  # 清空缓冲区
 
+# 快速扫描器使用的主正则表达式：一次匹配跳过空白并取出一个词素
+# 依次为：标识符或关键字、数字常量、双字符符号、其他单个字符（单字符符号或非法字符）
+wordPattern = re.compile(r"\s*([a-zA-Z][a-zA-Z\d]*|\d+|[:<>]=|.)")
+# 逐行扫描时使用的正则表达式，行内只把空格视为分隔符，与getRes()一致
+lineWordPattern = re.compile(r" *([a-zA-Z][a-zA-Z\d]*|\d+|[:<>]=|.)")
+# 空格和换行符以外的空白字符（如制表符），getRes()在行内遇到它们时会报告词法错误
+otherSpacePattern = re.compile(r"[^\S \n]")
+
+class TokenCache(dict):
+    """
+    词素缓存：将词素映射为已编码的单词 (种别编码, 值编码)，相同的词素共享同一个元组。
+    标识符登记在names名字表中。非法词素映射为None。
+    """
+    def __init__(self, names):
+        dict.__init__(self)
+        self.names = names
+
+    def __missing__(self, lexeme):
+        if lexeme in kwordDict:
+            token = (kindCode[kwordDict[lexeme]], 0)
+        elif lexeme in symDict:
+            token = (kindCode[symDict[lexeme]], 0)
+        elif IsLetter(lexeme[0]):
+            token = (IDENT, self.names.intern(lexeme))
+        elif IsDigit(lexeme[0]):
+            value = int(lexeme)
+            token = (NUMBER, value) if value <= INT_MAX else None  # 超出范围的常数与非法字符一样处理
+        else:
+            token = None
+        self[lexeme] = token
+        return token
+
+# 使用主正则表达式执行词法分析，结果与getRes()完全相同
+# getRes()保留作为参考实现，可用于等价性检查
+def getResFast():
+    lexLines(srcList, resList)
+
+# 对一组源代码行执行快速词法分析，将已编码的单词添加到buffer中
+# firstLineNo 为第一行的行号，report 用于报告词法错误信息
+def lexLines(lines, buffer, firstLineNo=1, report=print):
+    cache = TokenCache(buffer.names)
+    lookup = cache.__getitem__
+
+    # 快速路径：所有行只用一次findall切分，再通过缓存映射为结果元组
+    text = "\n".join(lines)
+    if otherSpacePattern.search(text) is None:
+        tokens = list(map(lookup, wordPattern.findall(text)))
+        if None not in tokens:
+            buffer.extendCodes(tokens)
+            return
+    del text
+
+    # 源代码中含有制表符等空白字符或存在词法错误时逐行扫描，
+    # 以得到与getRes()相同的结果和错误信息
+    buffer.extendCodes(list(scanLines(lines, cache, firstLineNo, report)))
+
+# 逐行扫描源代码并逐个产生已编码的单词，词法错误的处理与getRes()一致
+def scanLines(lines, cache, firstLineNo=1, report=print):
+    lookup = cache.__getitem__
+    lineNo = firstLineNo - 1
+    for line in lines:
+        lineNo += 1
+        line = line.strip()  # 去除行首尾的空白字符
+        if line == "":
+            continue  # 跳过空行
+
+        lexemes = lineWordPattern.findall(line)
+        tokens = list(map(lookup, lexemes))
+        if None not in tokens:
+            yield from tokens
+            continue
+
+        errorFlag = False
+        for lexeme, token in zip(lexemes, tokens):
+            if token is not None:
+                yield token
+            elif lexeme == ":":  # 与getRes()一致：报告错误后继续扫描本行
+                report("LexicalError(%d): missing '=' after ':'" % lineNo)
+                errorFlag = True
+            elif IsDigit(lexeme[0]):
+                report(f"词法错误（行号：{lineNo}）：常数{lexeme}超出64位整数范围")
+                return
+            else:
+                report(f"词法错误（行号：{lineNo}）")
+                return
+        if errorFlag:
+            return
+
+# 容错的词法分析：报告每个非法字符后跳过它继续分析，并记录每个单词的行号和列号
+# report 接收 Diagnostic
+def lexRecover(lines, buffer, report, firstLineNo=1):
+    lookup = TokenCache(buffer.names).__getitem__
+    tokens = []
+    buffer.lines = lineNos = array('i')
+    buffer.columns = columns = array('i')
+    lineNo = firstLineNo - 1
+    for line in lines:
+        lineNo += 1
+        text = line.strip()
+        if text == "":
+            continue
+        offset = len(line) - len(line.lstrip()) + 1  # 去掉的行首空白之后第一个字符的列号
+        for m in lineWordPattern.finditer(text):
+            lexeme = m.group(1)
+            token = lookup(lexeme)
+            if token is None:
+                if lexeme == ":":
+                    message = "词法错误: ':' 之后缺少 '='"
+                elif IsDigit(lexeme[0]):
+                    message = "词法错误: 常数 %s 超出64位整数范围" % lexeme
+                else:
+                    message = "词法错误: 非法字符 %r" % lexeme
+                report(Diagnostic(lineNo, offset + m.start(1), message))
+                continue
+            tokens.append(token)
+            lineNos.append(lineNo)
+            columns.append(offset + m.start(1))
+    buffer.extendCodes(tokens)
+
+# 源代码小于该字节数时，并行词法分析退化为单进程的getResFast()
+PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+# 并行词法分析：单词不会跨行，因此把源代码按行切分成若干块，
+# 在进程池中分别分析后按顺序合并，结果与getResFast()相同
+def getResParallel(workers=None, threshold=PARALLEL_THRESHOLD):
+    lexParallel(srcList, resList, workers, threshold)
+
+# 对一组源代码行执行并行词法分析，将已编码的单词添加到buffer中
+def lexParallel(lines, buffer, workers=None, threshold=PARALLEL_THRESHOLD, report=print):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    srcSize = sum(map(len, lines))
+    if workers <= 1 or srcSize < threshold:
+        lexLines(lines, buffer, report=report)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk in pool.map(lexChunk, splitLines(lines, workers * 4, srcSize)):
+            kinds, values, chunkNames, messages = chunk
+            # 把块内名字表的下标换成buffer名字表中的下标
+            remap = [buffer.names.intern(name) for name in chunkNames]
+            if remap != list(range(len(remap))):
+                values = array('q', [remap[v] if k == IDENT else v for k, v in zip(kinds, values)])
+            buffer.kinds.extend(kinds)
+            buffer.values.extend(values)
+            # 与getRes()一致：遇到词法错误后不再分析后面的源代码
+            if messages:
+                for message in messages:
+                    report(message)
+                pool.shutdown(cancel_futures=True)
+                break
+
+# 把源代码按行切分成大致等长的块，产生 (行列表, 第一行的行号)
+def splitLines(lines, count, size):
+    chunkSize = size // count + 1
+    start = 0
+    chunkLen = 0
+    for i, line in enumerate(lines):
+        chunkLen += len(line)
+        if chunkLen >= chunkSize:
+            yield (lines[start:i + 1], start + 1)
+            start = i + 1
+            chunkLen = 0
+    if start < len(lines):
+        yield (lines[start:], start + 1)
+
+# 在子进程中分析一块源代码，返回单词数组、名字表和词法错误信息
+def lexChunk(chunk):
+    lines, firstLineNo = chunk
+    buffer = TokenBuffer()
+    messages = []
+    lexLines(lines, buffer, firstLineNo, messages.append)
+    return (buffer.kinds, buffer.values, list(buffer.names), messages)
+
+# 流式词法分析：通过mmap映射源文件，按需逐行读取并产生已编码的单词
+# 标识符登记在names名字表中，report 用于报告词法错误信息
+# 不保存源代码列表和结果列表，内存占用与源文件大小无关
+def getStream(srcPath, names, report=print):
+    with open(srcPath, "rb") as srcFile:
+        try:
+            srcMap = mmap.mmap(srcFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件无法映射
+            srcMap = None
+        try:
+            yield from scanLines(streamLines(srcMap), StreamCache(names), report=report)
+        finally:
+            if srcMap is not None:
+                srcMap.close()
+
+# 逐行产生映射文件的内容，并在末尾添加'.'作为程序结束标志（与getSrc()一致）
+# 与readSrc()的通用换行模式一致，单独的'\r'和'\r\n'也作为换行符
+def streamLines(srcMap):
+    if srcMap is not None:
+        for rawLine in iter(srcMap.readline, b""):
+            if b"\r" in rawLine:
+                for part in rawLine.splitlines(keepends=True):
+                    yield part.decode("utf-8", errors="replace")
+            else:
+                yield rawLine.decode("utf-8", errors="replace")
+    yield "."
+
+class StreamCache(TokenCache):
+    """
+    流式词法分析使用的词素缓存，条目过多时清空，使内存占用保持有界。
+    """
+    maxSize = 65536
+
+    def __missing__(self, lexeme):
+        if len(self) >= self.maxSize:
+            self.clear()
+        return TokenCache.__missing__(self, lexeme)
+
+# 在已编码的单词流上旁路输出词法分析结果，每个单词还原后写成单独一行
+def teeTokens(tokens, names, file):
+    write = file.write
+    for token in tokens:
+        write(str(decodeToken(token, names)) + "\n")
+        yield token
+
+# 分别运行参考扫描器getRes()和快速扫描器getResFast()并比较结果
+# 结束后resList保存快速扫描器的结果
+def checkRes():
+    global resList
+    resList = TokenBuffer()
+    getRes()
+    refList = resList
+    resList = TokenBuffer()
+    getResFast()
+    return list(refList.tuples()) == list(resList.tuples())
+
 # 判断字符是否为字母
 def IsLetter(ch):
 	if re.match(r'[a-zA-Z]', ch):
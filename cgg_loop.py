@@ -0,0 +1,331 @@
+# 循环优化
+# 用支配关系找出控制流图中的自然循环（WHILE 循环体末尾跳回条件的 jmp 就是回边），
+# 为每个循环建立前置基本块，把循环中不变的运算外提到前置基本块中，
+# 并把归纳变量与常数的乘法强度削弱为每次循环增加一个常数的加法。
+# 先处理内层循环，外提到内层前置基本块中的运算在处理外层循环时还可以继续外提。
+
+import cgg_lex as l     # 导入词法分析器模块
+import cgg_parser as p  # 导入语法分析器模块
+import cgg_cfg as cfg   # 导入控制流图模块
+
+# 比较的两边交换后的跳转
+SWAPPED = {'j=': 'j=', 'j<': 'j>', 'j<=': 'j>=', 'j>': 'j<', 'j>=': 'j<='}
+# 条件相反的跳转，j= 的相反条件（不等于）不能限定范围
+NEGATED = {'j<': 'j>=', 'j>=': 'j<', 'j>': 'j<=', 'j<=': 'j>'}
+
+class Loop:
+    """
+    自然循环。header 为循环头（条件所在的基本块），blocks 为循环中的基本块，body 为它们的 id，
+    preheader 为前置基本块，无法插入前置基本块时为None。
+    """
+
+    def __init__(self, header):
+        self.header = header
+        self.blocks = [header]
+        self.body = {id(header)}
+        self.preheader = None
+
+    def add(self, block):
+        self.blocks.append(block)
+        self.body.add(id(block))
+
+# 用 Cooper、Harvey 和 Kennedy 的迭代算法计算直接支配者，返回 id -> 基本块 的字典，入口的直接支配者是它自己
+def dominators(graph):
+    entry = graph.blocks[0]
+    order = []      # 后序
+    visited = {id(entry)}
+    stack = [(entry, iter(entry.succ))]
+    while stack:
+        block, succs = stack[-1]
+        for succ in succs:
+            if id(succ) not in visited:
+                visited.add(id(succ))
+                stack.append((succ, iter(succ.succ)))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()  # 逆后序
+    index = {id(block): i for i, block in enumerate(order)}
+    idom = {id(entry): entry}
+    changed = True
+    while changed:
+        changed = False
+        for block in order[1:]:
+            new = None
+            for pred in block.pred:
+                if id(pred) not in idom:
+                    continue
+                if new is None:
+                    new = pred
+                    continue
+                # 两个支配者在支配树上的最近公共祖先
+                a, b = pred, new
+                while a is not b:
+                    while index[id(a)] > index[id(b)]:
+                        a = idom[id(a)]
+                    while index[id(b)] > index[id(a)]:
+                        b = idom[id(b)]
+                new = a
+            if idom.get(id(block)) is not new:
+                idom[id(block)] = new
+                changed = True
+    return idom
+
+# 支配树的先序和后序编号：a 支配 b 当且仅当 b 的编号区间包含在 a 的编号区间之内
+def dominatorIntervals(idom):
+    children = {}
+    root = None
+    for key, parent in idom.items():
+        if id(parent) == key:
+            root = parent
+        else:
+            children.setdefault(id(parent), []).append(key)
+    intervals = {}
+    counter = 0
+    stack = [(id(root), False)]
+    while stack:
+        key, done = stack.pop()
+        if done:
+            intervals[key] = (intervals[key], counter)
+            counter += 1
+            continue
+        intervals[key] = counter
+        counter += 1
+        stack.append((key, True))
+        stack.extend((child, False) for child in children.get(key, ()))
+    return intervals
+
+def dominates(intervals, a, b):
+    """
+    基本块 a 是否支配 b。
+    """
+    first, last = intervals[id(a)]
+    return first <= intervals[id(b)][0] <= last
+
+# 找出所有自然循环，同一个循环头的多条回边合并为一个循环，按循环的大小从内到外排列
+def findLoops(graph):
+    intervals = dominatorIntervals(dominators(graph))
+    loops = {}
+    for block in graph.blocks:
+        if id(block) not in intervals:
+            continue  # 不可达的出口
+        for succ in block.succ:
+            if dominates(intervals, succ, block):
+                loop = loops.setdefault(id(succ), Loop(succ))
+                # 从回边的起点沿前驱反向搜索到循环头
+                work = [block]
+                while work:
+                    member = work.pop()
+                    if id(member) not in loop.body:
+                        loop.add(member)
+                        work.extend(member.pred)
+    return sorted(loops.values(), key=lambda loop: len(loop.body))
+
+def insertPreheaders(graph, loops):
+    """
+    在每个循环头之前插入前置基本块：循环外跳到循环头的跳转改为跳到前置基本块，
+    前置基本块顺序执行到循环头。循环头前面的基本块属于循环且会顺序执行到循环头时无法插入。
+    前置基本块也属于包含这个循环的外层循环。
+    """
+    headers = {id(loop.header): loop for loop in loops}
+    blocks = []
+    previous = None
+    for block in graph.blocks:
+        loop = headers.get(id(block))
+        if loop is not None and not (previous is not None and id(previous) in loop.body
+                                     and previous.fallsThrough()):
+            preheader = loop.preheader = cfg.BasicBlock([])
+            for pred in block.pred:
+                jump = pred.jump()
+                if id(pred) not in loop.body and jump is not None and jump[3] is block:
+                    jump[3] = preheader
+            blocks.append(preheader)
+        blocks.append(block)
+        previous = block
+    graph.blocks = blocks
+    graph.link()
+    for loop in loops:
+        if loop.preheader is not None:
+            for outer in loops:
+                if outer is not loop and id(loop.header) in outer.body:
+                    outer.add(loop.preheader)
+
+# 只赋值一次、所有的使用都在赋值之后的同一个基本块中的临时变量。
+# 它们的赋值支配所有的使用，外提到前置基本块后仍然如此，可以安全地外提
+def singleTemps(graph):
+    defs = {}
+    escaping = set()
+    for block in graph.blocks:
+        defined = set()
+        for op, arg1, arg2, result in block.quads:
+            for place in (arg1, arg2):
+                if cfg.isTemp(place) and place not in defined:
+                    escaping.add(place)
+            if op not in p.JUMP_OPS and cfg.isTemp(result):
+                defs[result] = defs.get(result, 0) + 1
+                defined.add(result)
+    return {name for name, count in defs.items() if count == 1 and name not in escaping}
+
+# 循环中被赋值的名字及赋值的次数
+def definitions(blocks):
+    defined = {}
+    for block in blocks:
+        for op, arg1, arg2, result in block.quads:
+            if op not in p.JUMP_OPS:
+                defined[result] = defined.get(result, 0) + 1
+    return defined
+
+def hoistInvariants(loop, single):
+    """
+    把运算对象在循环中都不变的运算外提到前置基本块，返回外提的四元式个数。
+    只外提结果存入只赋值一次的临时变量的运算。循环可能一次也不执行，
+    外提的运算必须不会在运行时出错（见 cfg.removable）：加减乘的结果可能超出范围，
+    只有复制和除数是 0、-1 以外的常数的除法可以外提。
+    """
+    blocks = loop.blocks
+    defined = definitions(blocks)
+    invariant = lambda place: type(place) is int or place not in defined
+    hoisted = 0
+    changed = True
+    while changed:
+        changed = False
+        for block in blocks:
+            quads = []
+            for quad in block.quads:
+                op, arg1, arg2, result = quad
+                if (op not in p.JUMP_OPS and result in single and cfg.removable(quad)
+                        and invariant(arg1) and invariant(arg2)):
+                    loop.preheader.quads.append(quad)
+                    del defined[result]
+                    hoisted += 1
+                    changed = True
+                else:
+                    quads.append(quad)
+            block.quads = quads
+    return hoisted
+
+# 前置基本块之前给 name 赋的常数值的列表，某个前驱中 name 的值不是已知的常数时返回None
+def initialValues(loop, name):
+    values = []
+    for pred in loop.preheader.pred:
+        for op, arg1, arg2, result in reversed(pred.quads):
+            if op not in p.JUMP_OPS and result == name:
+                if op != ':=' or type(arg1) is not int:
+                    return None
+                values.append(arg1)
+                break
+        else:
+            return None
+    return values or None
+
+def inductionRange(loop, name, step):
+    """
+    归纳变量 name（每次循环增加 step）从进入循环到离开循环可能取到的值的范围 (最小值, 最大值)，
+    无法确定时返回None。要求进入循环前 name 被赋值为常数，循环头的条件跳转比较 name 与常数并决定是否离开循环：
+    name 只在通过循环条件之后增加，离开循环时最多比条件允许的范围多走一步。
+    """
+    values = initialValues(loop, name)
+    jump = loop.header.jump()
+    if values is None or jump is None or jump[0] == 'jmp':
+        return None
+    inside = [succ for succ in loop.header.succ if id(succ) in loop.body]
+    if len(inside) != 1 or len(loop.header.succ) != 2:
+        return None
+    op, arg1, arg2, target = jump
+    if arg1 == name and type(arg2) is int:
+        bound = arg2
+    elif arg2 == name and type(arg1) is int:
+        op, bound = SWAPPED[op], arg1
+    else:
+        return None
+    if target is not inside[0]:
+        op = NEGATED.get(op)  # 条件成立时离开循环
+    if step > 0 and op in ('j<', 'j<=', 'j='):
+        last = bound - 1 if op == 'j<' else bound  # 通过条件的最大值
+        return min(values), max(max(values), last + step)
+    if step < 0 and op in ('j>', 'j>=', 'j='):
+        last = bound + 1 if op == 'j>' else bound  # 通过条件的最小值
+        return min(min(values), last + step), max(values)
+    return None
+
+def reduceStrength(loop, single, fresh, inner=frozenset()):
+    """
+    基本归纳变量 i 在循环中只有一个赋值 i := i ± c（c 为常数），且不在内层循环 inner 的基本块中。
+    把 i * k（k 为常数）改为读取新的临时变量 s：前置基本块中计算 s := i * k，
+    每次 i 增加 c 之后紧接着 s 增加 c * k。返回削弱的乘法个数。
+    s 在进入循环时就被计算，并且比 i * k 多计算离开循环前的最后一步，
+    只有 inductionRange() 能证明 s 的所有取值都不超出范围时才削弱。
+    """
+    blocks = loop.blocks
+    defined = definitions(blocks)
+    steps = {}  # 归纳变量 -> 每次循环的增量
+    for block in blocks:
+        if id(block) in inner:
+            continue  # 内层循环中的赋值在一次循环中可能执行多次
+        for op, arg1, arg2, result in block.quads:
+            if defined.get(result) != 1:
+                continue
+            if op == '+' and arg1 == result and type(arg2) is int:
+                steps[result] = arg2
+            elif op == '+' and arg2 == result and type(arg1) is int:
+                steps[result] = arg1
+            elif op == '-' and arg1 == result and type(arg2) is int:
+                steps[result] = -arg2
+    steps = {name: step for name, step in steps.items() if step != 0}
+    if not steps:
+        return 0
+    ranges = {}
+    reduced = {}  # (归纳变量, 常数) -> 新的临时变量
+    count = 0
+    for block in blocks:
+        for i, quad in enumerate(block.quads):
+            op, arg1, arg2, result = quad
+            if op != '*' or result not in single:
+                continue
+            if arg1 in steps and type(arg2) is int:
+                key = (arg1, arg2)
+            elif arg2 in steps and type(arg1) is int:
+                key = (arg2, arg1)
+            else:
+                continue
+            name, factor = key
+            if name not in ranges:
+                ranges[name] = inductionRange(loop, name, steps[name])
+            if ranges[name] is None or not all(l.INT_MIN <= value * factor <= l.INT_MAX
+                                               for value in ranges[name] + (steps[name],)):
+                continue  # s 或它的增量可能超出范围时不削弱
+            if key not in reduced:
+                reduced[key] = next(fresh)
+                loop.preheader.quads.append(['*', name, factor, reduced[key]])
+            block.quads[i] = [':=', reduced[key], '_', result]
+            count += 1
+    # 归纳变量的每个赋值之后更新对应的临时变量
+    for block in blocks:
+        quads = []
+        for quad in block.quads:
+            quads.append(quad)
+            if quad[0] not in p.JUMP_OPS and quad[3] in steps:
+                for (name, factor), place in reduced.items():
+                    if name == quad[3]:
+                        quads.append(['+', place, steps[name] * factor, place])
+        block.quads = quads
+    return count
+
+# 对控制流图中的所有自然循环进行循环优化
+def optimize(graph):
+    loops = findLoops(graph)
+    if not loops:
+        return
+    insertPreheaders(graph, loops)
+    single = singleTemps(graph)
+    fresh = graph.freshTemps()
+    for loop in loops:
+        if loop.preheader is None:
+            continue
+        hoistInvariants(loop, single)
+        inner = set()
+        for other in loops:
+            if other is not loop and id(other.header) in loop.body:
+                inner |= other.body
+        reduceStrength(loop, single, fresh, inner)
@@ -0,0 +1,133 @@
+# 局部值编号
+# 在每个基本块内为运算结果编号，相同的运算（考虑 + 和 * 的交换律）只计算一次，
+# 之后重复的运算改为复用已有的结果；运算对象都是已知常数时在编译时求值。
+# 变量被重新赋值后它原来的值编号不再可用，依赖旧值的运算不会被错误地复用。
+
+import itertools
+import cgg_lex as l     # 导入词法分析器模块
+import cgg_parser as p  # 导入语法分析器模块
+import cgg_cfg as cfg   # 导入控制流图模块
+
+COMMUTATIVE = frozenset(('+', '*'))
+FOLD = {'+': int.__add__, '-': int.__sub__, '*': int.__mul__, '/': p.divide}
+
+class ValueTable:
+    """
+    一个基本块内的值编号表。
+    值编号是整数；常数的值编号由 constants 记录，names 记录每个名字当前的值编号，
+    exprs 记录 (运算, 值编号1, 值编号2) 对应的值编号，holders 记录每个值编号可能存放在哪些名字中。
+    """
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.names = {}
+        self.constants = {}  # 常数 -> 值编号
+        self.values = {}     # 值编号 -> 常数
+        self.exprs = {}
+        self.holders = {}
+
+    def number(self, place):
+        """
+        运算对象的值编号。第一次遇到的名字（基本块入口处的值）分配新的编号。
+        """
+        if type(place) is int:
+            number = self.constants.get(place)
+            if number is None:
+                number = self.constants[place] = next(self.counter)
+                self.values[number] = place
+            return number
+        number = self.names.get(place)
+        if number is None:
+            number = self.assign(place, next(self.counter))
+        return number
+
+    def assign(self, name, number):
+        self.names[name] = number
+        self.holders.setdefault(number, []).append(name)
+        return number
+
+    def holder(self, number):
+        """
+        当前仍然存放着该值的名字，没有时返回None。
+        """
+        for name in self.holders.get(number, ()):
+            if self.names.get(name) == number:
+                return name
+        return None
+
+def numberBlock(block, liveOut, fresh):
+    """
+    对一个基本块做值编号。liveOut 为基本块出口处活跃的临时变量，fresh 产生新的临时变量名。
+    临时变量会被回收重用，为了让先前的结果在块内一直可用，块内定义的临时变量改用只赋值一次的新名字；
+    最后一次定义在出口处仍然活跃的临时变量保持原名。
+    """
+    quads = block.quads
+    lastDef = {}
+    for i, quad in enumerate(quads):
+        if quad[0] not in p.JUMP_OPS and cfg.isTemp(quad[3]):
+            lastDef[quad[3]] = i
+    table = ValueTable()
+    rename = {}    # 块内临时变量的新名字
+    alias = {}     # 省略了赋值的新名字 -> 存放同一个值的新名字
+    single = set()  # 新名字，每个只赋值一次，在块内一直保存同一个值
+    read = lambda place: alias.get(rename.get(place, place), rename.get(place, place))
+    result = []
+    for i, (op, arg1, arg2, target) in enumerate(quads):
+        arg1 = read(arg1)
+        arg2 = read(arg2)
+        if op in p.JUMP_OPS:
+            result.append([op, constant(table, arg1), constant(table, arg2), target])
+            continue
+        name = target
+        if cfg.isTemp(target):
+            if lastDef[target] == i and target in liveOut:
+                rename.pop(target, None)
+            else:
+                name = rename[target] = next(fresh)
+                single.add(name)
+        number1 = table.number(arg1)
+        if op == ':=':
+            table.assign(name, number1)
+            result.append([op, constant(table, arg1), arg2, name])
+            continue
+        number2 = table.number(arg2)
+        value1 = table.values.get(number1)
+        value2 = table.values.get(number2)
+        if value1 is not None and value2 is not None and (op != '/' or value2 != 0):
+            value = FOLD[op](value1, value2)
+            if l.INT_MIN <= value <= l.INT_MAX:  # 超出范围的运算留到运行时报错
+                table.assign(name, table.number(value))
+                result.append([':=', value, '_', name])
+                continue
+        key = (op, number1, number2)
+        if op in COMMUTATIVE and number2 < number1:
+            key = (op, number2, number1)
+        number = table.exprs.get(key)
+        holder = table.holder(number) if number is not None else None
+        if holder is not None:
+            if name in single and holder in single:
+                table.names[name] = number
+                alias[name] = holder  # 以后直接读取 holder，不再需要复制
+                continue
+            table.assign(name, number)
+            result.append([':=', holder, '_', name])
+            continue
+        number = table.exprs[key] = next(table.counter)
+        table.assign(name, number)
+        result.append([op, constant(table, arg1), constant(table, arg2), name])
+    block.quads = result
+
+# 运算对象的值是已知常数时替换为常数
+def constant(table, place):
+    if type(place) is int or place == '_':
+        return place
+    number = table.names.get(place)
+    value = table.values.get(number) if number is not None else None
+    return place if value is None else value
+
+# 对控制流图中的每个基本块做值编号
+def numberValues(graph):
+    liveOut = graph.liveOut()
+    fresh = graph.freshTemps()
+    for block in graph.blocks:
+        numberBlock(block, liveOut[id(block)], fresh)
@@ -0,0 +1,32 @@
+# 中间代码优化
+# 按优化级别依次执行各个优化过程，输入和输出都是与 Parser.quate_list 格式相同的四元式列表
+
+import cgg_cfg as cfg  # 导入控制流图模块
+import cgg_lvn as lvn  # 导入局部值编号模块
+import cgg_peephole as peephole  # 导入窥孔优化模块
+import cgg_loop as loop  # 导入循环优化模块
+
+# 优化四元式列表，level 为0时不优化
+def optimize(quads, level=1):
+    if level <= 0 or not quads:
+        return quads
+    graph = cfg.ControlFlowGraph(quads)
+    cfg.simplify(graph)
+    lvn.numberValues(graph)
+    cfg.simplify(graph)
+    peephole.optimize(graph)
+    loop.optimize(graph)
+    cfg.simplify(graph)
+    peephole.optimize(graph)
+    graph.allocateTemps()
+    return graph.toQuads()
+
+# 使符号表中的临时变量与四元式列表中用到的一致，返回临时变量的个数
+def fitTemps(symbol_table, quads):
+    used = {place for quad in quads for place in quad[2:] if cfg.isTemp(place)}
+    count = max((int(name[5:]) for name in used), default=0)
+    for name in [name for name in symbol_table if cfg.isTemp(name)]:
+        del symbol_table[name]
+    for index in range(1, count + 1):
+        symbol_table['#TEMP' + str(index)] = None
+    return count
@@ -1,487 +1,628 @@
 # 语法分析和中间代码生成
 # 实现了一个递归下降解析器，用于解析PL/0语法
 
-import sys
+import heapq
+import itertools
+from collections import namedtuple
 import cgg_lex as l
+import cgg_quad as q  # 导入四元式存储模块
 
-# '指针'是从词法分析模块导入的句子的索引
-# 从词法分析模块导入的句子的索引。调用 getSen()方法对其进行设置
-# 全局变量定义：
-sentence = []  # 从词法分析模块导入的语句
-pointer = 0    # 语句中的索引
-has_error = False  # 错误标志
-cutoff = False     # 是否关闭调试功能的标志
-
-symbol_table = {}  # 符号表
-const_symbol_table = [] #常数变量表
-quate_list = []    # 四元式列表
-output_fp = None   # 输出文件指针
-used_temp_index = 0 # 用于生成临时变量名的索引（如T0, T1, T2...）
-output_line_no = 1  # 输出行号
-saved_line = 1      # 保存的行号，用于while循环
-refill_line = 1     # 需要回填的行号
-
-# 定义一些语义动作的函数：
-def check_in_table(id):
-    if id in symbol_table:
-        return True
-    else:
-        return False
-
+# 关系运算符对应的条件跳转运算
+RELOPS = {l.EQL: 'j=', l.LSS: 'j<', l.LEQ: 'j<=', l.GTR: 'j>', l.GEQ: 'j>='}
+# 结果为跳转目标行号的运算
+JUMP_OPS = frozenset(RELOPS.values()) | {'jmp'}
+# 比较结果在编译时确定时使用的运算
+COMPARE = {'j=': int.__eq__, 'j<': int.__lt__, 'j<=': int.__le__, 'j>': int.__gt__, 'j>=': int.__ge__}
 
+# 尚未生成四元式的加减运算结果：place + constant，place 是变量或临时变量的名字。
+# 表达式中的常数先累加在 constant 中，直到必须使用结果时才用 materialize() 生成一条四元式，
+# 因此 x+1+1*1+3 只生成 x+5 一条加法
+Sum = namedtuple("Sum", "place constant")
 
-def match(symName):
+def divide(a, b):
     """
-    匹配刚读入的符号并打印成功消息。
-    如果cutoff为True，则输出信息可以被封闭。
+    整数除法，商向零取整（与 C 语言相同），不是 Python 的向下取整。
     """
-    global pointer
-    global cutoff
-    pointer += 1
-    if not cutoff:
-        print("匹配 " + symName + "，指针移动到 %s" % sentence[pointer][0])
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
 
-def during(funcName):
+def split(place):
     """
-    在执行特定函数时打印调试信息。
+    把运算对象分解为 (名字, 常数)：常数的名字为 None，变量的常数部分为 0。
     """
-    global pointer
-    global cutoff
-    if not cutoff:
-        print("正在执行 " + funcName + "，指针位于 %s" % sentence[pointer][0])
+    if type(place) is int:
+        return None, place
+    if type(place) is Sum:
+        return place
+    return place, 0
 
-def error(info):
+class CompileError(Exception):
     """
-    输出语法错误信息并退出程序。
+    语法错误。语法分析器遇到错误时抛出，异常信息即输出给用户的错误信息。
     """
-    global has_error
-    has_error = True
-    print("语法错误: " + info)
-    sys.exit()
 
-def getSym():
-    """
-    获取当前指针指向的符号。
+class Parser:
     """
-    global pointer
-    return sentence[pointer][0]
+    递归下降语法分析器，同时生成四元式。
+    一次语法分析的全部状态都保存在实例中，多个实例之间互不影响。
 
-def getVal():
+    语法分析器按需从单词迭代器中逐个读取单词，只保留当前单词作为向前看符号。
+    单词已编码为 (种别编码, 值编码)，标识符的值编码是名字表中的下标。
+    调用 getSen()方法对其进行设置。
     """
-    获取当前指针指向的符号的值。
-    """
-    global pointer
-    return sentence[pointer][1]
 
-# 从源文件获取整个语句
-def getSen():
-    global sentence
-    sentence = l.resList
-    sentence.append(("EOF", None))  # 防止索引越界
+    def __init__(self, log=print):
+        self.sentence = None  # 从词法分析模块导入的单词迭代器
+        self.names = None     # 标识符名字表
+        self.token = None     # 当前单词
+        self.pointer = 0    # 已匹配的单词数
+        self.has_error = False  # 错误标志
+        self.log = log          # 输出提示信息的函数
 
-def append(name, value):
-    """
-    在符号表中添加一个条目。
-    """
-    symbol_table[name] = value
+        self.symbol_table = {}  # 符号表
+        self.const_symbol_table = [] #常数变量表
+        self.quate_list = q.QuadStore()    # 四元式列表
+        self.used_temp_index = 0 # 用于生成临时变量名的索引（如T0, T1, T2...），也是已分配的临时变量个数
+        self.free_temps = []     # 已释放、可以重新使用的临时变量编号（最小堆）
+        self.output_line_no = 1  # 输出行号
 
-def entry(name):
-    """
-    返回给定名称在符号表中的索引。
-    """
-    return name
+    # 定义一些语义动作的函数：
+    def check_in_table(self, id):
+        if id in self.symbol_table:
+            return True
+        else:
+            return False
+
+
+
+    def match(self, sym):
+        """
+        匹配刚读入的符号（种别编码），指针移动到下一个单词。
+        需要跟踪调试信息时，由 cgg_trace 在实例上安装包装后的方法。
+        """
+        self.pointer += 1
+        self.token = next(self.sentence)
+
+    def error(self, info):
+        """
+        报告语法错误，抛出 CompileError 结束语法分析。
+        """
+        self.has_error = True
+        raise CompileError("语法错误: " + info)
+
+    def semanticError(self, info):
+        """
+        报告语义错误（未定义的名字、对常量赋值）。与语法错误一样结束语法分析，
+        容错的语法分析器（cgg_recover.RecoveringParser）只记录错误并继续分析。
+        """
+        self.error(info)
+
+    def getSym(self):
+        """
+        获取当前指针指向的符号的种别编码。
+        """
+        return self.token[0]
+
+    def getVal(self):
+        """
+        获取当前指针指向的符号的值：标识符返回名字，常数返回数值。
+        """
+        if self.token[0] == l.IDENT:
+            return self.names[self.token[1]]
+        return self.token[1]
+
+    # 设置语法分析器的输入
+    # tokens 是产生已编码单词的可迭代对象，如 l.TokenBuffer 或 l.getStream()，
+    # tokenNames 是对应的名字表
+    def getSen(self, tokens, tokenNames):
+        self.sentence = itertools.chain(tokens, itertools.repeat((l.EOF, 0)))  # 单词读完后一直返回EOF
+        self.names = tokenNames
+        self.pointer = 0
+        self.token = next(self.sentence)
+
+    def append(self, name, value):
+        """
+        在符号表中添加一个条目。
+        """
+        self.symbol_table[name] = value
+
+    def entry(self, name):
+        """
+        返回给定名称在符号表中的索引。
+        """
+        return name
+
+    # 跳转目标的回填：条件的真出口和假出口各是一个待回填的四元式行号列表，
+    # 跳转目标确定后用 backpatch() 一次填入
+
+    def nextQuad(self):
+        """
+        下一条四元式的行号。
+        """
+        return self.output_line_no
+
+    def makeList(self, line):
+        """
+        建立只含一个待回填行号的列表。
+        """
+        return [line]
+
+    def backpatch(self, lines, target):
+        """
+        把列表中的跳转四元式的目标填为 target。
+        """
+        quads = self.quate_list
+        for line in lines:
+            quads.patch(line - 1, target)
+
+    # 临时变量的分配：每个临时变量只被使用一次，使用它的四元式生成时就用 freeTemp() 释放，
+    # newTemp() 优先重新使用编号最小的已释放临时变量。一条语句结束时所有临时变量都已释放，
+    # 因此临时变量的个数只取决于表达式的嵌套深度，而不随程序的长度增长
+
+    # 生成新的临时变量名，并将其添加到符号表中
+    def newTemp(self):
+        if self.free_temps:
+            return '#TEMP' + str(heapq.heappop(self.free_temps))
+        self.used_temp_index += 1
+        name = '#TEMP' + str(self.used_temp_index)
+        self.append(name, None)
+        return name
+
+    def freeTemp(self, place):
+        """
+        释放用过的运算对象。place 不是临时变量时什么也不做。
+        """
+        if type(place) is str and place.startswith('#TEMP'):
+            heapq.heappush(self.free_temps, int(place[5:]))
+
+    def gen(self, op, arg1, arg2, result):
+        """
+        生成四元式并添加到四元式列表中。
+        常数折叠的结果超出64位整数范围时报告语义错误；容错分析时继续，超出范围的常数换成0。
+        """
+        try:
+            self.quate_list.emit(op, arg1, arg2, result)
+        except OverflowError:
+            self.semanticError("常数表达式的值超出64位整数范围")
+            arg1, arg2 = (0 if type(place) is int and not l.INT_MIN <= place <= l.INT_MAX else place
+                          for place in (arg1, arg2))
+            self.quate_list.emit(op, arg1, arg2, result)
+        self.output_line_no += 1
+
+    # 以下语义动作由递归下降分析器和 cgg_stack 中的栈式分析器共用，保证两者生成相同的四元式
+
+    def binop(self, op, place1, place2):
+        """
+        二元运算。运算对象都是常数时在编译时求值（除数为 0 时除外，留到运行时报错），
+        加减运算中的常数合并到 Sum 中，乘除运算才生成四元式，结果存入新的临时变量。
+        乘以 0 的结果是常数 0，已经为另一个运算对象生成的四元式用 retract() 撤销；
+        其中有可能除以 0 的除法时不能撤销，照常生成乘法，保留运行时的错误。
+        """
+        name1, const1 = split(place1)
+        name2, const2 = split(place2)
+        if op == '+' or op == '-':
+            if op == '-':
+                const2 = -const2
+            if name2 is None:
+                return self.makeSum(name1, const1 + const2)
+            if name1 is None:
+                if op == '+':
+                    return self.makeSum(name2, const1 + const2)
+                # 常数减去名字：c - (y+k) 生成 (c-k) - y
+                self.freeTemp(name2)
+                place = self.newTemp()
+                self.gen(op, const1 + const2, name2, place)
+                return place
+            self.freeTemp(name1)
+            self.freeTemp(name2)
+            place = self.newTemp()
+            self.gen(op, name1, name2, place)
+            return self.makeSum(place, const1 + const2)
+        if op == '*':
+            if name2 is None:
+                # 让常数在左边
+                name1, const1, name2, const2, place2 = name2, const2, name1, const1, place1
+            if name1 is None:
+                if name2 is None:
+                    return const1 * const2
+                if const1 == 0 and self.retract(name2):
+                    self.freeTemp(name2)
+                    return 0
+                if const1 == 1:
+                    return place2
+                # c*(y+k) 生成 y*c，常数 k*c 留在 Sum 中
+                self.freeTemp(name2)
+                place = self.newTemp()
+                self.gen(op, name2, const1, place)
+                return self.makeSum(place, const1 * const2)
+        elif name2 is None:  # '/'
+            if const2 == 1:
+                return place1
+            if name1 is None and const2 != 0:
+                return divide(const1, const2)
+        place1 = self.materialize(place1)
+        place2 = self.materialize(place2)
+        self.freeTemp(place1)
+        self.freeTemp(place2)
+        place = self.newTemp()
+        self.gen(op, place1, place2, place)
+        return place
 
-def openOut():
-    """
-    打开输出文件。
-    """
-    global output_fp
-    output_fp = open("test.out", 'w')
+    def retract(self, place):
+        """
+        撤销计算临时变量 place 的四元式，返回是否撤销（place 不是临时变量时也返回True）。
+        运算结果不再需要时，留下的运算可能在运行时超出范围。一个运算对象的四元式连续地位于四元式列表的末尾，
+        从后往前删除计算 place 和它用到的临时变量的四元式。其中有除数不是非零常数的除法，
+        或这些四元式已经输出（见 cgg_emit.StreamingQuadStore）时不撤销。
+        """
+        quads = self.quate_list
+        needed = {place} if type(place) is str and place.startswith('#TEMP') else None
+        line = self.output_line_no
+        while needed:
+            line -= 1
+            if line <= quads.base:
+                return False
+            _, op, arg1, arg2, result = quads[line - 1 - quads.base]
+            if op in JUMP_OPS or result not in needed or (op == '/' and (type(arg2) is not int or arg2 == 0)):
+                return False
+            needed.discard(result)
+            needed.update(arg for arg in (arg1, arg2) if type(arg) is str and arg.startswith('#TEMP'))
+        quads.truncate(line)
+        self.output_line_no = line
+        return True
 
-def closeOut():
-    """
-    关闭输出文件。
-    """
-    global output_fp
-    output_fp.close()
+    def makeSum(self, name, constant):
+        """
+        name + constant 的最简形式：常数、名字或 Sum。
+        """
+        if name is None:
+            return constant
+        if constant == 0:
+            return name
+        return Sum(name, constant)
+
+    def materialize(self, place):
+        """
+        需要使用运算结果时，为 Sum 生成加法（或减去正数的减法）四元式，返回存放结果的名字。
+        常数和名字原样返回。
+        """
+        if type(place) is not Sum:
+            return place
+        name, constant = place
+        self.freeTemp(name)
+        result = self.newTemp()
+        if constant < 0:
+            self.gen('-', name, -constant, result)
+        else:
+            self.gen('+', name, constant, result)
+        return result
+
+    def negate(self, place):
+        """
+        取负：常数直接求值，否则生成 0 - place（-(x+k) 生成 -k - x）。
+        """
+        name, constant = split(place)
+        if name is None:
+            return -constant
+        return self.binop('-', -constant, name)
+
+    def relop(self, op, place1, place2):
+        """
+        生成关系运算的跳转：条件成立时的条件跳转和不成立时的无条件跳转，目标都等待回填。
+        返回 (真出口列表, 假出口列表)。
+        两边的常数移到同一边（x+1<y+3 比较 x-2 与 y），两边都是常数时只生成一条无条件跳转。
+        """
+        name1, const1 = split(place1)
+        name2, const2 = split(place2)
+        if name1 is None and name2 is None:
+            line = self.makeList(self.nextQuad())
+            self.gen("jmp", "_", "_", 0)
+            return (line, []) if COMPARE[op](const1, const2) else ([], line)
+        if name2 is None:
+            place1, place2 = name1, const2 - const1
+        elif name1 is None:
+            place1, place2 = const1 - const2, name2
+        else:
+            place1, place2 = self.materialize(self.makeSum(name1, const1 - const2)), name2
+        self.freeTemp(place1)
+        self.freeTemp(place2)
+        truelist = self.makeList(self.nextQuad())
+        self.gen(op, place1, place2, 0)
+        falselist = self.makeList(self.nextQuad())
+        self.gen("jmp", "_", "_", 0)
+        return truelist, falselist
+
+    def assign(self, name, place):
+        """
+        生成赋值的四元式。
+        """
+        place = self.materialize(place)
+        self.freeTemp(place)
+        self.gen(":=", place, "_", self.entry(name)) # 生成四元式
+
+    def ifThen(self, cond):
+        """
+        IF 的条件之后：真出口跳到 THEN 后面的语句。返回等待回填到语句之后的假出口。
+        """
+        truelist, falselist = cond
+        self.backpatch(truelist, self.nextQuad())
+        return falselist
+
+    def ifEnd(self, falselist):
+        """
+        IF 的语句之后：假出口跳过该语句。
+        """
+        self.backpatch(falselist, self.nextQuad())
+
+    def whileTest(self, cond):
+        """
+        WHILE 的条件之后：真出口跳到循环体。返回等待回填到循环之后的假出口。
+        """
+        truelist, falselist = cond
+        self.backpatch(truelist, self.nextQuad())
+        return falselist
+
+    def whileEnd(self, start, falselist):
+        """
+        WHILE 的循环体之后：跳回条件的开头 start，假出口跳出循环。
+        """
+        self.gen("jmp", '_', '_', start)
+        self.backpatch(falselist, self.nextQuad())
+
+    def operand(self):
+        """
+        匹配标识符或常数作为运算对象，返回其名字或数值；常量返回它的值。
+        """
+        # 如果当前符号是标识符
+        if self.getSym() == l.IDENT:
+            place = self.entry(self.getVal())  # 获取标识符的值
+            if not self.check_in_table(place):
+                self.semanticError(f'未定义变量{place}')
+            self.match(l.IDENT)
+            if place in self.const_symbol_table:
+                return self.symbol_table[place]  # 常量直接替换为它的值
+            return place
+        elif self.getSym() == l.NUMBER:  # 如果当前符号是常数
+            place = self.entry(self.getVal())
+            if not self.check_in_table(place) and type(place) not in (int, float):
+                self.semanticError(f'未定义常量{place}')
+            self.match(l.NUMBER)
+            return place
+        else:
+            self.error("因子中的语法错误。")
 
-def save_point():
-    """
-    保存当前输出行号。
+    # PL/0语言的EBNF描述如下：
     """
-    global output_line_no
-    global saved_line
-    saved_line = output_line_no
+    program	= block "."
 
-def getSavedPoint():
-    """
-    获取保存的行号。
-    """
-    global saved_line
-    return saved_line
+    	block	= [ CONST "ident" = "number" { "," ident "=" "number" } ";" ]
+    			  [ VAR "ident" { "," "ident" ";"}
+    			  { PROCEDURE "ident" ";" block ";"}
+    			  statement
+	
+    	statement = [ CALL "ident" |
+    				  BEGIN statement { ";" statement } END |
+    				  IF condition THEN statement |
+    				  WHILE condition DO statement |
+    				  "ident" ":=" expresssion ]
+	
+    	condition = ODD expression | 
+    				expression ( "=" | "#" | "<" | "<=" | ">" | ">=" ) expression
 
-def save_refill():
-    """
-    保存需要回填的行号。
-    """
-    global output_line_no
-    global refill_line
-    refill_line = output_line_no
+    	expression = [ "+" | "-" ] term { ( "+" | "-" ) term }
 
-def refill():
-    """
-    使用当前行号回填之前保存的行号。
-    """
-    global output_line_no
-    global refill_line
-    temp = quate_list[refill_line-1]
-    quate_list[refill_line-1] = (temp[0], temp[1], temp[2], temp[3], output_line_no)
-
-# 生成新的临时变量名，并将其添加到符号表中
-def newTemp():
-    global used_temp_index
-    used_temp_index += 1
-    name = '#TEMP' + str(used_temp_index)
-    append(name, None)
-    return name
-
-def gen(op, arg1, arg2, result):
-    """
-    生成四元式并添加到四元式列表中。
-    """
-    global output_line_no
-    quate_list.append((output_line_no, op, arg1, arg2, result))
-    output_line_no += 1
+    	term = factor { ( "*" | "/") factor }
 
-def gen2(op, arg1, arg2, offset):
-    """
-    生成具有跳转功能的四元式。
+    	factor = "ident" | "number" | "(" expression ")"
     """
-    global output_line_no
-    jump_to = output_line_no + offset
-    quate_list.append((output_line_no, op, arg1, arg2, jump_to))
-    output_line_no += 1
 
-def outPutQuate():
-    """
-    将四元式列表输出到文件。
-    """
-    for line in quate_list:
-        output_fp.write(str(line[0]) + ": (" + str(line[1]) + ", " + str(line[2]) + ", " + str(line[3]) + ", " + str(line[4]) + ")\n")
-
-# PL/0语言的EBNF描述如下：
-"""
-program	= block "."
-
-	block	= [ CONST "ident" = "number" { "," ident "=" "number" } ";" ]
-			  [ VAR "ident" { "," "ident" ";"}
-			  { PROCEDURE "ident" ";" block ";"}
-			  statement
-	
-	statement = [ CALL "ident" |
-				  BEGIN statement { ";" statement } END |
-				  IF condition THEN statement |
-				  WHILE condition DO statement |
-				  "ident" ":=" expresssion ]
-	
-	condition = ODD expression | 
-				expression ( "=" | "#" | "<" | "<=" | ">" | ">=" ) expression
-
-	expression = [ "+" | "-" ] term { ( "+" | "-" ) term }
-
-	term = factor { ( "*" | "/") factor }
-
-	factor = "ident" | "number" | "(" expression ")"
-"""
-
-# 对PL/0语法中每个非终结符的具体处理函数
-# program 函数：对应PL/0语法中的 "program" 非终结符
-def program():
-    during("program()")
-    if getSym() == "PROGRAM":
-        match("PROGRAM")  # 匹配并跳过 "PROGRAM" 关键字
-        if getSym() == "ident":
-            match("ident")    # 如果紧跟着的是标识符，则匹配并跳过程序名称
-    block()             # 继续解析程序主体
-    if getSym() == ".":
-        match(".")       # 匹配程序末尾的 "."
-        print("程序解析完成！")
-    else:
-        error("程序的末尾缺少 '.'。")
-
-# block 函数：对应PL/0语法中的 "block" 非终结符
-def block():
-    during("block()")
-
-    # 常量定义区域
-    if getSym() == "CONST":
-        match("CONST")
-        if getSym() == "ident":
-            id = getVal()
-            match("ident")
-            if getSym() == ":=":
-                match(":=")
-                if getSym() == "const":
-                    val = getVal()
-                    match("const")
-                    append(id, val) # 将常量添加到符号表
-                    const_symbol_table.append(id)
-                else:
-                    error("在 ':=' 之后缺少数字。")
-                while getSym() == ",":
-                    match(",")
-                    if getSym() == "ident":
-                        id = getVal()
-                        match("ident")
-                        if getSym() == ":=":
-                            match(":=")
-                            if getSym() == "const":
-                                val = getVal()
-                                match("const")
-                                append(id, val) # 将常量添加到符号表
-                                const_symbol_table.append(id)
+    # 对PL/0语法中每个非终结符的具体处理函数
+    # program 函数：对应PL/0语法中的 "program" 非终结符
+    def program(self):
+        if self.getSym() == l.PROGRAM:
+            self.match(l.PROGRAM)  # 匹配并跳过 "PROGRAM" 关键字
+            if self.getSym() == l.IDENT:
+                self.match(l.IDENT)    # 如果紧跟着的是标识符，则匹配并跳过程序名称
+        self.block()             # 继续解析程序主体
+        if self.getSym() == l.PERIOD:
+            self.match(l.PERIOD)       # 匹配程序末尾的 "."
+            if not self.has_error:     # 容错分析时可能已经记录了错误
+                self.log("程序解析完成！")
+        else:
+            self.error("程序的末尾缺少 '.'。")
+
+    # block 函数：对应PL/0语法中的 "block" 非终结符
+    def block(self):
+        # 常量定义区域
+        if self.getSym() == l.CONST:
+            self.match(l.CONST)
+            if self.getSym() == l.IDENT:
+                id = self.getVal()
+                self.match(l.IDENT)
+                if self.getSym() == l.BECOMES:
+                    self.match(l.BECOMES)
+                    if self.getSym() == l.NUMBER:
+                        val = self.getVal()
+                        self.match(l.NUMBER)
+                        self.append(id, val) # 将常量添加到符号表
+                        self.const_symbol_table.append(id)
+                    else:
+                        self.error("在 ':=' 之后缺少数字。")
+                    while self.getSym() == l.COMMA:
+                        self.match(l.COMMA)
+                        if self.getSym() == l.IDENT:
+                            id = self.getVal()
+                            self.match(l.IDENT)
+                            if self.getSym() == l.BECOMES:
+                                self.match(l.BECOMES)
+                                if self.getSym() == l.NUMBER:
+                                    val = self.getVal()
+                                    self.match(l.NUMBER)
+                                    self.append(id, val) # 将常量添加到符号表
+                                    self.const_symbol_table.append(id)
+                                else:
+                                    self.error("在 ':=' 之后缺少数字。")
                             else:
-                                error("在 ':=' 之后缺少数字。")
-                        else:
-                            error("在常量声明中缺少 ':='。")
-                if getSym() == ";":
-                    match(";")
+                                self.error("在常量声明中缺少 ':='。")
+                    if self.getSym() == l.SEMICOLON:
+                        self.match(l.SEMICOLON)
+                    else:
+                        self.error("在 CONST 声明后忘记了 ';'。")
                 else:
-                    error("在 CONST 声明后忘记了 ';'。")
+                    self.error("在常量声明中缺少 ':='。")
             else:
-                error("在常量声明中缺少 ':='。")
-        else:
-            error("在 CONST 声明中缺少标识符。")
-
-    # 变量定义区域
-    if getSym() == "VAR":
-        match("VAR")
-        if getSym() == "ident":
-            id = getVal()
-            match("ident")
-            append(id, 0) # 将变量添加到符号表
-            while getSym() == ",":
-                match(",")
-                if getSym() == "ident":
-                    id = getVal()
-                    match("ident")
-                    append(id, 0) # 将变量添加到符号表
+                self.error("在 CONST 声明中缺少标识符。")
+
+        # 变量定义区域
+        if self.getSym() == l.VAR:
+            self.match(l.VAR)
+            if self.getSym() == l.IDENT:
+                id = self.getVal()
+                self.match(l.IDENT)
+                self.append(id, 0) # 将变量添加到符号表
+                while self.getSym() == l.COMMA:
+                    self.match(l.COMMA)
+                    if self.getSym() == l.IDENT:
+                        id = self.getVal()
+                        self.match(l.IDENT)
+                        self.append(id, 0) # 将变量添加到符号表
+                    else:
+                        self.error("在 VAR 声明中缺少标识符。")
+                if self.getSym() == l.SEMICOLON:
+                    self.match(l.SEMICOLON)
                 else:
-                    error("在 VAR 声明中缺少标识符。")
-            if getSym() == ";":
-                match(";")
+                    self.error("在 VAR 声明后忘记了 ';'。")
             else:
-                error("在 VAR 声明后忘记了 ';'。")
-        else:
-            error("在 VAR 声明中缺少标识符。")
+                self.error("在 VAR 声明中缺少标识符。")
 
 
-    # 语句区域
-    statement()
-    return
-
-# statement 函数：对应PL/0语法中的 "statement" 非终结符
-def statement():
-    during("statement()")
+        # 语句区域
+        self.statement()
+        return
 
-    # 处理 CALL 语句
-    if getSym() == "CALL":
-        match("CALL")
-        if getSym() == "ident":
-            match("ident")
-            return
-        else:
-            error("在 'CALL' 后缺少标识符。")
-
-    # 处理 BEGIN...END 语句
-    if getSym() == "BEGIN":
-        match("BEGIN")
-        statement()
-        times = 0
-        while getSym() == ";":
-            match(";")
-            statement()
-            times += 1
-        if times != 0:
-            statement()
+    # statement 函数：对应PL/0语法中的 "statement" 非终结符
+    def statement(self):
+        # 处理 CALL 语句
+        if self.getSym() == l.CALL:
+            self.match(l.CALL)
+            if self.getSym() == l.IDENT:
+                self.match(l.IDENT)
+                return
+            else:
+                self.error("在 'CALL' 后缺少标识符。")
+
+        # 处理 BEGIN...END 语句
+        if self.getSym() == l.BEGIN:
+            self.match(l.BEGIN)
+            self.statement()
+            times = 0
+            while self.getSym() == l.SEMICOLON:
+                self.match(l.SEMICOLON)
+                self.statement()
+                times += 1
+            if times != 0:
+                self.statement()
         
 
-        if getSym() == "END":
-            match("END")
-            return
-        else:
-            error("在 'BEGIN...END' 语句中缺少 'END'。")
-
-    # 处理 IF...THEN... 语句
-    if getSym() == "IF":
-        match("IF")
-        condition()
-        if getSym() == "THEN":
-            match("THEN")
-            statement()
-            return
-        else:
-            error("在 'IF...THEN' 语句中缺少 'THEN'。")
-
-    # 处理 WHILE...DO... 语句
-    if getSym() == "WHILE":
-        match("WHILE")
-        save_point()   # 保存条件位置，以便返回
-        place1 = condition()  # 获取条件的结果：true/false
-        save_refill() # 记住这一行，我们将在 while...do 的最后一行回填 0
-        gen("jez", place1, "_", "0") # 跳出 while...do
-        if getSym() == "DO":
-            match("DO")
-            statement()
-            # 循环结束后，跳回条件
-            gen("jmp", '_', '_', getSavedPoint())
-            refill()  # 在这里回填
-            return
-        else:
-            error("在 'WHILE...DO' 语句中缺少 'DO'。")
-
-    # 处理赋值语句
-    if getSym() == "ident":
-        i = getVal()
-        match("ident")
-        if getSym() == ":=":
-            match(":=")
-            if i in const_symbol_table:
-                error('不能对常量赋值')
-            place = expression()
-            gen(":=", place, "_", entry(i)) # 生成四元式
-            return
-        else:
-            error("缺少赋值符号。")
+            if self.getSym() == l.END:
+                self.match(l.END)
+                return
+            else:
+                self.error("在 'BEGIN...END' 语句中缺少 'END'。")
+
+        # 处理 IF...THEN... 语句
+        if self.getSym() == l.IF:
+            self.match(l.IF)
+            falselist = self.ifThen(self.condition())
+            if self.getSym() == l.THEN:
+                self.match(l.THEN)
+                self.statement()
+                self.ifEnd(falselist)
+                return
+            else:
+                self.error("在 'IF...THEN' 语句中缺少 'THEN'。")
+
+        # 处理 WHILE...DO... 语句
+        if self.getSym() == l.WHILE:
+            self.match(l.WHILE)
+            start = self.nextQuad()   # 条件的开头，循环体结束后跳回这里
+            falselist = self.whileTest(self.condition())
+            if self.getSym() == l.DO:
+                self.match(l.DO)
+                self.statement()
+                # 循环结束后，跳回条件
+                self.whileEnd(start, falselist)
+                return
+            else:
+                self.error("在 'WHILE...DO' 语句中缺少 'DO'。")
+
+        # 处理赋值语句
+        if self.getSym() == l.IDENT:
+            i = self.getVal()
+            self.match(l.IDENT)
+            if self.getSym() == l.BECOMES:
+                self.match(l.BECOMES)
+                if i in self.const_symbol_table:
+                    self.semanticError('不能对常量赋值')
+                place = self.expression()
+                self.assign(i, place)
+                return
+            else:
+                self.error("缺少赋值符号。")
 
     
 
-    # 其他情况，语句可能为空
-    return
-
-# condition 函数：对应PL/0语法中的 "condition" 非终结符
-def condition():
-    during("condition()")
-    if getSym() == "ODD":
-        match("ODD")
-        expression()
+        # 其他情况，语句可能为空
         return
-    else:
-        place1 = expression()
-        if getSym() == "=":
-            op = 'j=' #getSym()
-            match("=")
-        elif getSym() == "<":
-            op = 'j<' #getSym()
-            match("<")
-        elif getSym() == "<=":
-            op = 'j<=' #getSym()
-            match("<=")
-        elif getSym() == ">":
-            op = 'j>' #getSym()
-            match(">")
-        elif getSym() == ">=":
-            op = 'j>=' #getSym()
-            match(">=")
-        else:
-            error("在表达式中缺少操作符（'=', '#', '<', '<=', '>', '>='）。")
-        place2 = expression()
-        place = newTemp()
-        gen2(op, place1, place2, 3)  # nextstart + 3
-        gen(":=", 0, "_", place)
-        gen2("jmp", "_", "_", 2)   # nextstart + 2
-        gen(":=", 1, "_", place)
-        return place
 
-# expression 函数：对应PL/0语法中的 "expression" 非终结符
-def expression():
-    during("expression()")
-    # 如果当前符号是"+"或"-"
-    if getSym() == "+" or getSym() == "-":
-        if getSym() == "+":
-            match("+")  # 匹配"+"
-            place1 = term()  # 处理第一个项
-            while getSym() == '+' or getSym() == '-':
-                sym = getSym()
-                match(sym)
-                place2 = term()
-                newplace2 = newTemp()
-                gen(sym, place1, place2, newplace2)
-                place1 = newplace2
-                match(getSym())
-            return place1
-                
-        else:  # 当前符号是"-"
-            match("-")  # 匹配"+"
-            place1 = term()  # 处理第一个项
-            newplace1 = newTemp()
-            gen('-', 0, place1, newplace1)
-            place1 = newplace1
-            while getSym() == '+' or getSym() == '-':
-                sym = getSym()
-                match(sym)
-                place2 = term()
-                newplace2 = newTemp()
-                gen(sym, place1, place2, newplace2)
-                place1 = newplace2
-            return place1
-        
-    else:  # 表达式不是以"+"或"-"开始
-        place1 = term()  # 处理第一个项
-
-        while getSym() == '+' or getSym() == '-':
-            sym = getSym()
-            match(sym)
-            place2 = term()
-            newplace2 = newTemp()
-            gen(sym, place1, place2, newplace2)
-            place1 = newplace2
+    # condition 函数：对应PL/0语法中的 "condition" 非终结符
+    def condition(self):
+        # 词法分析器没有 ODD 保留字，这里只处理关系运算
+        place1 = self.expression()
+        op = RELOPS.get(self.getSym())
+        if op is None:
+            self.error("在表达式中缺少操作符（'=', '#', '<', '<=', '>', '>='）。")
+        self.match(self.getSym())
+        place2 = self.expression()
+        return self.relop(op, place1, place2)
+
+    # expression 函数：对应PL/0语法中的 "expression" 非终结符
+    def expression(self):
+        # 表达式可以以一元的"+"或"-"开始
+        sign = self.getSym()
+        if sign == l.PLUS or sign == l.MINUS:
+            self.match(sign)
+        place1 = self.term()  # 处理第一个项
+        if sign == l.MINUS:
+            place1 = self.negate(place1)
+
+        while self.getSym() == l.PLUS or self.getSym() == l.MINUS:
+            sym = self.getSym()
+            self.match(sym)
+            place2 = self.term()
+            place1 = self.binop(l.kindList[sym], place1, place2)
         return place1
 
-# term 函数：对应PL/0语法中的 "term" 非终结符
-def term():
-    during("term()")
-    place1 = factor()  # 处理第一个因子
-    # 处理项中的后续因子
-    while getSym() == "*" or getSym() == "/":
-        if getSym() == "*":
-            match("*")
-            place2 = factor()
-            place = newTemp()  # 创建新的临时变量
-            gen('*', place1, place2, place)  # 生成乘法四元式
-            place1 = place
-        else:  # 当前符号是"/"
-            match("/")
-            place2 = factor()
-            place = newTemp()  # 创建新的临时变量
-            gen('/', place1, place2, place)  # 生成除法四元式
-            place1 = place
-    else:
+    # term 函数：对应PL/0语法中的 "term" 非终结符
+    def term(self):
+        place1 = self.factor()  # 处理第一个因子
+        # 处理项中的后续因子：生成乘法或除法四元式
+        while self.getSym() == l.TIMES or self.getSym() == l.SLASH:
+            sym = self.getSym()
+            self.match(sym)
+            place2 = self.factor()
+            place1 = self.binop(l.kindList[sym], place1, place2)
         return place1
 
-# factor 函数：对应PL/0语法中的 "factor" 非终结符
-def factor():
-    during("factor()")
-    # 如果当前符号是标识符
-    if getSym() == "ident":
-        place = entry(getVal())  # 获取标识符的值
-        if not check_in_table(place):
-            error(f'未定义变量{place}')
-        match("ident")
-        return place
-    elif getSym() == "const":  # 如果当前符号是常数
-        place = entry(getVal())
-        if not check_in_table(place) and type(place) not in (int, float):
-            error(f'未定义常量{place}')
-        match("const")
-        return place
-    elif getSym() == "(":  # 如果当前符号是左括号
-        match("(")
-        place = expression()
-        if getSym() == ")":
-            match(")")
-            return place  # 不生成四元式，直接返回
-        else:
-            error("在这个句子中缺少右括号 ')'。")
-    else:
-        error("因子中的语法错误。")
+    # factor 函数：对应PL/0语法中的 "factor" 非终结符
+    def factor(self):
+        if self.getSym() == l.LPAREN:  # 如果当前符号是左括号
+            self.match(l.LPAREN)
+            place = self.expression()
+            if self.getSym() == l.RPAREN:
+                self.match(l.RPAREN)
+                return place  # 不生成四元式，直接返回
+            else:
+                self.error("在这个句子中缺少右括号 ')'。")
+        # 标识符或常数
+        return self.operand()
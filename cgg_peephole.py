@@ -0,0 +1,157 @@
+# 窥孔优化
+# 在控制流图的基本块上用小窗口匹配相邻的四元式：
+#   把结果存入临时变量、紧接着复制给变量的两条四元式合并为直接写入变量；
+#   复制给临时变量的值在基本块内直接读取来源，省去复制；
+#   删除自己赋值给自己的四元式和跳到下一行的跳转；
+#   条件跳转越过紧随其后的无条件跳转时，改为一条条件相反的跳转。
+# j= 没有相反的运算（中间代码中没有不等于的跳转），保持原样。
+
+import cgg_parser as p  # 导入语法分析器模块
+import cgg_cfg as cfg   # 导入控制流图模块
+
+# 条件相反的跳转
+INVERSE = {'j<': 'j>=', 'j>=': 'j<', 'j>': 'j<=', 'j<=': 'j>'}
+
+# 各个基本块顺序执行时实际到达的基本块（跳过空的基本块）
+def fallthroughs(graph):
+    following = {}
+    target = None
+    for block in reversed(graph.blocks):
+        following[id(block)] = target
+        if block.quads or block is graph.exit:
+            target = block
+    return following
+
+# 跳到 block 时实际到达的基本块
+def resolve(block, following):
+    return block if block.quads else following[id(block)] or block
+
+# 基本块中每条四元式之后活跃的临时变量
+def liveAfter(block, liveOut):
+    live = set(liveOut)
+    after = []
+    for op, arg1, arg2, result in reversed(block.quads):
+        after.append(frozenset(live))
+        if op not in p.JUMP_OPS and cfg.isTemp(result):
+            live.discard(result)
+        if cfg.isTemp(arg1):
+            live.add(arg1)
+        if cfg.isTemp(arg2):
+            live.add(arg2)
+    after.reverse()
+    return after
+
+def foldCopies(graph):
+    """
+    (op, a, b, T) (:=, T, _, x) 且 T 之后不再使用时合并为 (op, a, b, x)；删除 (:=, x, _, x)。
+    """
+    liveOut = graph.liveOut()
+    changed = False
+    for block in graph.blocks:
+        after = liveAfter(block, liveOut[id(block)])
+        quads = []
+        for quad, live in zip(block.quads, after):
+            op, arg1, arg2, result = quad
+            if op == ':=':
+                if arg1 == result:
+                    changed = True
+                    continue
+                if (quads and cfg.isTemp(arg1) and arg1 not in live and quads[-1][3] == arg1
+                        and quads[-1][0] not in p.JUMP_OPS):
+                    quads[-1][3] = result
+                    changed = True
+                    continue
+            quads.append(quad)
+        block.quads = quads
+    return changed
+
+def propagateCopies(graph):
+    """
+    (:=, a, _, T) 之后基本块内读取 T 的地方改为读取 a，然后删除这条复制。
+    要求 T 在最后一次读取之后不再活跃，并且在此之前 a 没有被重新赋值。
+    """
+    liveOut = graph.liveOut()
+    changed = False
+    for block in graph.blocks:
+        quads = block.quads
+        after = liveAfter(block, liveOut[id(block)])
+        removed = set()
+        for i, (op, source, arg2, temp) in enumerate(quads):
+            if op != ':=' or not cfg.isTemp(temp) or source == temp:
+                continue
+            reads = []
+            for j in range(i + 1, len(quads)):
+                quad = quads[j]
+                if temp in (quad[1], quad[2]):
+                    reads.append(j)
+                if quad[0] in p.JUMP_OPS:
+                    continue
+                if quad[3] == temp:
+                    break
+                if quad[3] == source and temp in after[j]:
+                    reads = None  # a 被重新赋值时 T 仍然活跃
+                    break
+            if not reads or temp in after[reads[-1]]:
+                continue
+            for j in reads:
+                quad = quads[j]
+                if quad[1] == temp:
+                    quad[1] = source
+                if quad[2] == temp:
+                    quad[2] = source
+            removed.add(i)
+            changed = True
+        if removed:
+            block.quads = [quad for i, quad in enumerate(quads) if i not in removed]
+    return changed
+
+def fuseBranches(graph):
+    """
+    (jop, a, b, L1) (jmp, _, _, L2) L1: ... 改为 (jop 的相反运算, a, b, L2) L1: ...，
+    无条件跳转所在的基本块只能从条件跳转顺序执行到达。
+    """
+    following = fallthroughs(graph)
+    changed = False
+    for block in graph.blocks:
+        jump = block.jump()
+        if jump is None or jump[0] not in INVERSE:
+            continue
+        middle = following[id(block)]
+        if (middle is None or len(middle.quads) != 1 or middle.quads[0][0] != 'jmp'
+                or len(middle.pred) != 1):
+            continue
+        if resolve(jump[3], following) is not following[id(middle)]:
+            continue
+        jump[0] = INVERSE[jump[0]]
+        jump[3] = middle.quads[0][3]
+        middle.quads = []
+        changed = True
+    if changed:
+        graph.link()
+    return changed
+
+def dropJumps(graph):
+    """
+    删除跳到顺序执行时就会到达的基本块的跳转（条件跳转没有副作用，也可以删除）。
+    """
+    following = fallthroughs(graph)
+    changed = False
+    for block in graph.blocks:
+        jump = block.jump()
+        if jump is not None and resolve(jump[3], following) is following[id(block)]:
+            block.quads.pop()
+            changed = True
+    if changed:
+        graph.link()
+    return changed
+
+# 反复进行窥孔优化，直到不再变化
+def optimize(graph):
+    while True:
+        changed = fuseBranches(graph)
+        changed = dropJumps(graph) or changed
+        changed = foldCopies(graph) or changed
+        changed = propagateCopies(graph) or changed
+        if not changed:
+            return
+        cfg.simplify(graph)
@@ -0,0 +1,229 @@
+# 四元式存储
+# 四元式 (行号, 运算, 运算对象1, 运算对象2, 结果) 按列存放在几个平行的数组中：
+# 运算编码为 array('B')，三个运算对象编码为 array('i')，行号就是下标加一，不单独保存。
+# 运算对象编码的低两位是标记，其余位是下标或数值：
+#   NONE  '_'，编码为0
+#   CONST 常数，高位是常数池中的下标
+#   NAME  变量或临时变量的名字，高位是名字表中的下标
+#   LINE  跳转目标行号，高位就是行号
+# 与每条四元式一个元组相比，内存占用减少一个数量级，回填跳转目标只需改写数组中的一项。
+
+from array import array
+from itertools import islice
+import cgg_lex as l  # 导入词法分析模块
+
+# 运算，编码为在元组中的下标
+OPS = ('+', '-', '*', '/', ':=', 'j=', 'j<', 'j<=', 'j>', 'j>=', 'jmp')
+opCode = {op: code for code, op in enumerate(OPS)}  # 运算 -> 编码
+JUMP_CODES = frozenset(opCode[op] for op in ('j=', 'j<', 'j<=', 'j>', 'j>=', 'jmp'))
+
+# 运算对象编码的标记
+NONE, CONST, NAME, LINE = range(4)
+
+class Decoder(dict):
+    """
+    运算对象编码 -> 运算对象的缓存，连续解码大量四元式时避免重复计算。
+    """
+
+    def __init__(self, store):
+        dict.__init__(self)
+        self.store = store
+
+    def __missing__(self, code):
+        place = self[code] = self.store.decode(code)
+        return place
+
+class QuadStore:
+    """
+    紧凑的四元式列表，可以像 Parser.quate_list 原来的元组列表一样使用：
+    按下标或切片读取、迭代、append()/extend() 的都是 (行号, 运算, 运算对象1, 运算对象2, 结果) 元组。
+    切片是与原列表共用常数池和名字表的新四元式列表，其中的行号从1开始。
+    """
+
+    base = 0  # 第一条四元式之前的四元式个数（见 cgg_emit.StreamingQuadStore）
+
+    def __init__(self, quads=()):
+        self.ops = array('B')
+        self.args1 = array('i')
+        self.args2 = array('i')
+        self.results = array('i')
+        self.constants = []        # 常数池
+        self.names = l.NameTable()  # 名字表
+        self.codes = {'_': NONE}   # 运算对象 -> 编码
+        self.extend(quads)
+
+    def encode(self, place):
+        """
+        运算对象的编码，第一次遇到的常数和名字加入常数池或名字表。
+        常数超出64位整数范围（字节码文件和虚拟机都无法表示）时抛出 OverflowError。
+        """
+        code = self.codes.get(place)
+        if code is None:
+            if type(place) is str:
+                code = self.names.intern(place) << 2 | NAME
+            else:
+                if not l.INT_MIN <= place <= l.INT_MAX:
+                    raise OverflowError(f"常数 {place} 超出64位整数范围")
+                code = len(self.constants) << 2 | CONST
+                self.constants.append(place)
+            self.codes[place] = code
+        return code
+
+    def decode(self, code):
+        tag = code & 3
+        if tag == NAME:
+            return self.names[code >> 2]
+        if tag == CONST:
+            return self.constants[code >> 2]
+        if tag == LINE:
+            return code >> 2
+        return '_'
+
+    def emit(self, op, arg1, arg2, result):
+        """
+        添加一条四元式，行号为当前的长度加一。运算对象无法编码时不添加。
+        """
+        code = opCode[op]
+        arg1 = self.encode(arg1)
+        arg2 = self.encode(arg2)
+        result = result << 2 | LINE if code in JUMP_CODES else self.encode(result)
+        self.ops.append(code)
+        self.args1.append(arg1)
+        self.args2.append(arg2)
+        self.results.append(result)
+
+    def shiftTargets(self, lineDelta):
+        """
+        所有跳转的目标行号加上 lineDelta（四元式整体移动位置时使用）。
+        """
+        results = self.results
+        delta = lineDelta << 2
+        for i, code in enumerate(self.ops):
+            if code in JUMP_CODES:
+                results[i] += delta
+
+    def patch(self, i, target):
+        """
+        把第i条（从0开始）跳转四元式的目标改为 target。
+        """
+        self.results[i] = target << 2 | LINE
+
+    def truncate(self, line):
+        """
+        删除行号为 line 及之后的四元式（语法分析器撤销刚生成的四元式时使用）。
+        """
+        count = line - 1 - self.base
+        del self.ops[count:]
+        del self.args1[count:]
+        del self.args2[count:]
+        del self.results[count:]
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            part = self.share()
+            part.ops = self.ops[i]
+            part.args1 = self.args1[i]
+            part.args2 = self.args2[i]
+            part.results = self.results[i]
+            return part
+        if i < 0:
+            i += len(self.ops)
+        decode = self.decode
+        return (i + 1, OPS[self.ops[i]], decode(self.args1[i]), decode(self.args2[i]), decode(self.results[i]))
+
+    def __setitem__(self, i, quad):
+        """
+        替换第i条四元式，quad 中的行号被忽略。
+        i 为切片时用一组四元式替换这一段，条数可以不同。
+        """
+        if isinstance(i, slice):
+            if not (isinstance(quad, QuadStore) and quad.codes is self.codes):
+                part = self.share()
+                part.extend(quad)
+                quad = part
+            self.ops[i] = quad.ops
+            self.args1[i] = quad.args1
+            self.args2[i] = quad.args2
+            self.results[i] = quad.results
+            return
+        line, op, arg1, arg2, result = quad
+        code = opCode[op]
+        arg1 = self.encode(arg1)
+        arg2 = self.encode(arg2)
+        self.results[i] = result << 2 | LINE if code in JUMP_CODES else self.encode(result)
+        self.ops[i] = code
+        self.args1[i] = arg1
+        self.args2[i] = arg2
+
+    def __iter__(self):
+        return self.rows(len(self.ops))
+
+    def rows(self, count):
+        """
+        按顺序产生前 count 条四元式的 (行号, 运算, 运算对象1, 运算对象2, 结果) 元组，行号从 base + 1 开始。
+        """
+        decode = Decoder(self)
+        line = self.base
+        for code, arg1, arg2, result in islice(zip(self.ops, self.args1, self.args2, self.results), count):
+            line += 1
+            yield (line, OPS[code], decode[arg1], decode[arg2], decode[result])
+
+    def __eq__(self, other):
+        if isinstance(other, (QuadStore, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"QuadStore({list(self)!r})"
+
+    @classmethod
+    def fromColumns(cls, ops, args1, args2, results, constants, names):
+        """
+        直接使用给定的各列（如 mmap 上的 memoryview）建立四元式列表，不复制数据。
+        这样建立的四元式列表只能读取，不能添加或修改四元式。
+        """
+        store = cls.__new__(cls)
+        store.ops = ops
+        store.args1 = args1
+        store.args2 = args2
+        store.results = results
+        store.constants = constants
+        store.names = names
+        store.codes = None
+        return store
+
+    def share(self):
+        """
+        与自己共用常数池和名字表的空四元式列表。
+        """
+        part = QuadStore.__new__(QuadStore)
+        part.ops = array('B')
+        part.args1 = array('i')
+        part.args2 = array('i')
+        part.results = array('i')
+        part.constants = self.constants
+        part.names = self.names
+        part.codes = self.codes
+        return part
+
+    def append(self, quad):
+        """
+        添加一个 (行号, 运算, 运算对象1, 运算对象2, 结果) 元组，行号被忽略。
+        """
+        self.emit(*quad[1:])
+
+    def extend(self, quads):
+        """
+        添加一组四元式。quads 是共用常数池和名字表的 QuadStore 时直接连接数组。
+        """
+        if isinstance(quads, QuadStore) and quads.codes is self.codes:
+            self.ops.extend(quads.ops)
+            self.args1.extend(quads.args1)
+            self.args2.extend(quads.args2)
+            self.results.extend(quads.results)
+            return
+        for quad in quads:
+            self.emit(*quad[1:])
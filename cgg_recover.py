@@ -0,0 +1,135 @@
+# 容错的语法分析
+# 遇到错误时记录诊断信息，跳过单词直到同步单词（';'、END、THEN、DO、'.'）后继续分析，
+# 一次分析就能报告源程序中的所有错误
+
+import cgg_lex as l     # 导入词法分析器模块
+import cgg_parser as p  # 导入语法分析器模块
+
+# 语句中出错时跳到这些单词
+STATEMENT_SYNC = frozenset((l.SEMICOLON, l.END, l.PERIOD, l.EOF))
+# 条件中出错时跳到这些单词，之后可以继续分析 THEN 或 DO 后面的语句
+CONDITION_SYNC = STATEMENT_SYNC | {l.THEN, l.DO}
+# 声明中出错时跳到这些单词，之后继续分析变量声明或语句
+BLOCK_SYNC = frozenset((l.VAR, l.BEGIN, l.IF, l.WHILE, l.CALL, l.PERIOD, l.EOF))
+# 可以开始一条非空语句的单词
+STATEMENT_START = frozenset((l.IDENT, l.CALL, l.BEGIN, l.IF, l.WHILE))
+
+class RecoveringParser(p.Parser):
+    """
+    采用应急（panic mode）恢复的递归下降语法分析器，生成的四元式与 Parser 相同。
+    错误记录在 diagnostics 中（cgg_lex.Diagnostic），不抛出 CompileError。
+    语义错误（未定义的名字、对常量赋值）只记录，不影响后续分析。
+    同步后在没有匹配任何单词之前产生的错误视为前一个错误的连锁反应，不再报告。
+    调用 setPositions() 设置单词的位置，诊断信息才有行号和列号。
+    """
+
+    def __init__(self, log=print):
+        p.Parser.__init__(self, log)
+        self.diagnostics = []
+        self.positions = None  # 带有位置信息的 l.TokenBuffer
+        self.syncPoint = -1    # 上一次同步后所在的单词下标
+
+    def setPositions(self, buffer):
+        self.positions = buffer
+
+    def diagnose(self, info):
+        """
+        记录当前单词处的错误。
+        """
+        self.has_error = True
+        if self.pointer == self.syncPoint:
+            return
+        line, column = self.positions.position(self.pointer) if self.positions is not None else (0, 0)
+        self.diagnostics.append(l.Diagnostic(line, column, info))
+        self.syncPoint = self.pointer
+
+    def semanticError(self, info):
+        self.diagnose("语法错误: " + info)
+
+    def tokenText(self):
+        """
+        当前单词在源代码中的写法。
+        """
+        if self.getSym() == l.IDENT or self.getSym() == l.NUMBER:
+            return str(self.getVal())
+        return l.kindList[self.getSym()]
+
+    def skipTo(self, sync):
+        """
+        跳过单词，直到遇到同步单词或EOF。
+        """
+        while self.getSym() not in sync and self.getSym() != l.EOF:
+            self.match(self.getSym())
+        self.syncPoint = self.pointer
+
+    def program(self):
+        try:
+            p.Parser.program(self)
+        except p.CompileError as e:
+            self.diagnose(str(e))
+
+    def block(self):
+        # 语句中的错误已在 statement() 中处理，这里只会遇到声明中的错误
+        try:
+            p.Parser.block(self)
+        except p.CompileError as e:
+            self.diagnose(str(e))
+            self.skipTo(BLOCK_SYNC)
+            if self.getSym() == l.VAR:
+                self.block()      # 继续分析变量声明和语句
+            elif self.getSym() in STATEMENT_START:
+                self.statement()
+
+    def statement(self):
+        sym = self.getSym()
+        try:
+            p.Parser.statement(self)
+        except p.CompileError as e:
+            if sym == l.BEGIN:
+                # 内层语句的错误已经处理，这里只会是 BEGIN...END 末尾缺少 END
+                self.recoverBlock(str(e))
+            else:
+                self.diagnose(str(e))
+                self.skipTo(STATEMENT_SYNC)
+
+    def recoverBlock(self, info):
+        """
+        BEGIN...END 中的语句之后既不是 ';' 也不是 END：
+        如果是一条语句的开头，按缺少 ';' 处理；否则跳过多余的单词，继续分析余下的语句直到 END。
+        """
+        sym = self.getSym()
+        if sym in STATEMENT_START:
+            info = "语法错误: 语句之间缺少 ';'。"
+        elif sym != l.PERIOD and sym != l.EOF:
+            info = "语法错误: 多余的单词 '%s'。" % self.tokenText()
+        self.diagnose(info)
+        skipping = False  # 连续的多余单词只报告一次
+        while True:
+            sym = self.getSym()
+            if sym == l.END:
+                self.match(l.END)
+                return
+            if sym == l.PERIOD or sym == l.EOF:
+                self.diagnose("语法错误: 在 'BEGIN...END' 语句中缺少 'END'。")
+                return
+            if sym == l.SEMICOLON:
+                self.match(l.SEMICOLON)
+                self.statement()
+            elif sym in STATEMENT_START:
+                self.diagnose("语法错误: 语句之间缺少 ';'。")
+                self.statement()
+            else:
+                if not skipping:
+                    self.diagnose("语法错误: 多余的单词 '%s'。" % self.tokenText())
+                self.match(sym)  # 跳过多余的单词
+                skipping = True
+                continue
+            skipping = False
+
+    def condition(self):
+        try:
+            return p.Parser.condition(self)
+        except p.CompileError as e:
+            self.diagnose(str(e))
+            self.skipTo(CONDITION_SYNC)
+            return [], []  # 没有需要回填的跳转
@@ -0,0 +1,151 @@
+# 编译服务器
+# 在本地Unix域套接字上常驻运行，由预先启动的工作进程池并发处理编译请求，
+# 省去每次编译时启动解释器、导入模块的开销
+
+# 协议：请求和响应都是一行JSON，一个连接上可以依次发送多个请求
+# 请求：{"source": 源代码文本} 或 {"path": 源文件路径}，可选项 "lexer"、"stream"、"engine"、"recover"、"optimize"
+# 响应：{"ok": 是否成功, "quads": 四元式列表, "symbols": 符号表, "diagnostics": 错误信息列表}
+
+import os
+import json
+import stat
+import socket
+import socketserver
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import cgg_session as s  # 导入编译会话模块
+
+class CompileHandler(socketserver.StreamRequestHandler):
+    """
+    处理一个客户端连接：逐行读取请求，编译后逐行写回响应。
+    """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.submit(json.loads(line))
+            except (ValueError, TypeError, KeyError) as e:  # 请求格式错误
+                response = errorResponse(f"请求错误: {e}")
+            except Exception as e:  # 编译过程中的意外错误（如嵌套过深），仍然按协议返回一行响应
+                response = errorResponse(f"编译失败: {type(e).__name__}: {e}")
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+# 编译失败、没有结果时的响应
+def errorResponse(message):
+    return {"ok": False, "quads": [], "symbols": {}, "diagnostics": [message]}
+
+# 小于该字节数的源代码直接在连接线程中编译，进程间通信的开销比编译本身还大
+INLINE_LIMIT = 64 * 1024
+# 使用 cgg_lex 的模块级状态（srcList、resList）的词法分析器，不能在多个线程中同时运行
+SHARED_LEXERS = frozenset(("ref", "check"))
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    编译服务器：每个连接由一个线程处理，较大的源代码交给常驻的工作进程池编译。
+    使用 SHARED_LEXERS 中的词法分析器的请求总是交给工作进程（每个进程一次只编译一个请求）；
+    workers 为0时所有请求都直接在连接线程中编译，这些请求由 sharedLock 保证依次编译。
+    """
+    daemon_threads = True
+
+    def __init__(self, socketPath, workers=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.pool = None
+        self.sharedLock = threading.Lock()
+        if workers > 0:
+            # 预先启动所有工作进程并完成模块导入
+            self.pool = ProcessPoolExecutor(workers)
+            list(self.pool.map(warmUp, range(workers)))
+        socketserver.UnixStreamServer.__init__(self, socketPath, CompileHandler)
+
+    def submit(self, request):
+        shared = request.get("lexer") in SHARED_LEXERS
+        if self.pool is not None and (shared or requestSize(request) >= INLINE_LIMIT):
+            return self.pool.submit(compileRequest, request).result()
+        if shared:
+            with self.sharedLock:
+                return compileRequest(request)
+        return compileRequest(request)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if self.pool is not None:
+            self.pool.shutdown()
+
+def warmUp(i):
+    return i
+
+# 请求中源代码的大小
+def requestSize(request):
+    if "source" in request:
+        return len(request["source"])
+    try:
+        return os.path.getsize(request["path"])
+    except (OSError, KeyError, TypeError):
+        return 0  # 由编译过程报告错误
+
+# 编译一个请求，返回响应
+def compileRequest(request):
+    options = {"lexer": request.get("lexer", "fast"), "stream": bool(request.get("stream", False)),
+               "engine": request.get("engine", "recursive"), "recover": bool(request.get("recover", False)),
+               "optimize": int(request.get("optimize", 0))}
+    if options["lexer"] == "parallel":
+        options["jobs"] = 1  # 已经在工作进程中运行，不再嵌套进程池
+    session = s.CompilerSession(request.get("path"), outPath=None, lexPath=None, tablePath=None,
+                                quiet=True, source=request.get("source"), **options)
+    if session.srcPath is None and session.source is None:
+        raise KeyError("请求中缺少 source 或 path")
+    try:
+        ok = session.compile()
+    except OSError as e:
+        session.error = str(e)
+        ok = False
+    if session.recover and session.diagnostics:
+        diagnostics = [s.formatDiagnostic(diagnostic) for diagnostic in session.diagnostics]
+    else:
+        diagnostics = list(session.messages)
+        if session.error is not None:
+            diagnostics.append(session.error)
+    return {
+        "ok": ok and not session.messages,
+        "quads": [list(line) for line in session.quate_list],
+        "symbols": session.symbol_table,
+        "diagnostics": diagnostics,
+    }
+
+# 启动编译服务器，直到收到中断信号。socketPath 已存在且不是套接字文件时抛出 FileExistsError
+def serve(socketPath, workers=None):
+    try:
+        mode = os.lstat(socketPath).st_mode
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{socketPath} 已存在且不是套接字文件")
+        os.unlink(socketPath)  # 删除上次遗留的套接字文件
+    server = CompileServer(socketPath, workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socketPath)
+
+class CompileClient:
+    """
+    编译服务器的客户端，一个客户端对象在同一个连接上依次发送请求。
+    """
+    def __init__(self, socketPath):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socketPath)
+        self.file = self.sock.makefile("rb")
+
+    def compile(self, **request):
+        self.sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        return json.loads(self.file.readline())
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
@@ -0,0 +1,463 @@
+# 编译会话
+# 把一次编译（词法分析、语法分析和中间代码生成、输出结果）的全部状态封装在 CompilerSession 中，
+# 并提供在进程池中批量编译多个源文件的功能
+
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+import cgg_lex as l     # 导入词法分析器模块
+import cgg_parser as p  # 导入语法分析器模块
+import cgg_stack as sp  # 导入栈式语法分析器模块
+import cgg_recover as r  # 导入容错语法分析模块
+import cgg_trace as t   # 导入跟踪模块
+import cgg_stats as st  # 导入性能统计模块
+import cgg_opt as o     # 导入中间代码优化模块
+import cgg_bytecode as b  # 导入字节码文件模块
+import cgg_emit as e    # 导入中间代码输出模块
+import cgg_vm as vm     # 导入虚拟机模块
+import cgg_quad as q    # 导入四元式存储模块
+import cgg_cache as c   # 导入编译缓存模块
+
+# 诊断信息的文本形式：行号:列号: 错误信息
+def formatDiagnostic(diagnostic):
+    return "%d:%d: %s" % tuple(diagnostic)
+
+# 容错地编译源程序，一次返回所有的诊断信息（cgg_lex.Diagnostic 的列表），不输出结果文件
+def checkSource(srcPath=None, source=None, **options):
+    session = CompilerSession(srcPath, outPath=None, lexPath=None, tablePath=None, quiet=True,
+                              source=source, recover=True, **options)
+    session.compile()
+    return session.diagnostics
+
+# 语法分析引擎
+ENGINES = {"recursive": p.Parser, "stack": sp.StackParser}
+
+class CompilerSession:
+    """
+    一次编译的全部状态：源代码、单词、语法分析器以及输出文件路径。
+    各个会话互不影响，同一进程中可以依次创建多个会话编译不同的源文件。
+    源代码可以来自源文件 srcPath，也可以直接给出源代码文本 source。
+    输出文件路径为None时不输出该文件；bytecodePath 为字节码文件（见 cgg_bytecode）的路径，默认不输出。
+    engine 为语法分析引擎：recursive 为递归下降分析器，stack 为不使用递归的栈式分析器。
+    recover 为True时使用容错的词法分析和语法分析（不使用流式词法分析，忽略 engine），
+    一次编译报告所有错误，诊断信息（cgg_lex.Diagnostic）记录在 diagnostics 中。
+    trace 为语法分析的跟踪方式（见 cgg_trace.makeTracer()），默认不跟踪。
+    stats 为True或 cgg_stats.PhaseStats 对象时按阶段统计性能数据。
+    optimize 为中间代码的优化级别（见 cgg_opt.optimize()），默认不优化。
+    run 为True时编译成功后用虚拟机（cgg_vm.VM）执行生成的四元式，最多执行 stepLimit 条，
+    虚拟机记录在 machine 中，运行错误的信息记录在 runError 中；jit 为False时只解释执行，不编译循环。
+    """
+
+    parserClass = None      # 语法分析器的类，为None时由 engine 选择
+
+    def __init__(self, srcPath=None, outPath="test.out",
+                 lexPath="lexical_analysis_result.txt",
+                 tablePath="symbol_table_and_quater_list.txt",
+                 lexer="fast", stream=False, jobs=None, engine="recursive", trace=None, quiet=False,
+                 source=None, cache=None, stats=False, recover=False, optimize=0, bytecodePath=None,
+                 run=False, stepLimit=vm.DEFAULT_STEP_LIMIT, jit=True):
+        self.srcPath = srcPath
+        self.source = source
+        self.cache = cache      # 编译缓存（cgg_cache.CompileCache），为None时不使用缓存
+        self.outPath = outPath
+        self.lexPath = lexPath
+        self.tablePath = tablePath
+        self.bytecodePath = bytecodePath
+        self.lexer = lexer      # 词法分析器：fast、ref、check 或 parallel
+        self.stream = stream    # 是否使用流式词法分析
+        self.jobs = jobs        # 并行词法分析使用的进程数
+        self.engine = engine    # 语法分析引擎：recursive 或 stack
+        self.recover = recover  # 是否使用容错的分析
+        self.optimize = optimize  # 中间代码的优化级别
+        self.run = run          # 编译成功后是否执行
+        self.stepLimit = stepLimit  # 执行时最多执行的四元式条数
+        self.jit = jit          # 执行时是否把热点循环编译为 Python 函数
+        self.log = quietLog if quiet else print  # 输出提示信息的函数
+        self.tracer = t.makeTracer(trace, self.log)  # 语法分析的跟踪器，为None时不跟踪
+        # 各阶段的性能数据，为None时不统计；也可以直接给出 PhaseStats 对象
+        self.stats = (st.PhaseStats() if stats is True else stats) or None
+
+        self.srcList = None     # 源代码行的列表
+        self.tokens = None      # 词法分析的结果（l.TokenBuffer）
+        self.parser = self.newParser()
+        self.messages = []      # 词法错误信息
+        self.error = None       # 语法错误信息
+        self.diagnostics = []   # 容错分析时的诊断信息，按位置排序
+        self.machine = None     # 执行四元式的虚拟机
+        self.runError = None    # 运行错误信息
+
+    def newParser(self):
+        """
+        建立语法分析器，并安装跟踪器。
+        """
+        if self.parserClass is not None:
+            parserClass = self.parserClass
+        elif self.recover:
+            parserClass = r.RecoveringParser
+        else:
+            parserClass = ENGINES[self.engine]
+        parser = parserClass(self.log)
+        if self.tracer is not None:
+            t.install(parser, self.tracer)
+        return parser
+
+    @property
+    def symbol_table(self):
+        return self.parser.symbol_table
+
+    @property
+    def quate_list(self):
+        return self.parser.quate_list
+
+    def report(self, message):
+        """
+        记录并输出词法错误信息。
+        """
+        self.messages.append(message)
+        self.log(message)
+
+    def compile(self):
+        """
+        执行完整的编译流程。
+        成功时输出结果文件并返回True；遇到语法错误时记录错误信息并返回False。
+        使用缓存时，命中则跳过词法分析和语法分析，直接输出缓存的结果。
+        需要执行时在编译成功后执行，运行错误不影响返回值。
+        """
+        try:
+            ok = self.runPhases()
+            if ok and self.run:
+                with self.phase("run"):
+                    self.execute()
+            return ok
+        finally:
+            if self.stats is not None:
+                self.stats.stop()
+
+    def runPhases(self):
+        key = None
+        if self.cache is not None:
+            with self.phase("cache"):
+                key = self.cache.key(self.sourceBytes(), self.cacheOptions())
+                hit = self.loadCache(key)
+            if hit:
+                with self.phase("emit"):
+                    self.writeLex()
+                    self.writeOutputs()
+                return True
+
+        try:
+            if self.stream and self.source is None and not self.recover:
+                with self.phase("lex+parse"):
+                    self.parseStream()
+            else:
+                with self.phase("lex"):
+                    self.lex()
+                with self.phase("emit"):
+                    self.writeLex()
+                with self.phase("parse"):
+                    self.parse(self.tokens, self.tokens.names)
+                if self.recover and self.collectDiagnostics():
+                    return False
+        except p.CompileError as e:
+            self.error = str(e)
+            self.log(self.error)
+            return False
+        if self.optimize:
+            with self.phase("optimize"):
+                parser = self.parser
+                parser.quate_list = o.optimize(parser.quate_list, self.optimize)
+                parser.used_temp_index = o.fitTemps(parser.symbol_table, parser.quate_list)
+        with self.phase("emit"):
+            self.writeOutputs()
+        if key is not None and not self.messages:
+            with self.phase("cache"):
+                self.cache.put(key, self.cacheEntry())
+        return True
+
+    def execute(self):
+        """
+        用虚拟机执行生成的四元式。
+        """
+        try:
+            self.machine = vm.VM(self.symbol_table, self.quate_list, jit=self.jit)
+            self.machine.run(self.stepLimit)
+        except vm.VMError as error:
+            self.runError = "运行错误: " + str(error)
+            self.log(self.runError)
+
+    def phase(self, name):
+        """
+        统计一个编译阶段的性能数据，不统计时什么也不做。
+        """
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.phase(name)
+
+    def statsReport(self):
+        """
+        性能统计报告：各阶段的数据以及单词数、四元式数、临时变量数和符号表大小。
+        """
+        if self.tokens is not None:
+            tokens = len(self.tokens)
+        else:
+            tokens = self.parser.pointer  # 流式词法分析时为语法分析器读取的单词数
+        return self.stats.report(tokens=tokens, quads=len(self.quate_list),
+                                 temps=self.parser.used_temp_index, symbols=len(self.symbol_table))
+
+    def sourceBytes(self):
+        """
+        源代码的字节，用于计算缓存键。
+        """
+        if self.source is not None:
+            return self.source.encode("utf-8")
+        with open(self.srcPath, "rb") as file:
+            return file.read()
+
+    def cacheOptions(self):
+        """
+        影响编译结果的选项，作为缓存键的一部分。
+        """
+        return {"lexer": self.lexer, "optimize": self.optimize}
+
+    def cacheEntry(self):
+        """
+        生成缓存条目：单词、符号表和四元式列表，都表示为 JSON 数据。流式词法分析时不保存单词。
+        """
+        tokens = None
+        if self.tokens is not None:
+            tokens = [c.packArray(self.tokens.kinds), c.packArray(self.tokens.values), list(self.tokens.names)]
+        parser = self.parser
+        quads = parser.quate_list
+        return {
+            "tokens": tokens,
+            "symbol_table": parser.symbol_table,
+            "const_symbol_table": parser.const_symbol_table,
+            "quate_list": {
+                "ops": c.packArray(quads.ops),
+                "args1": c.packArray(quads.args1),
+                "args2": c.packArray(quads.args2),
+                "results": c.packArray(quads.results),
+                "constants": quads.constants,
+                "names": list(quads.names),
+            },
+            "used_temp_index": parser.used_temp_index,
+        }
+
+    def loadCache(self, key):
+        """
+        从缓存中恢复编译结果，未命中时返回False。
+        需要输出词法分析结果而缓存条目中没有单词时也视为未命中，格式不对的条目同样视为未命中。
+        """
+        entry = self.cache.get(key)
+        try:
+            if entry is None or (entry["tokens"] is None and self.lexPath is not None):
+                return False
+            tokens = None
+            if entry["tokens"] is not None:
+                kinds, values, names = entry["tokens"]
+                tokens = l.TokenBuffer()
+                tokens.kinds = c.unpackArray('B', kinds)
+                tokens.values = c.unpackArray('q', values)
+                for name in names:
+                    tokens.names.intern(name)
+            symbol_table = dict(entry["symbol_table"])
+            const_symbol_table = list(entry["const_symbol_table"])
+            quads = loadQuads(entry["quate_list"])
+            used_temp_index = int(entry["used_temp_index"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        self.tokens = tokens
+        parser = self.parser
+        parser.symbol_table = symbol_table
+        parser.const_symbol_table = const_symbol_table
+        parser.quate_list = quads
+        parser.used_temp_index = used_temp_index
+        return True
+
+    def lex(self):
+        """
+        读取源代码并执行词法分析。
+        """
+        if self.source is None:
+            self.srcList = l.readSrc(self.srcPath)
+        else:
+            self.srcList = l.splitSrc(self.source)
+        self.tokens = l.TokenBuffer()
+        if self.recover:
+            l.lexRecover(self.srcList, self.tokens, self.diagnostics.append)
+        elif self.lexer == "ref":
+            # 参考扫描器使用词法分析模块的全局变量
+            l.srcList = self.srcList
+            l.resList = self.tokens
+            l.getRes()
+        elif self.lexer == "check":
+            l.srcList = self.srcList
+            if not l.checkRes():
+                raise p.CompileError("词法分析器检查失败：快速扫描器与参考扫描器的结果不一致！")
+            self.tokens = l.resList
+        elif self.lexer == "parallel":
+            l.lexParallel(self.srcList, self.tokens, self.jobs, report=self.report)
+        else:
+            l.lexLines(self.srcList, self.tokens, report=self.report)
+
+    def parse(self, tokens, names):
+        """
+        对单词序列进行语法分析并生成中间代码。
+        """
+        if self.recover:
+            self.parser.setPositions(tokens)
+        self.parser.getSen(tokens, names)
+        self.parser.program()
+
+    def collectDiagnostics(self):
+        """
+        容错分析结束后合并词法和语法的诊断信息并按位置排序输出。
+        存在语法错误时返回True；词法错误同时记录在 messages 中。
+        """
+        lexical = [formatDiagnostic(diagnostic) for diagnostic in self.diagnostics]
+        self.messages.extend(lexical)
+        syntax = self.parser.diagnostics
+        self.diagnostics = sorted(self.diagnostics + syntax, key=lambda diagnostic: diagnostic[:2])
+        for diagnostic in self.diagnostics:
+            self.log(formatDiagnostic(diagnostic))
+        if syntax:
+            self.error = syntax[0].message
+        return bool(syntax)
+
+    def parseStream(self):
+        """
+        流式词法分析：语法分析器按需从映射的源文件中读取单词，
+        词法分析的结果在读取单词的同时旁路输出到文件。
+        不优化、不使用缓存、不执行时四元式也流式输出（见 cgg_emit.StreamingQuadStore），内存中只保留待回填的部分。
+        """
+        names = l.NameTable()
+        tokens = l.getStream(self.srcPath, names, self.report)
+        quads = None
+        if not self.optimize and self.cache is None and not self.run:
+            sinks = self.openSinks()
+            if sinks:
+                quads = self.parser.quate_list = e.StreamingQuadStore(sinks)
+        try:
+            if self.lexPath is None:
+                self.parse(tokens, names)
+            else:
+                with open(self.lexPath, "w") as file:
+                    file.write("lexical_analysis_result:\n")
+                    self.parse(l.teeTokens(tokens, names, file), names)
+        except BaseException:
+            if quads is not None:
+                quads.discard()
+            raise
+
+    def writeLex(self):
+        """
+        将词法分析的结果输出到文件，每个元素单独一行。
+        """
+        if self.lexPath is None or self.tokens is None:
+            return
+        with open(self.lexPath, "w") as file:
+            file.write("lexical_analysis_result:\n")
+            for item in self.tokens.tuples():
+                file.write(str(item) + "\n")
+
+    def openSinks(self):
+        """
+        结果文件的输出端：文本文件和字节码文件，不输出任何文件时为空列表。
+        """
+        sinks = []
+        if self.outPath is not None or self.tablePath is not None:
+            sinks.append(e.TextSink(self.outPath, self.tablePath))
+        if self.bytecodePath is not None:
+            sinks.append(b.BytecodeWriter(self.bytecodePath))
+        return sinks
+
+    def writeOutputs(self):
+        """
+        输出符号表和四元式列表。流式输出时只需输出剩余的四元式。
+        """
+        quads = self.quate_list
+        if isinstance(quads, e.StreamingQuadStore):
+            quads.finish(self.symbol_table, self.parser.used_temp_index)
+        else:
+            e.emitAll(quads, self.openSinks(), self.symbol_table, self.parser.used_temp_index)
+
+def quietLog(*args):
+    pass
+
+# 由缓存条目中的四元式列表数据还原 QuadStore，数据不完整时抛出 ValueError 或 TypeError
+def loadQuads(data):
+    quads = q.QuadStore()
+    quads.ops = c.unpackArray('B', data["ops"])
+    quads.args1 = c.unpackArray('i', data["args1"])
+    quads.args2 = c.unpackArray('i', data["args2"])
+    quads.results = c.unpackArray('i', data["results"])
+    if not len(quads.ops) == len(quads.args1) == len(quads.args2) == len(quads.results):
+        raise ValueError("四元式的各列长度不一致")
+    for value in data["constants"]:
+        if type(value) is not int:
+            raise TypeError("常数池中只能有整数")
+        quads.encode(value)
+    for name in data["names"]:
+        quads.encode(str(name))
+    return quads
+
+# 批量编译：inputs 中的每一项可以是源文件或目录（目录中的 .pl 文件都会被编译）
+# outDir 为None时输出文件与源文件放在一起，否则按输入的相对路径放在outDir下
+# 每个源文件的输出为 <名字>.out、<名字>.lex.txt 和 <名字>.table.txt
+# 返回每个源文件的编译结果，顺序与输入一致
+def compileBatch(inputs, outDir=None, workers=None, **options):
+    jobs = [(srcPath, outBase, options) for srcPath, outBase in batchJobs(inputs, outDir)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        return [compileJob(job) for job in jobs]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(compileJob, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+
+# 列出需要编译的源文件，产生 (源文件路径, 不含扩展名的输出路径)
+def batchJobs(inputs, outDir=None):
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(".pl"):
+                        srcPath = os.path.join(root, name)
+                        yield srcPath, outputBase(srcPath, os.path.relpath(srcPath, path), outDir)
+        else:
+            yield path, outputBase(path, os.path.basename(path), outDir)
+
+def outputBase(srcPath, relPath, outDir):
+    if outDir is None:
+        return os.path.splitext(srcPath)[0]
+    return os.path.join(outDir, os.path.splitext(relPath)[0])
+
+# 在子进程中编译一个源文件，返回编译结果
+def compileJob(job):
+    srcPath, outBase, options = job
+    options = dict(options)
+    if options.get("lexer") == "parallel":
+        options["jobs"] = 1  # 批量编译已经在进程池中运行，不再嵌套进程池
+    start = time.perf_counter()
+    session = CompilerSession(srcPath, outBase + ".out", outBase + ".lex.txt", outBase + ".table.txt",
+                              quiet=True, **options)
+    try:
+        os.makedirs(os.path.dirname(outBase) or ".", exist_ok=True)
+        ok = session.compile()
+    except OSError as e:
+        session.error = str(e)
+        ok = False
+    except Exception as e:  # 如嵌套过深时的 RecursionError，只记为这个源文件编译失败，其他源文件照常编译
+        session.error = f"编译失败: {type(e).__name__}: {e}"
+        ok = False
+    return {
+        "src": srcPath,
+        "ok": ok and not session.messages,
+        "error": session.error,
+        "messages": session.messages,
+        "diagnostics": [list(diagnostic) for diagnostic in session.diagnostics],
+        "quads": len(session.quate_list),
+        "symbols": len(session.symbol_table),
+        "seconds": time.perf_counter() - start,
+    }
@@ -0,0 +1,151 @@
+# 栈式语法分析器
+# 不使用递归的语法分析引擎：语句的嵌套保存在显式的栈中，表达式用算符优先（Pratt）方法分析，
+# 嵌套深度只受内存限制，不会触发 RecursionError。
+# 语义动作与递归下降分析器（cgg_parser.Parser）共用，对同一个程序生成完全相同的四元式。
+
+import cgg_lex as l     # 导入词法分析器模块
+import cgg_parser as p  # 导入语法分析器模块
+
+# 二元运算符的优先级；一元 "-" 的优先级介于加减和乘除之间，
+# 因此 -a*b+c 与递归下降分析器一样按 (0-(a*b))+c 计算
+PRECEDENCE = {l.PLUS: 1, l.MINUS: 1, l.TIMES: 3, l.SLASH: 3}
+NEG = -1                # 运算符栈中的一元 "-"
+NEG_PRECEDENCE = 2
+
+# 语句栈中等待完成的语句
+IF_FRAME, WHILE_FRAME, BEGIN_FRAME = range(3)
+# BEGIN...END 的分析状态：已分析第一条语句、';' 之后的语句、循环之后额外分析的语句
+FIRST, LOOP, POST = range(3)
+
+class StackParser(p.Parser):
+    """
+    用显式的栈代替递归的语法分析器。
+    statement() 分析一条（可能嵌套的）语句，expression() 分析一个表达式，其余方法继承自 Parser。
+    BEGIN...END 的处理与 Parser.statement() 完全一致，包括 ';' 循环之后额外分析一条语句的行为。
+    """
+
+    def statement(self):
+        # 等待完成的外层语句：(IF_FRAME, 假出口)、(WHILE_FRAME, 条件开头, 假出口) 或 [BEGIN_FRAME, 状态]
+        stack = []
+        while True:
+            # 分析一条语句的开头部分，遇到嵌套的语句时压栈并继续分析内层语句
+            sym = self.token[0]
+            if sym == l.CALL:
+                self.match(l.CALL)
+                if self.token[0] == l.IDENT:
+                    self.match(l.IDENT)
+                else:
+                    self.error("在 'CALL' 后缺少标识符。")
+            elif sym == l.BEGIN:
+                self.match(l.BEGIN)
+                stack.append([BEGIN_FRAME, FIRST])
+                continue
+            elif sym == l.IF:
+                self.match(l.IF)
+                falselist = self.ifThen(self.condition())
+                if self.token[0] == l.THEN:
+                    self.match(l.THEN)
+                    stack.append((IF_FRAME, falselist))
+                    continue
+                self.error("在 'IF...THEN' 语句中缺少 'THEN'。")
+            elif sym == l.WHILE:
+                self.match(l.WHILE)
+                start = self.nextQuad()   # 条件的开头，循环体结束后跳回这里
+                falselist = self.whileTest(self.condition())
+                if self.token[0] == l.DO:
+                    self.match(l.DO)
+                    stack.append((WHILE_FRAME, start, falselist))
+                    continue
+                self.error("在 'WHILE...DO' 语句中缺少 'DO'。")
+            elif sym == l.IDENT:
+                i = self.getVal()
+                self.match(l.IDENT)
+                if self.token[0] == l.BECOMES:
+                    self.match(l.BECOMES)
+                    if i in self.const_symbol_table:
+                        self.semanticError('不能对常量赋值')
+                    self.assign(i, self.expression())
+                else:
+                    self.error("缺少赋值符号。")
+            # 其他情况，语句为空
+
+            # 一条语句分析完毕：依次完成外层的语句，直到需要分析下一条语句
+            while stack:
+                frame = stack[-1]
+                if frame[0] == IF_FRAME:
+                    stack.pop()
+                    self.ifEnd(frame[1])
+                elif frame[0] == WHILE_FRAME:
+                    stack.pop()
+                    self.whileEnd(frame[1], frame[2])
+                elif frame[1] != POST and self.token[0] == l.SEMICOLON:
+                    self.match(l.SEMICOLON)
+                    frame[1] = LOOP
+                    break
+                elif frame[1] == LOOP:
+                    frame[1] = POST  # 分析过 ';' 之后的语句（times != 0）：再分析一条语句
+                    break
+                elif self.token[0] == l.END:
+                    self.match(l.END)
+                    stack.pop()
+                else:
+                    self.error("在 'BEGIN...END' 语句中缺少 'END'。")
+            else:
+                return
+
+    def expression(self):
+        ops = []     # 运算符栈：二元运算符的种别编码、NEG 或 LPAREN
+        places = []  # 运算对象栈
+        start = True  # 是否位于（括号内的）表达式开头，只有这里可以出现一元的"+"或"-"
+        while True:
+            # 运算对象
+            sym = self.token[0]
+            if start:
+                start = False
+                if sym == l.PLUS or sym == l.MINUS:
+                    self.match(sym)
+                    if sym == l.MINUS:
+                        ops.append(NEG)
+                    sym = self.token[0]
+            if sym == l.LPAREN:
+                self.match(l.LPAREN)
+                ops.append(l.LPAREN)
+                start = True
+                continue
+            places.append(self.operand())
+
+            # 运算符：先归约优先级不低于它的运算符（左结合）
+            while True:
+                sym = self.token[0]
+                precedence = PRECEDENCE.get(sym)
+                if precedence is not None:
+                    self.reduce(ops, places, precedence)
+                    self.match(sym)
+                    ops.append(sym)
+                    break
+                # 表达式或括号内的表达式结束
+                self.reduce(ops, places, 0)
+                if not ops:
+                    return places.pop()
+                if sym != l.RPAREN:
+                    self.error("在这个句子中缺少右括号 ')'。")
+                self.match(l.RPAREN)
+                ops.pop()
+
+    def reduce(self, ops, places, precedence):
+        """
+        归约运算符栈顶优先级不低于 precedence 的运算符，遇到左括号时停止。
+        """
+        while ops:
+            op = ops[-1]
+            if op == NEG:
+                if NEG_PRECEDENCE < precedence:
+                    return
+                ops.pop()
+                places.append(self.negate(places.pop()))
+            elif op == l.LPAREN or PRECEDENCE[op] < precedence:
+                return
+            else:
+                ops.pop()
+                place2 = places.pop()
+                places.append(self.binop(l.kindList[op], places.pop(), place2))
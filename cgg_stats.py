@@ -0,0 +1,69 @@
+# 编译性能统计
+# 按阶段记录墙钟时间、CPU时间和 tracemalloc 统计的内存峰值，并汇总为JSON格式的报告
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+class PhaseStats:
+    """
+    各编译阶段的性能数据。
+    phase() 返回的上下文管理器包围一个阶段的代码，同名阶段多次执行时累加。
+    统计期间启用 tracemalloc，内存峰值是该阶段执行期间新分配内存的峰值。
+    memory 为False时不统计内存，计时不受 tracemalloc 的影响。
+    """
+
+    def __init__(self, memory=True):
+        self.phases = {}   # 阶段名 -> {"wall_s", "cpu_s", "peak_bytes", "runs"}
+        self.memory = memory
+        self.started = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+
+    def stop(self):
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+
+    @contextmanager
+    def phase(self, name):
+        self.start()
+        stat = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "peak_bytes": 0, "runs": 0})
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield stat
+        finally:
+            stat["wall_s"] += time.perf_counter() - wall
+            stat["cpu_s"] += time.process_time() - cpu
+            if tracing:
+                stat["peak_bytes"] = max(stat["peak_bytes"], tracemalloc.get_traced_memory()[1] - base)
+            stat["runs"] += 1
+
+    def report(self, tokens=None, quads=0, temps=0, symbols=0):
+        """
+        生成报告。tokens_per_second 按词法分析阶段的时间计算。
+        """
+        phases = self.phases
+        lexPhase = phases.get("lex") or phases.get("lex+parse")  # 流式词法分析时与语法分析交替进行
+        lexTime = lexPhase["wall_s"] if lexPhase else 0.0
+        return {
+            "phases": phases,
+            "total": {
+                "wall_s": sum(stat["wall_s"] for stat in phases.values()),
+                "cpu_s": sum(stat["cpu_s"] for stat in phases.values()),
+                "peak_bytes": max((stat["peak_bytes"] for stat in phases.values()), default=0),
+            },
+            "tokens": tokens,
+            "tokens_per_second": tokens / lexTime if tokens and lexTime else None,
+            "quads": quads,
+            "temps": temps,
+            "symbols": symbols,
+        }
@@ -0,0 +1,161 @@
+# 语法分析的跟踪和性能分析
+# 跟踪器在建立语法分析器时安装到实例上：用包装后的方法替换实例的 match() 和各个非终结符的处理函数。
+# 没有安装跟踪器时语法分析器不执行任何跟踪代码，不产生额外开销。
+
+import json
+import time
+import cgg_lex as l     # 导入词法分析器模块
+
+# 语法分析器中对应非终结符的方法
+NONTERMINALS = ("program", "block", "statement", "condition", "expression", "term", "factor")
+
+# 在语法分析器实例上安装跟踪器，返回该跟踪器
+def install(parser, tracer):
+    for name in NONTERMINALS:
+        setattr(parser, name, tracer.wrap(parser, name, getattr(parser, name)))
+    parser.match = tracer.wrapMatch(parser, parser.match)
+    return tracer
+
+# 按名字创建跟踪器：None 表示不跟踪，"print" 输出逐个单词的调试信息，"profile" 记录性能数据
+# 也可以直接给出跟踪器对象
+def makeTracer(trace, log=print):
+    if trace is None:
+        return None
+    if trace == "print":
+        return PrintTracer(log)
+    if trace == "profile":
+        return ProfileTracer()
+    if isinstance(trace, str):
+        raise ValueError("未知的跟踪方式：" + trace)
+    return trace
+
+class PrintTracer:
+    """
+    输出与原来的调试信息相同的跟踪信息：进入每个非终结符时输出指针位置，匹配每个单词后输出指针的移动。
+    """
+
+    def __init__(self, log=print):
+        self.log = log
+
+    def wrap(self, parser, name, method):
+        log = self.log
+        message = "正在执行 " + name + "()，指针位于 %s"
+
+        def traced():
+            log(message % l.kindList[parser.token[0]])
+            return method()
+        return traced
+
+    def wrapMatch(self, parser, match):
+        log = self.log
+
+        def traced(sym):
+            match(sym)
+            log("匹配 " + l.kindList[sym] + "，指针移动到 %s" % l.kindList[parser.token[0]])
+        return traced
+
+class ProfileTracer:
+    """
+    记录结构化的跟踪事件：每次进入非终结符的开始和结束时间、单词位置和递归深度。
+    可以汇总为每个非终结符的调用次数和累计时间，并导出为JSON或Chrome跟踪格式。
+    时间以纳秒为单位记录。
+    """
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.events = []     # 事件列表，每个事件为 (非终结符, 开始时间, 结束时间, 开始位置, 结束位置, 深度)
+        self.stats = {name: {"calls": 0, "cumulative_ns": 0, "self_ns": 0, "tokens": 0, "max_depth": 0}
+                      for name in NONTERMINALS}
+        self.active = dict.fromkeys(NONTERMINALS, 0)  # 每个非终结符正在执行的层数，用于识别递归调用
+        self.children = []   # 每一层正在执行的调用中子调用的总时间
+        self.depth = 0       # 当前的递归深度
+        self.maxDepth = 0
+        self.matched = 0     # 已匹配的单词数
+
+    def wrap(self, parser, name, method):
+        clock = self.clock
+        events = self.events
+        stat = self.stats[name]
+        active = self.active
+        children = self.children
+
+        def traced():
+            depth = self.depth
+            self.depth = depth + 1
+            if depth > self.maxDepth:
+                self.maxDepth = depth
+            active[name] += 1
+            children.append(0)
+            pointer = parser.pointer
+            start = clock()
+            try:
+                return method()
+            finally:
+                end = clock()
+                elapsed = end - start
+                events.append((name, start, end, pointer, parser.pointer, depth))
+                stat["calls"] += 1
+                stat["self_ns"] += elapsed - children.pop()
+                if children:
+                    children[-1] += elapsed
+                active[name] -= 1
+                if active[name] == 0:
+                    # 递归调用的时间已经包含在最外层调用中
+                    stat["cumulative_ns"] += elapsed
+                    stat["tokens"] += parser.pointer - pointer
+                if depth > stat["max_depth"]:
+                    stat["max_depth"] = depth
+                self.depth = depth
+        return traced
+
+    def wrapMatch(self, parser, match):
+        def traced(sym):
+            self.matched += 1
+            match(sym)
+        return traced
+
+    def summary(self):
+        """
+        按非终结符汇总：调用次数、累计时间（递归调用只计最外层）、自身时间、匹配的单词数和最大递归深度。
+        """
+        return {
+            "matched_tokens": self.matched,
+            "max_depth": self.maxDepth,
+            "nonterminals": self.stats,
+        }
+
+    def toJSON(self, file):
+        """
+        把汇总结果和全部事件以JSON格式写入文件。
+        """
+        origin = min((event[1] for event in self.events), default=0)
+        json.dump({
+            "summary": self.summary(),
+            "events": [{"name": name, "start_ns": start - origin, "duration_ns": end - start,
+                        "tokens": [first, last], "depth": depth}
+                       for name, start, end, first, last, depth in self.events],
+        }, file, ensure_ascii=False, indent=1)
+
+    def toChromeTrace(self, file):
+        """
+        把事件以Chrome跟踪格式（chrome://tracing、Perfetto）写入文件，时间单位为微秒。
+        """
+        origin = min((event[1] for event in self.events), default=0)
+        json.dump({
+            "traceEvents": [{"name": name, "cat": "parser", "ph": "X", "pid": 1, "tid": 1,
+                             "ts": (start - origin) / 1000, "dur": (end - start) / 1000,
+                             "args": {"tokens": [first, last], "depth": depth}}
+                            for name, start, end, first, last, depth in self.events],
+            "displayTimeUnit": "ms",
+        }, file, ensure_ascii=False)
+
+    def report(self, log=print):
+        """
+        输出每个非终结符的调用次数和时间。
+        """
+        summary = self.summary()
+        log("%-12s %10s %12s %12s %10s %8s" % ("非终结符", "调用次数", "累计(毫秒)", "自身(毫秒)", "单词数", "最大深度"))
+        for name, stat in summary["nonterminals"].items():
+            log("%-12s %10d %12.3f %12.3f %10d %8d" % (name, stat["calls"], stat["cumulative_ns"] / 1e6,
+                                                     stat["self_ns"] / 1e6, stat["tokens"], stat["max_depth"]))
+        log("共匹配 %d 个单词，最大递归深度 %d" % (summary["matched_tokens"], summary["max_depth"]))
@@ -0,0 +1,300 @@
+# 虚拟机
+# 执行编译生成的四元式。执行前先把四元式预先解码为紧凑的指令数组：
+# 每条指令是 (运算编码, 运算对象1, 运算对象2, 结果) 4 个整数，变量、临时变量和常数都换成帧中的槽号，
+# 跳转的目标换成指令的下标。帧是一个 array('q')，由符号表中的初值和常数填充。
+# 执行时用一个分派循环逐条执行指令，只在跳转时统计执行的四元式条数。跳转之后顺序执行的指令数
+# 最多到下一条无条件跳转为止（见 reach），可能超过步数上限时改为逐条执行并计数，执行了 limit 条后停止。
+# 执行过程中帧展开为列表，运算与编译时的常数折叠一样使用 Python 的整数，除法向零取整；
+# 每次运算都检查结果是否在64位整数范围内，超出时报告运行错误。执行结束（或出错）时写回 array('q')。
+# 分层执行：向回跳转（循环的回边）发生的次数超过阈值后，用 cgg_jit 把这段循环编译为 Python 函数，
+# 之后每次到达回边都调用编译得到的函数，离开循环后回到解释执行。
+
+import operator
+from array import array
+import cgg_lex as l  # 导入词法分析模块
+import cgg_quad as q  # 导入四元式存储模块
+import cgg_jit as jit  # 导入编译执行模块
+
+DEFAULT_STEP_LIMIT = 10 ** 9  # 默认最多执行的四元式条数
+JIT_THRESHOLD = 50            # 回边发生多少次后编译这段循环
+
+ADD, SUB, MUL, DIV, ASSIGN, JEQ, JLT, JLE, JGT, JGE, JMP = (q.opCode[op] for op in q.OPS)
+HALT = len(q.OPS)  # 程序末尾的停机指令
+LOOP = HALT + 1    # 分层执行时的向回跳转，原来的运算编码记录在 backOps 中
+TESTS = {JEQ: operator.eq, JLT: operator.lt, JLE: operator.le, JGT: operator.gt, JGE: operator.ge,
+         JMP: lambda x, y: True}
+ARITHMETIC = {ADD: operator.add, SUB: operator.sub, MUL: operator.mul}
+
+class VMError(Exception):
+    """
+    运行错误：除数为0、执行的四元式超过步数上限、变量的值超出64位整数范围。
+    """
+
+class VM:
+    """
+    四元式虚拟机。symbol_table 和 quads 与 Parser 的 symbol_table、quate_list 格式相同，
+    quads 也可以是 cgg_bytecode 加载的字节码文件中的四元式。
+    slots 为名字或常数 -> 槽号，frame 为各个槽的值，steps 为执行过的四元式条数。
+    reach[pc] 为从第 pc 条指令开始、到下一条无条件跳转或停机为止最多顺序执行的指令条数。
+    jit 为True时分层执行，回边发生 threshold 次后编译这段循环；编译得到的函数记录在 regions 中。
+    """
+
+    def __init__(self, symbol_table, quads, jit=True, threshold=JIT_THRESHOLD):
+        self.jit = jit
+        self.threshold = threshold
+        self.regions = {}  # 回边所在指令的下标 -> 编译得到的函数，无法编译时为None
+        self.slots = {}
+        values = []
+        for name, value in symbol_table.items():
+            self.slots[name] = len(values)
+            values.append(value or 0)
+        code = array('i')
+        n = len(quads)
+        for line, op, arg1, arg2, result in quads:
+            code.append(q.opCode[op])
+            code.append(self.slot(arg1, values))
+            code.append(self.slot(arg2, values))
+            if op in ('j=', 'j<', 'j<=', 'j>', 'j>=', 'jmp'):
+                code.append(result - 1 if 1 <= result <= n else n)  # 跳到程序以外时停机
+            else:
+                code.append(self.slot(result, values))
+        code.extend((HALT, 0, 0, 0))
+        self.code = code
+        reach = array('i', [1]) * (n + 1)
+        for pc in range(n - 1, -1, -1):
+            if code[4 * pc] != JMP:
+                reach[pc] = reach[pc + 1] + 1
+        self.reach = reach
+        self.frame = toFrame(values, self.nameOf)
+        self.steps = 0
+
+    def slot(self, place, values):
+        """
+        运算对象的槽号，第一次遇到的常数和符号表中没有的名字分配新的槽。'_' 的槽号为0（不会被读取）。
+        """
+        if place == '_':
+            return 0
+        number = self.slots.get(place)
+        if number is None:
+            number = self.slots[place] = len(values)
+            values.append(place if type(place) is int else 0)
+        return number
+
+    def run(self, limit=DEFAULT_STEP_LIMIT):
+        """
+        从第一条四元式开始执行到程序结束，返回执行的四元式条数。出错时抛出 VMError，帧中保留出错时的值。
+        执行了 limit 条四元式后程序还没有结束时停止，报告超过步数上限。
+        """
+        instructions = list(zip(*[iter(self.code)] * 4))
+        backOps = {}
+        if self.jit:
+            for pc, (op, a, b, c) in enumerate(instructions):
+                if op in TESTS and c <= pc:
+                    backOps[pc] = op
+                    instructions[pc] = (LOOP, a, b, c)
+        counts = dict.fromkeys(backOps, 0)
+        regions = self.regions
+        threshold = self.threshold
+        stop = [limit - count for count in self.reach]  # 跳转到 pc 之后 steps 超过 stop[pc] 时可能超过上限
+        f = self.frame.tolist()
+        low, high = l.INT_MIN, l.INT_MAX
+        # 分派循环中的运算编码用局部变量，避免查找全局变量
+        assign, add, sub, mul, div, jmp, loop = ASSIGN, ADD, SUB, MUL, DIV, JMP, LOOP
+        jeq, jlt, jle, jgt, jge = JEQ, JLT, JLE, JGT, JGE
+        pc = start = 0  # start 为当前这段顺序执行的第一条指令
+        steps = 0
+        try:
+            # 离步数上限较远时只在跳转时计数，跳转之后可能超过上限时转到下面逐条计数
+            if stop[pc] >= 0:
+                while True:
+                    op, a, b, c = instructions[pc]
+                    if op == assign:
+                        f[c] = f[a]
+                        pc += 1
+                    elif op == add:
+                        x = f[a] + f[b]
+                        if low <= x <= high:
+                            f[c] = x
+                            pc += 1
+                        else:
+                            raise OverflowError
+                    elif op == jmp:
+                        steps += pc - start + 1
+                        pc = start = c
+                        if steps > stop[c]:
+                            break
+                    elif op == jlt:
+                        if f[a] < f[b]:
+                            steps += pc - start + 1
+                            pc = start = c
+                            if steps > stop[c]:
+                                break
+                        else:
+                            pc += 1
+                    elif op == jge:
+                        if f[a] >= f[b]:
+                            steps += pc - start + 1
+                            pc = start = c
+                            if steps > stop[c]:
+                                break
+                        else:
+                            pc += 1
+                    elif op == sub:
+                        x = f[a] - f[b]
+                        if low <= x <= high:
+                            f[c] = x
+                            pc += 1
+                        else:
+                            raise OverflowError
+                    elif op == mul:
+                        x = f[a] * f[b]
+                        if low <= x <= high:
+                            f[c] = x
+                            pc += 1
+                        else:
+                            raise OverflowError
+                    elif op == jgt:
+                        if f[a] > f[b]:
+                            steps += pc - start + 1
+                            pc = start = c
+                            if steps > stop[c]:
+                                break
+                        else:
+                            pc += 1
+                    elif op == jle:
+                        if f[a] <= f[b]:
+                            steps += pc - start + 1
+                            pc = start = c
+                            if steps > stop[c]:
+                                break
+                        else:
+                            pc += 1
+                    elif op == div:
+                        x = f[a]
+                        y = f[b]
+                        quotient = abs(x) // abs(y)
+                        if (x < 0) != (y < 0):
+                            quotient = -quotient
+                        elif quotient > high:  # 只有 INT_MIN / -1 会超出范围
+                            raise OverflowError
+                        f[c] = quotient
+                        pc += 1
+                    elif op == jeq:
+                        if f[a] == f[b]:
+                            steps += pc - start + 1
+                            pc = start = c
+                            if steps > stop[c]:
+                                break
+                        else:
+                            pc += 1
+                    elif op == loop:
+                        if TESTS[backOps[pc]](f[a], f[b]):
+                            steps += pc - start + 1
+                            if steps > stop[c]:
+                                pc = start = c
+                                break
+                            region = regions.get(pc)
+                            if region is None:
+                                counts[pc] += 1
+                                if counts[pc] == threshold:
+                                    region = regions[pc] = self.compileRegion(c, pc)
+                            if region:
+                                pc, steps = region(f, steps, limit)
+                                start = pc
+                                if steps > stop[pc]:
+                                    break
+                            else:
+                                pc = start = c
+                        else:
+                            pc += 1
+                    else:
+                        steps += pc - start
+                        return steps
+            # 接近步数上限：逐条执行并计数
+            while True:
+                op, a, b, c = instructions[pc]
+                op = backOps.get(pc, op)
+                if op == HALT:
+                    return steps
+                if steps >= limit:
+                    break
+                if op in TESTS:
+                    pc = c if TESTS[op](f[a], f[b]) else pc + 1
+                else:
+                    f[c] = evaluate(op, f[a], f[b])
+                    pc += 1
+                steps += 1
+                start = pc
+        except ZeroDivisionError:
+            steps += pc - start
+            raise VMError(f"第 {pc + 1} 条四元式的除数为0") from None
+        except OverflowError:
+            steps += pc - start
+            raise VMError(self.overflowMessage(pc, instructions[pc][3])) from None
+        finally:
+            self.steps = steps
+            self.frame = toFrame(f, self.nameOf)
+        raise VMError(f"执行的四元式超过 {limit} 条")
+
+    def compileRegion(self, first, last):
+        """
+        把从回边的目标 first 到回边 last 的一段指令编译为 Python 函数。
+        """
+        instructions = list(zip(*[iter(self.code)] * 4))
+        constants = {slot: place for place, slot in self.slots.items() if type(place) is int}
+        return jit.compileRegion(instructions, first, last, constants, self.reach)
+
+    def nameOf(self, slot):
+        """
+        槽中的变量或临时变量的名字，常数的槽返回None。
+        """
+        for name, number in self.slots.items():
+            if number == slot:
+                return name if type(name) is str else None
+        return None
+
+    def overflowMessage(self, pc, slot):
+        """
+        第 pc 条指令的运算结果超出范围时的错误信息，结果存入 slot。
+        """
+        name = self.nameOf(slot)
+        if name is None:
+            return f"第 {pc + 1} 条四元式的结果超出64位整数范围"
+        return f"第 {pc + 1} 条四元式赋给 {name} 的值超出64位整数范围"
+
+    def value(self, name):
+        """
+        变量的当前值。
+        """
+        return self.frame[self.slots[name]]
+
+    def variables(self, exclude=()):
+        """
+        符号表中除临时变量和 exclude 中的名字（如常量）以外的变量及其当前值。
+        """
+        return {name: self.frame[slot] for name, slot in self.slots.items()
+                if type(name) is str and not name.startswith('#TEMP') and name not in exclude}
+
+# 逐条执行时一条运算指令的结果：超出64位整数范围时抛出 OverflowError，除数为0时抛出 ZeroDivisionError
+def evaluate(op, x, y):
+    if op == ASSIGN:
+        return x
+    if op == DIV:
+        quotient = abs(x) // abs(y)
+        value = quotient if (x < 0) == (y < 0) else -quotient
+    else:
+        value = ARITHMETIC[op](x, y)
+    if not l.INT_MIN <= value <= l.INT_MAX:
+        raise OverflowError
+    return value
+
+# 把槽的值存入 array('q')，值超出64位整数范围时报告对应的名字，常数没有名字时只报告超出范围
+def toFrame(values, nameOf):
+    try:
+        return array('q', values)
+    except OverflowError:
+        slot = next(i for i, value in enumerate(values) if not l.INT_MIN <= value <= l.INT_MAX)
+        name = nameOf(slot)
+        if name is None:
+            raise VMError("程序中的常数超出64位整数范围") from None
+        raise VMError(f"{name} 的值超出64位整数范围") from None
@@ -0,0 +1,624 @@
+# 监视模式
+# 监视源文件的变化，只重新分析发生变化的行，并只从包含变化的最小语句（任意嵌套深度的 BEGIN、WHILE、IF 或赋值语句）
+# 开始重新进行语法分析和代码生成，其余语句的四元式直接复用。
+# 变化位于 BEGIN...END 中时从它之前最近的一条语句开始重新分析，分析到变化之后可以复用的语句处为止。
+# 每条语句开始时所有临时变量都已释放，语句使用的临时变量与它前面的语句无关，单独重新分析一条语句不需要改名。
+#
+# 每次修改只做与修改的大小相关的工作：
+#   源文件按字节比较，只解码和重新分析发生变化的行，行号和单词下标从上次修改的位置开始计算；
+#   重新分析的语句之后的单词下标、行号和跳转目标不立即平移，只记录一条平移规则，
+#   语句记录和四元式各自记下产生时已有的规则数，用到时才应用之后的规则（见 WatchSession.tokenAt()）；
+#   结果文件由 flush() 一次写出，watch() 在源文件一段时间没有变化后才调用，同时把平移规则应用到所有的四元式和语句记录上。
+
+import os
+import time
+import itertools
+from array import array
+import cgg_lex as l     # 导入词法分析器模块
+import cgg_parser as p  # 导入语法分析器模块
+import cgg_quad as q    # 导入四元式存储模块
+import cgg_session as s  # 导入编译会话模块
+
+# 语句在 BEGIN...END 中的位置：
+# FIRST 为第一条语句，LOOP 为 ';' 之后的语句，POST 为循环结束后额外分析的语句
+FIRST, LOOP, POST = range(3)
+
+FLUSH_DELAY = 0.2  # 源文件这么久（秒）没有变化后才写出结果文件
+
+
+class Mark:
+    """
+    一条语句的分析记录：开始和结束时的单词下标、四元式行号，在 BEGIN...END 中的位置（不在其中时为None），
+    外层语句的记录和按顺序排列的内层语句的记录。
+    下标和行号是应用第 gen 条及以后的平移规则之前的值。完整编译时只记录生成了四元式的语句。
+    """
+
+    __slots__ = ("gen", "tokStart", "tokEnd", "lineStart", "lineEnd", "ctx", "parent", "children")
+
+    def __init__(self, gen, tokStart, lineStart, ctx=None, parent=None):
+        self.gen = gen
+        self.tokStart = tokStart
+        self.tokEnd = tokStart
+        self.lineStart = lineStart
+        self.lineEnd = lineStart
+        self.ctx = ctx
+        self.parent = parent
+        self.children = []
+
+class IncrementalParser(p.Parser):
+    """
+    记录每条语句位置的语法分析器，可以从任意一条语句开始单独重新分析，
+    也可以从 BEGIN...END 中的任意一条语句开始继续分析。
+    """
+
+    def __init__(self, log=print):
+        p.Parser.__init__(self, log)
+        self.root = None      # 最外层（开始分析时）的语句的记录
+        self.current = None   # 正在分析的语句的记录
+        self.markGen = 0      # 新的语句记录的规则数
+        self.stopList = None  # 可以提前停止分析的 BEGIN...END 的记录
+        self.stopAt = None    # 判断能否在 stopList 中的某条语句处停止分析的函数
+
+    def statement(self, ctx=None):
+        parent = self.current
+        mark = self.current = Mark(self.markGen, self.pointer, self.output_line_no, ctx, parent)
+        try:
+            if self.getSym() == l.BEGIN:
+                self.match(l.BEGIN)
+                self.statementList(FIRST)
+            else:
+                p.Parser.statement(self)
+        finally:
+            self.current = parent
+        mark.tokEnd = self.pointer
+        mark.lineEnd = self.output_line_no
+        if mark.lineEnd > mark.lineStart:
+            if parent is None:
+                self.root = mark
+            else:
+                parent.children.append(mark)
+
+    def statementList(self, ctx):
+        """
+        分析 BEGIN...END 中从ctx位置开始的语句直到 END 为止，与 Parser.statement() 处理 BEGIN...END 的代码一致。
+        遇到可以复用的旧语句时停止，返回其在 stopList.children 中的下标；否则返回None。
+        """
+        self.statement(ctx)
+        if ctx != POST:
+            times = 0 if ctx == FIRST else 1
+            while self.getSym() == l.SEMICOLON:
+                self.match(l.SEMICOLON)
+                j = self.canStop(LOOP)
+                if j is not None:
+                    return j
+                self.statement(LOOP)
+                times += 1
+            if times != 0:
+                j = self.canStop(POST)
+                if j is not None:
+                    return j
+                self.statement(POST)
+
+        if self.getSym() == l.END:
+            self.match(l.END)
+        else:
+            self.error("在 'BEGIN...END' 语句中缺少 'END'。")
+        return None
+
+    def canStop(self, ctx):
+        if self.stopAt is None or self.current is not self.stopList:
+            return None
+        return self.stopAt(self.pointer, ctx)
+
+class Segment(q.QuadStore):
+    """
+    重新分析时生成的一段四元式：与 quads 共用常数池和名字表，第一条四元式的行号为 base + 1。
+    """
+
+    def __init__(self, quads, base):
+        q.QuadStore.__init__(self)
+        self.constants = quads.constants
+        self.names = quads.names
+        self.codes = quads.codes
+        self.base = base
+
+    def patch(self, i, target):
+        self.results[i - self.base] = target << 2 | q.LINE
+
+class WatchSession(s.CompilerSession):
+    """
+    监视模式的编译会话：按行保存单词，源文件变化后增量地更新单词和四元式，由 flush() 写出结果文件。
+    """
+
+    parserClass = IncrementalParser
+
+    def __init__(self, srcPath, **options):
+        s.CompilerSession.__init__(self, srcPath, **options)
+        self.names = l.NameTable()   # 在整个监视过程中共用的名字表
+        self.data = None             # 当前的源文件内容，换行符统一为 '\n'
+        self.lineCounts = None       # 每一行源代码的单词个数，完整编译时存在词法错误则为None
+        self.anchor = (0, 0, 0)      # 上次修改的第一行的 (字节位置, 行下标, 单词下标)
+        self.badLines = []           # 存在词法错误的行的 (行下标, 内容)，按行下标排列
+        self.cut = None              # 存在词法错误时，完整的词法分析产生的单词个数
+        self.valid = False           # 是否有某个版本的源代码的完整分析结果（语句记录和四元式）
+        self.root = None             # 最外层语句的记录
+        self.rules = []              # 尚未应用的平移规则 (单词下标, 单词数的变化, 行号, 行数的变化)
+        self.quadGens = array('I')   # 每条四元式产生时的规则数
+        self.dirty = None            # 存在错误时，分析结果之后单词的变化 (开始, 结束, 单词数的变化)
+        self.pendingLex = False      # flush() 时是否需要写出词法分析结果
+        self.pendingOutputs = False  # flush() 时是否需要写出四元式和符号表
+
+    def compile(self):
+        if self.pendingOutputs:
+            # 重新编译失败时不写出四元式和符号表，先写出最后一次成功的分析结果
+            self.flush()
+        self.parser = self.newParser()
+        self.messages = []
+        self.error = None
+        self.anchor = (0, 0, 0)
+        self.badLines = []
+        self.cut = None
+        self.rules = []
+        self.dirty = None
+        self.pendingLex = self.pendingOutputs = False
+        self.valid = s.CompilerSession.compile(self)
+        self.root = self.parser.root
+        self.quadGens = array('I', bytes(4 * len(self.quate_list)))
+        return self.valid
+
+    def lex(self):
+        self.data = readSource(self.srcPath)
+        lines = [line.decode() for line in self.data.splitlines(keepends=True)]
+        lines.append('.')  # 与 readSrc() 一致
+        self.lineCounts = array('i')
+        self.tokens = self.newBuffer()
+        for lineNo, line in enumerate(lines, 1):
+            tokens, messages = self.lexLine(line, lineNo)
+            if messages:
+                # 存在词法错误：按普通方式分析以得到相同的结果和错误信息
+                self.lineCounts = None
+                self.tokens = self.newBuffer()
+                l.lexLines(lines, self.tokens, report=self.report)
+                return
+            self.lineCounts.append(len(tokens))
+            self.tokens.extendCodes(tokens)
+
+    def newBuffer(self):
+        buffer = l.TokenBuffer()
+        buffer.names = self.names
+        return buffer
+
+    def lexLine(self, line, lineNo):
+        """
+        分析一行源代码，返回单词列表和词法错误信息的列表。与 scanLines() 一致，存在错误时单词只到出错的位置为止。
+        """
+        messages = []
+        tokens = list(l.scanLines([line], l.TokenCache(self.names), lineNo, messages.append))
+        return tokens, messages
+
+    def writeLex(self):
+        if self.cut is None:
+            s.CompilerSession.writeLex(self)
+            return
+        # 存在词法错误：与完整编译一致，只输出出错的位置之前的单词
+        tokens = self.tokens
+        self.tokens = self.newBuffer()
+        self.tokens.kinds = tokens.kinds[:self.cut]
+        self.tokens.values = tokens.values[:self.cut]
+        try:
+            s.CompilerSession.writeLex(self)
+        finally:
+            self.tokens = tokens
+
+    def update(self):
+        """
+        源文件变化后更新内存中的编译结果，结果文件由 flush() 写出。
+        能增量更新时返回重新生成的四元式数（存在错误时为0），否则重新编译（同时写出结果文件）并返回None。
+        """
+        data = readSource(self.srcPath)
+        if not self.valid or self.lineCounts is None:
+            self.compile()
+            return None
+        old = self.data
+        if data == old:
+            return 0
+
+        # 找出发生变化的字节：旧的 [start, oldEnd) 被新的 [start, newEnd) 替换，再扩展到整行
+        start = commonPrefix(old, data)
+        suffix = commonSuffix(old, data, min(len(old), len(data)) - start)
+        start = old.rfind(b"\n", 0, start) + 1
+        oldEnd = len(old) - suffix
+        newEnd = len(data) - suffix
+        if not (endsLine(old, start, oldEnd) and endsLine(data, start, newEnd)):
+            newline = old.find(b"\n", oldEnd)
+            extra = (len(old) if newline < 0 else newline + 1) - oldEnd
+            oldEnd += extra
+            newEnd += extra
+        first, a = self.locate(old, start)
+        oldCount = len(old[start:oldEnd].splitlines())
+
+        # 只重新分析变化的行
+        newTokens = []
+        badLines = []
+        for index, line in enumerate(data[start:newEnd].splitlines(keepends=True), first):
+            line = line.decode()
+            tokens, messages = self.lexLine(line, index + 1)
+            if messages:
+                badLines.append((index, line))
+            newTokens.append(tokens)
+        lineDelta = len(newTokens) - oldCount
+        self.badLines = [bad for bad in self.badLines if bad[0] < first] + badLines + \
+            [(index + lineDelta, line) for index, line in self.badLines if index >= first + oldCount]
+
+        # 拼接单词缓冲区：旧的 [a, b) 被新的单词替换
+        b = a + sum(self.lineCounts[first:first + oldCount])
+        middle = list(itertools.chain.from_iterable(newTokens))
+        self.tokens.kinds[a:b] = array('B', bytes(token[0] for token in middle))
+        self.tokens.values[a:b] = array('q', [token[1] for token in middle])
+        self.lineCounts[first:first + oldCount] = array('i', map(len, newTokens))
+        self.data = data
+        self.anchor = (start, first, a)
+        self.pendingLex = True
+        tokDelta = len(middle) - (b - a)
+
+        if self.dirty is not None:
+            # 上次修改后存在错误：与上次以来的变化合并，仍然相对于最后一次成功的分析结果
+            dirtyStart, dirtyEnd, dirtyDelta = self.dirty
+            a, b, tokDelta = min(a, dirtyStart), max(b - dirtyDelta, dirtyEnd), tokDelta + dirtyDelta
+
+        self.messages = []
+        self.cut = None
+        if self.badLines:
+            # 与完整编译一致：报告第一个存在词法错误的行，单词到出错的位置为止
+            index, line = self.badLines[0]
+            tokens, messages = self.lexLine(line, index + 1)
+            for message in messages:
+                self.report(message)
+            self.cut = self.tokenOffset(index) + len(tokens)
+        return self.reparse(a, b, tokDelta)
+
+    def locate(self, data, pos):
+        """
+        data 中从 pos 开始的一行的 (行下标, 第一个单词的下标)，从最近的已知位置（见 anchors()）开始计算。
+        """
+        anchor = min(self.anchors(data), key=lambda anchor: abs(anchor[0] - pos))
+        anchorPos, anchorLine, anchorToken = anchor
+        if pos >= anchorPos:
+            index = anchorLine + data.count(b"\n", anchorPos, pos)
+        else:
+            index = anchorLine - data.count(b"\n", pos, anchorPos)
+        return index, self.tokenOffset(index, anchor)
+
+    def tokenOffset(self, index, anchor=None):
+        """
+        第 index 行的第一个单词的下标，从 anchor 或最近的已知位置开始计算。
+        """
+        if anchor is None:
+            anchor = min(self.anchors(self.data), key=lambda anchor: abs(anchor[1] - index))
+        anchorPos, anchorLine, anchorToken = anchor
+        if index >= anchorLine:
+            return anchorToken + sum(self.lineCounts[anchorLine:index])
+        return anchorToken - sum(self.lineCounts[index:anchorLine])
+
+    def anchors(self, data):
+        """
+        已知的 (字节位置, 行下标, 单词下标)：文件开头、上次修改的第一行，data 以换行结束时还有文件末尾。
+        """
+        anchors = [(0, 0, 0), self.anchor]
+        if data.endswith(b"\n"):
+            anchors.append((len(data), len(self.lineCounts) - 1, len(self.tokens) - self.lineCounts[-1]))
+        return anchors
+
+    def reparse(self, a, b, tokDelta):
+        """
+        分析结果中的单词 [a, b) 被替换，单词数增加了 tokDelta：从包含这些单词的最小语句开始重新分析。
+        重新分析的语句与原来的语句结束在同一个单词上时替换原来的语句，否则改为重新分析外层语句。
+        存在词法错误时只分析到出错的位置，得到与完整编译相同的语法错误，不改变分析结果。
+        返回重新生成的四元式数；变化不在任何语句中（如声明部分）时重新编译并返回None。
+        """
+        for mark, index in reversed(self.enclosing(a, b)):
+            try:
+                regenerated = self.reparseStatement(mark, index, a, b, tokDelta)
+            except p.CompileError as e:
+                # 完整编译时同样会从这条语句开始分析并遇到同一个错误
+                self.error = str(e)
+                self.log(self.error)
+                self.dirty = (a, b, tokDelta)
+                return 0
+            if regenerated is not None:
+                return regenerated
+        self.compile()
+        return None
+
+    def enclosing(self, a, b):
+        """
+        包含单词 [a, b) 的所有语句，从外到内排列的 (语句记录, 在外层语句中的下标) 列表。
+        """
+        chain = []
+        mark, index = self.root, None
+        while mark is not None and self.tokenAt(mark.gen, mark.tokStart) <= a \
+                and b <= self.tokenAt(mark.gen, mark.tokEnd):
+            chain.append((mark, index))
+            index = self.childAt(mark, a)
+            mark = mark.children[index] if index >= 0 else None
+        return chain
+
+    def childAt(self, mark, pos):
+        """
+        二分查找 mark 中最后一条开始位置不超过 pos 的内层语句，返回其下标，没有时返回-1。
+        """
+        children = mark.children
+        lo, hi = 0, len(children)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            child = children[mid]
+            if self.tokenAt(child.gen, child.tokStart) <= pos:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def reparseStatement(self, mark, index, a, b, tokDelta):
+        """
+        重新分析 mark 记录的语句，结束位置与原来一致时替换原来的四元式和记录并返回重新生成的四元式数，否则返回None。
+        mark 是 BEGIN...END 时从变化之前最近的一条内层语句开始分析，遇到变化之后可以复用的内层语句时停止。
+        """
+        tokStart = self.tokenAt(mark.gen, mark.tokStart)
+        tokEnd = self.tokenAt(mark.gen, mark.tokEnd)
+        lineStart = self.lineAt(mark.gen, mark.lineStart)
+        lineEnd = self.lineAt(mark.gen, mark.lineEnd)
+
+        # 开始分析的位置：BEGIN...END 中变化之前最近的一条语句或第一条语句，其他语句为语句的开头
+        i = ctx = None
+        startToken, startLine = tokStart, lineStart
+        if self.tokens.kinds[tokStart] == l.BEGIN:
+            i = self.childAt(mark, a)
+            if i >= 0:
+                child = mark.children[i]
+                startToken = self.tokenAt(child.gen, child.tokStart)
+                startLine = self.lineAt(child.gen, child.lineStart)
+                ctx = child.ctx
+            elif a > tokStart:
+                i, startToken, ctx = 0, tokStart + 1, FIRST
+            else:
+                i = None
+
+        def stopAt(pos, place):
+            # 变化之后开始位置和在 BEGIN...END 中的位置都与原来相同的内层语句可以复用。
+            # 至少重新分析开始的那条语句（记录的语句都生成了四元式），被替换的旧四元式不会为空：
+            # 为空时平移规则无法区分跳到这里的跳转应该跳到新生成的四元式还是之后复用的语句
+            pos -= tokDelta
+            if pos < b:
+                return None
+            j = self.childAt(mark, pos)
+            if j > i:
+                child = mark.children[j]
+                if self.tokenAt(child.gen, child.tokStart) == pos and child.ctx == place:
+                    return j
+            return None
+
+        parser = self.parser
+        quads = parser.quate_list
+        segment = Segment(quads, startLine - 1)
+        parser.quate_list = segment
+        parser.output_line_no = startLine
+        parser.used_temp_index = 0
+        parser.free_temps = []
+        parser.has_error = False
+        parser.root = None
+        parser.markGen = len(self.rules) + 1
+        holder = Mark(0, startToken, startLine)  # 收集从 BEGIN...END 中间开始分析时产生的内层语句记录
+        parser.current = holder if i is not None else None
+        parser.stopList = holder
+        parser.stopAt = stopAt if self.cut is None else None
+        end = len(self.tokens) if self.cut is None else self.cut
+        kinds = memoryview(self.tokens.kinds)[startToken:end]
+        values = memoryview(self.tokens.values)[startToken:end]
+        try:
+            parser.getSen(zip(kinds, values), self.names)
+            parser.pointer = startToken
+            if i is None:
+                parser.statement(mark.ctx)
+                j = None
+            else:
+                j = parser.statementList(ctx)
+        finally:
+            parser.quate_list = quads
+            parser.sentence = None
+            parser.current = parser.stopList = parser.stopAt = None
+            kinds.release()
+            values.release()
+        if self.cut is not None:
+            # 存在词法错误：没有遇到语法错误时改为分析外层语句
+            return None
+
+        if j is None:
+            if parser.pointer != tokEnd + tokDelta:
+                return None
+            endToken, endLine = tokEnd, lineEnd
+        else:
+            child = mark.children[j]
+            endToken = self.tokenAt(child.gen, child.tokStart)
+            endLine = self.lineAt(child.gen, child.lineStart)
+
+        # 替换四元式，之后的单词和行号记为一条平移规则
+        regenerated = len(segment)
+        self.rules.append((endToken, tokDelta, endLine, regenerated - (endLine - startLine)))
+        quads[startLine - 1:endLine - 1] = segment
+        self.quadGens[startLine - 1:endLine - 1] = array('I', [len(self.rules)]) * regenerated
+
+        # 替换语句记录
+        if i is not None:
+            for child in holder.children:
+                child.parent = mark
+            mark.children[i:len(mark.children) if j is None else j] = holder.children
+        else:
+            new = parser.root
+            if new is not None:
+                new.parent = mark.parent
+            if mark.parent is None:
+                self.root = new
+            elif new is not None:
+                mark.parent.children[index] = new
+            else:
+                del mark.parent.children[index]
+
+        self.error = None
+        self.dirty = None
+        self.pendingOutputs = True
+        return regenerated
+
+    def tokenAt(self, gen, tok):
+        """
+        第 gen 条平移规则之前的单词下标 tok 现在的值。
+        """
+        for end, delta, lineEnd, lineDelta in itertools.islice(self.rules, gen, None):
+            if tok >= end:
+                tok += delta
+        return tok
+
+    def lineAt(self, gen, line):
+        """
+        第 gen 条平移规则之前的行号 line 现在的值。
+        """
+        for end, delta, lineEnd, lineDelta in itertools.islice(self.rules, gen, None):
+            if line >= lineEnd:
+                line += lineDelta
+        return line
+
+    def flush(self):
+        """
+        应用所有的平移规则，写出上次写出以后有变化的结果文件。
+        """
+        if self.rules:
+            self.applyRules()
+        if self.pendingLex:
+            self.writeLex()
+        if self.pendingOutputs:
+            self.fitTemps()
+            self.writeOutputs()
+        self.pendingLex = self.pendingOutputs = False
+
+    def applyRules(self):
+        """
+        把平移规则应用到所有的跳转目标和语句记录上，然后清空规则。
+        """
+        quads = self.quate_list
+        results = quads.results
+        count = len(self.rules)
+        for i, (code, gen) in enumerate(zip(quads.ops, self.quadGens)):
+            if gen < count and code in q.JUMP_CODES:
+                results[i] = self.lineAt(gen, results[i] >> 2) << 2 | q.LINE
+        marks = [self.root] if self.root is not None else []
+        while marks:
+            mark = marks.pop()
+            mark.tokStart = self.tokenAt(mark.gen, mark.tokStart)
+            mark.tokEnd = self.tokenAt(mark.gen, mark.tokEnd)
+            mark.lineStart = self.lineAt(mark.gen, mark.lineStart)
+            mark.lineEnd = self.lineAt(mark.gen, mark.lineEnd)
+            mark.gen = 0
+            marks.extend(mark.children)
+        self.rules = []
+        self.quadGens = array('I', bytes(4 * len(quads)))
+
+    def fitTemps(self):
+        """
+        使符号表中的临时变量与四元式中用到的一致：#TEMP1 到最大的编号。
+        """
+        quads = self.quate_list
+        temps = 0
+        for code in set(quads.results):
+            if code & 3 == q.NAME:
+                name = quads.names[code >> 2]
+                if name.startswith('#TEMP'):
+                    temps = max(temps, int(name[5:]))
+        trimTemps(self.symbol_table, temps)
+        for index in range(1, temps + 1):
+            self.symbol_table.setdefault('#TEMP' + str(index), None)
+        self.parser.used_temp_index = temps
+
+# 读取源文件，换行符统一为 '\n'（与 readSrc() 的通用换行模式一致）
+def readSource(srcPath):
+    with open(srcPath, "rb") as file:
+        data = file.read()
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return data
+
+# 两段字节的公共前缀的长度：按块比较，再在第一个不同的块中二分查找
+def commonPrefix(x, y, step=65536):
+    limit = min(len(x), len(y))
+    i = 0
+    while i < limit:
+        j = min(i + step, limit)
+        if x[i:j] != y[i:j]:
+            while j - i > 1:
+                mid = (i + j) // 2
+                if x[i:mid] == y[i:mid]:
+                    i = mid
+                else:
+                    j = mid
+            return i
+        i = j
+    return limit
+
+# 两段字节的公共后缀的长度，不超过 limit
+def commonSuffix(x, y, limit, step=65536):
+    n, m = len(x), len(y)
+    i = 0
+    while i < limit:
+        j = min(i + step, limit)
+        if x[n - j:n - i] != y[m - j:m - i]:
+            while j - i > 1:
+                mid = (i + j) // 2
+                if x[n - mid:n - i] == y[m - mid:m - i]:
+                    i = mid
+                else:
+                    j = mid
+            return i
+        i = j
+    return limit
+
+# data[start:end] 是否由整行组成（start 总是一行的开始）
+def endsLine(data, start, end):
+    return end == start or data[end - 1] == ord("\n")
+
+# 从符号表中删除编号大于count的临时变量
+def trimTemps(symbol_table, count):
+    temps = [name for name in symbol_table if name.startswith('#TEMP')]
+    for name in temps[count:]:
+        del symbol_table[name]
+
+# 监视源文件，每次变化后增量地更新编译结果，源文件 delay 秒没有变化后写出结果文件，直到收到中断信号
+def watch(srcPath, interval=0.05, delay=FLUSH_DELAY, **options):
+    session = WatchSession(srcPath, **options)
+    session.compile()
+    lastStat = None
+    flushAt = None  # 写出结果文件的时间
+    try:
+        while True:
+            try:
+                stat = os.stat(srcPath)
+                current = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                current = None
+            if lastStat is None:
+                lastStat = current
+            elif current is not None and current != lastStat:
+                lastStat = current
+                start = time.perf_counter()
+                regenerated = session.update()
+                elapsed = (time.perf_counter() - start) * 1000
+                if regenerated is None:
+                    print("已重新编译，用时 %.2f 毫秒" % elapsed)
+                else:
+                    print("已增量更新，重新生成 %d 条四元式，用时 %.2f 毫秒" % (regenerated, elapsed))
+                    flushAt = time.monotonic() + delay
+            elif flushAt is not None and time.monotonic() >= flushAt:
+                session.flush()
+                flushAt = None
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.flush()
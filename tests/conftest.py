@@ -0,0 +1,6 @@
+# 测试配置：让测试可以导入仓库根目录下的 cgg_* 模块和 bench 包
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
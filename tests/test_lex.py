@@ -0,0 +1,25 @@
+# 快速扫描器与逐字符参考扫描器的比较：对生成的程序随机改变单词之间的空白后，两者得到的单词序列相同
+
+import re
+import random
+import cgg_session as s  # 导入编译会话模块
+from bench import generate as g
+
+def tokens(text, lexer):
+    session = s.CompilerSession(source=text, outPath=None, lexPath=None, tablePath=None, quiet=True, lexer=lexer)
+    session.lex()
+    return list(session.tokens.tuples())
+
+def respace(rand, text):
+    """
+    随机改变单词之间的空白：相邻的单词可能连在一起，也可能分到不同的行，行首行尾可能有制表符。
+    参考扫描器不能处理行末的单个 < 或 >，它们之后不换行。
+    """
+    words = re.findall(r"[a-zA-Z][a-zA-Z\d]*|\d+|[:<>]=|\S", text)
+    spaces = ["", " ", "  ", "\n", " \n   ", "\t\n\t"]
+    return "".join(word + rand.choice(spaces[:3] if word in ("<", ">") else spaces) for word in words)
+
+def testFastLexerMatchesReference():
+    for seed in range(20):
+        text = respace(random.Random(seed), g.generateText(size=3000, seed=seed, variables=6))
+        assert tokens(text, "fast") == tokens(text, "ref"), seed
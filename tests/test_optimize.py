@@ -0,0 +1,51 @@
+# 优化前后的运行结果比较：-O 生成的四元式与 -O0 在虚拟机上执行，
+# 两者要么都出错，要么所有变量的最终值都相同
+
+import re
+import random
+import cgg_session as s  # 导入编译会话模块
+import cgg_vm as vm      # 导入虚拟机模块
+from bench import generate as g
+
+# 替换变量初值的大数，使运算可能超出范围
+BIG = ["4611686018427387904", "3037000500", "9223372036854775807", "-9223372036854775807", "2147483648"]
+
+# 编译并执行源代码，返回变量的最终值，运行出错时返回None
+def run(text, optimize):
+    session = s.CompilerSession(source=text, outPath=None, lexPath=None, tablePath=None,
+                                quiet=True, optimize=optimize)
+    assert session.compile(), session.error
+    machine = vm.VM(session.symbol_table, session.quate_list)
+    try:
+        machine.run()
+    except vm.VMError:
+        return None
+    return machine.variables()
+
+def assertSameRun(text):
+    assert run(text, 1) == run(text, 0)
+
+def testDeadStoreKeepsOverflow():
+    # 条件的两个出口到达同一处，比较被删除后乘法的结果不再被使用，但它仍然会超出范围
+    assertSameRun("PROGRAM t VAR x,y; BEGIN y:=9223372036854775807; IF y*2=0 THEN IF 1<0 THEN x:=1 END.")
+    assertSameRun("PROGRAM t VAR x,y; BEGIN y:=-9223372036854775807; y:=y-1; "
+                  "IF y/(0-1)=0 THEN IF 1<0 THEN x:=1 END.")
+
+def testHoistingKeepsZeroTripLoopsSafe():
+    # 循环一次也不执行，外提到循环之前的乘法不能超出范围
+    assertSameRun("PROGRAM t VAR k0,k1,v0,z; BEGIN v0:=2; IF k1=0 THEN v0:=9223372036854775807; "
+                  "k0:=0; WHILE k0<0 DO BEGIN z:=v0*9223372036854775807+k0; k0:=k0+1 END END.")
+
+def testStrengthReductionStaysInRange():
+    # i*k 削弱为每次循环增加 k 的 s 后，离开循环前 s 多增加的一步不能超出范围
+    assertSameRun("PROGRAM t VAR i,z; BEGIN i:=0; WHILE i<2 DO BEGIN z:=i*4611686018427387904+i; i:=i+1 END END.")
+    assertSameRun("PROGRAM t VAR i,z; BEGIN i:=0; WHILE i<2 DO BEGIN z:=i*4611686018427387903+i; i:=i+1 END END.")
+    assertSameRun("PROGRAM t VAR i,z; BEGIN i:=5; WHILE i>0-3 DO BEGIN z:=z+i*3074457345618258602; i:=i-1 END END.")
+
+def testGeneratedProgramsRunTheSame():
+    # 生成的程序中随机把一些变量的初值换成大数，优化前后要么都出错，要么结果相同
+    for seed in range(100):
+        rand = random.Random(seed)
+        text = g.generateText(size=300, seed=seed, variables=6, loopBound=3)
+        text = re.sub(r"(v\d+):=(\d);", lambda m: "%s:=%s;" % (m.group(1), rand.choice(BIG + [m.group(2)] * 10)), text)
+        assert run(text, 1) == run(text, 0), seed
@@ -0,0 +1,65 @@
+# 语法分析器生成的四元式，以及不同的分析引擎、容错分析与严格分析的比较
+
+import re
+import random
+import cgg_session as s  # 导入编译会话模块
+import cgg_vm as vm      # 导入虚拟机模块
+from bench import generate as g
+
+def compileSource(text):
+    session = s.CompilerSession(source=text, outPath=None, lexPath=None, tablePath=None, quiet=True)
+    assert session.compile(), session.error
+    return session
+
+def testTimesZeroRetractsOperand():
+    # 乘以 0 折叠为常数 0 后，另一个运算对象已经生成的四元式被撤销，不会留下可能超出范围的运算
+    session = compileSource("PROGRAM t VAR x,y,z; BEGIN y:=9223372036854775807; z:=x+(y*y+3)*0 END.")
+    assert [quad[1:] for quad in session.quate_list] == [
+        (':=', 9223372036854775807, '_', 'y'), (':=', 'x', '_', 'z')]
+
+def testTimesZeroKeepsDivisionByZero():
+    # 运算对象中可能除以 0 的除法不撤销，运行时仍然报错
+    session = compileSource("PROGRAM t VAR x,z; BEGIN z:=(1/x+2)*0 END.")
+    machine = vm.VM(session.symbol_table, session.quate_list)
+    try:
+        machine.run()
+    except vm.VMError as error:
+        assert "除数为0" in str(error)
+    else:
+        assert False, "除以 0 没有报错"
+
+# 编译源代码，返回 (是否成功, 语法错误信息, 四元式列表, 容错分析的诊断信息)
+def compileWith(text, **options):
+    session = s.CompilerSession(source=text, outPath=None, lexPath=None, tablePath=None, quiet=True, **options)
+    ok = session.compile()
+    return ok, session.error, list(session.quate_list), session.diagnostics
+
+# 随机删除、复制或替换几个单词，得到通常有语法错误的程序
+def mutate(rand, text):
+    words = re.findall(r"[a-zA-Z][a-zA-Z\d]*|\d+|[:<>]=|\S", text)
+    for i in range(rand.randint(1, 3)):
+        k = rand.randrange(len(words))
+        choice = rand.random()
+        if choice < 0.3:
+            del words[k]
+        elif choice < 0.6:
+            words.insert(k, rand.choice(words))
+        else:
+            words[k] = rand.choice(["+", "*", "(", ")", ";", ":=", "<", "BEGIN", "END", "IF", "THEN", "DO", "v0", "1"])
+    return " ".join(words)
+
+def testStackEngineMatchesRecursive():
+    rand = random.Random(0)
+    for seed in range(10):
+        text = g.generateText(size=2000, seed=seed, variables=6)
+        assert compileWith(text, engine="stack") == compileWith(text), seed
+        for i in range(20):
+            mutant = mutate(rand, text)
+            assert compileWith(mutant, engine="stack") == compileWith(mutant), mutant
+
+def testRecoveringParserMatchesStrict():
+    # 没有错误的程序，容错分析生成的四元式与严格分析相同，也没有诊断信息
+    for seed in range(10):
+        text = g.generateText(size=2000, seed=seed, variables=6)
+        ok, error, quads, diagnostics = compileWith(text, recover=True)
+        assert (ok, error, quads) == compileWith(text)[:3] and not diagnostics, seed
@@ -0,0 +1,50 @@
+# 编译服务器：并发请求的结果与单独编译相同
+
+import io
+import threading
+import pytest
+import cgg_server as server  # 导入编译服务器模块
+from bench import generate as g
+
+def program(seed):
+    text = io.StringIO()
+    g.ProgramGenerator(size=4000, seed=seed).write(text)
+    return text.getvalue()
+
+@pytest.mark.parametrize("workers", [0, 1])
+def testConcurrentReferenceLexer(tmp_path, workers):
+    # ref 和 check 词法分析器使用 cgg_lex 的模块级状态，同时编译的请求不能互相干扰
+    socketPath = str(tmp_path / "cgg.sock")
+    instance = server.CompileServer(socketPath, workers)
+    thread = threading.Thread(target=instance.serve_forever, daemon=True)
+    thread.start()
+    sources = [program(seed) for seed in range(8)]
+    expected = [server.compileRequest({"source": source}) for source in sources]
+    results = {}
+
+    def send(i):
+        client = server.CompileClient(socketPath)
+        try:
+            for lexer in ("ref", "check", "ref"):
+                results.setdefault(i, []).append(client.compile(source=sources[i], lexer=lexer))
+        finally:
+            client.close()
+
+    try:
+        senders = [threading.Thread(target=send, args=(i,)) for i in range(len(sources))]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+    finally:
+        instance.shutdown()
+        instance.server_close()
+    for i, want in enumerate(expected):
+        assert results[i] == [want] * 3
+
+def testServeKeepsOtherFiles(tmp_path):
+    path = tmp_path / "not-a-socket"
+    path.write_text("data")
+    with pytest.raises(FileExistsError):
+        server.serve(str(path), 0)
+    assert path.read_text() == "data"
@@ -0,0 +1,66 @@
+# 虚拟机的步数上限：解释执行和分层执行都恰好执行 limit 条四元式后停止，
+# 停止时变量的值与逐条执行 limit 条四元式后的值相同。
+# 分层执行与只解释执行的比较：执行的条数、出错信息和帧中所有槽的值都相同
+
+import re
+import random
+import pytest
+
+import cgg_session as s  # 导入编译会话模块
+import cgg_vm as vm      # 导入虚拟机模块
+from bench import generate as g
+
+TEXT = ("PROGRAM t VAR i,j,x,y; BEGIN i:=0; WHILE i<4 DO BEGIN j:=0; WHILE j<5 DO BEGIN "
+        "x:=x+j*3-i; IF x>10 THEN x:=x/7; y:=y+1; j:=j+1 END; i:=i+1 END END.")
+
+def compile(text, optimize=0):
+    session = s.CompilerSession(source=text, outPath=None, lexPath=None, tablePath=None, quiet=True,
+                                optimize=optimize)
+    assert session.compile(), session.error
+    return session
+
+# 最多执行 limit 条四元式，返回 (是否超过上限, 执行的条数, 变量的值)
+def run(session, limit, jit):
+    machine = vm.VM(session.symbol_table, session.quate_list, jit=jit, threshold=2)
+    try:
+        machine.run(limit)
+    except vm.VMError:
+        return True, machine.steps, machine.variables()
+    return False, machine.steps, machine.variables()
+
+@pytest.mark.parametrize("jit", [False, True])
+def testStepLimitIsExact(jit):
+    session = compile(TEXT)
+    stopped, total, final = run(session, vm.DEFAULT_STEP_LIMIT, jit)
+    assert not stopped
+    assert run(session, total, jit) == (False, total, final)
+    for limit in range(total):
+        stopped, steps, values = run(session, limit, jit)
+        assert stopped and steps == limit
+        assert values == run(session, limit, False)[2]  # 与只解释执行的结果相同
+    # 每多执行一条四元式最多改变一个变量
+    previous = run(session, 0, False)[2]
+    for limit in range(1, total + 1):
+        values = run(session, limit, False)[2]
+        assert sum(values[name] != previous[name] for name in values) <= 1
+        previous = values
+
+# 执行到结束或出错，返回 (出错信息, 执行的条数, 帧)
+def trace(session, jit):
+    machine = vm.VM(session.symbol_table, session.quate_list, jit=jit, threshold=1)
+    try:
+        machine.run()
+        error = None
+    except vm.VMError as e:
+        error = str(e)
+    return error, machine.steps, list(machine.frame)
+
+def testJitMatchesInterpreter():
+    # 一些变量的初值换成大数，编译后的循环中也会发生超出范围的运算
+    big = ["4611686018427387904", "3037000500", "9223372036854775807", "-9223372036854775807"]
+    for seed in range(40):
+        rand = random.Random(seed)
+        text = g.generateText(size=600, seed=seed, variables=6, loopBound=8)
+        text = re.sub(r"(v\d+):=(\d);", lambda m: "%s:=%s;" % (m.group(1), rand.choice(big + [m.group(2)] * 30)), text)
+        session = compile(text, seed % 2)
+        assert trace(session, True) == trace(session, False), seed
@@ -0,0 +1,68 @@
+# 监视模式：随机修改源文件后，增量更新的结果与完整编译的结果比较
+
+import random
+import cgg_session as s  # 导入编译会话模块
+import cgg_watch as w    # 导入监视模式模块
+from bench import generate as g
+
+# 插入到语句之前的语句：简单语句、复合语句和循环（循环变量 k2 不被生成器使用）
+STATEMENTS = ["v1:=v2+7;", "v0:=v0*3-v1/2;", "IF v0<v1 THEN v2:=v2-1;", "BEGIN v3:=1; v4:=v3*2 END;",
+              "BEGIN k2:=0; WHILE k2<2 DO BEGIN v5:=v5+k2; k2:=k2+1 END END;", "BEGIN k2:=0; WHILE k2<0 DO k2:=k2+1 END;"]
+
+def edit(rand, lines):
+    """
+    随机修改一行：在语句之前插入语句、删除一条以分号结尾的赋值语句、修改常数或插入删除单个字符。
+    """
+    k = rand.randrange(4, len(lines) - 1)
+    choice = rand.random()
+    if choice < 0.45:
+        # 在以分号或 BEGIN 结尾的行之后开始的语句之前插入
+        starts = [i + 1 for i, line in enumerate(lines[3:-1], 3) if line.endswith(";") or line.endswith("BEGIN")]
+        # 缩进与下一行不同时，变化的字节正好是插入的整行，旧的单词区间为空
+        lines.insert(rand.choice(starts), rand.choice(("", "  ", "    ")) + rand.choice(STATEMENTS))
+    elif choice < 0.6:
+        simple = [i for i, line in enumerate(lines[4:-1], 4) if line.endswith(";") and ":=" in line
+                  and not line.lstrip().startswith(("IF", "BEGIN", "WHILE"))]
+        if simple:
+            del lines[rand.choice(simple)]
+    elif choice < 0.85:
+        digits = [i for i, c in enumerate(lines[k]) if c.isdigit()]
+        if digits:
+            i = rand.choice(digits)
+            lines[k] = lines[k][:i] + str(rand.randint(0, 9)) + lines[k][i + 1:]
+    else:
+        i = rand.randrange(len(lines[k]) + 1)
+        if rand.random() < 0.5:
+            lines[k] = lines[k][:i] + rand.choice(";:=+*()") + lines[k][i:]
+        else:
+            lines[k] = lines[k][:i] + lines[k][i + 1:]
+
+def checkWatch(tmp_path, seed, edits=30):
+    rand = random.Random(seed)
+    lines = g.generateText(size=1500, seed=seed, variables=6, depth=3).splitlines()
+    src = tmp_path / "p.pl"
+    src.write_text("\n".join(lines) + "\n")
+    out = dict(outPath=str(tmp_path / "watch.out"), lexPath=None, tablePath=None, quiet=True)
+    full = dict(outPath=str(tmp_path / "full.out"), lexPath=None, tablePath=None, quiet=True)
+    session = w.WatchSession(str(src), **out)
+    assert session.compile()
+    for step in range(edits):
+        previous = list(lines)
+        edit(rand, lines)
+        src.write_text("\n".join(lines) + "\n")
+        session.update()
+        reference = s.CompilerSession(str(src), **full)
+        if not reference.compile():
+            assert session.error == reference.error, step
+            # 撤销这次修改，继续从正确的版本修改
+            lines = previous
+            src.write_text("\n".join(lines) + "\n")
+            session.update()
+            assert s.CompilerSession(str(src), **full).compile()
+        session.flush()
+        assert session.error is None, (step, session.error)
+        assert (tmp_path / "watch.out").read_text() == (tmp_path / "full.out").read_text(), step
+
+def testWatchMatchesFullCompile(tmp_path):
+    for seed in range(6):
+        checkWatch(tmp_path, seed)